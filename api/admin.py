@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Employee, AttendanceRecord
+from .models import User, Employee, AttendanceRecord, DailyAttendanceSummary
 
 
 @admin.register(User)
@@ -25,3 +25,18 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
     search_fields = ['employee__full_name', 'employee__employee_id']
     ordering = ['-date', '-created_at']
     date_hierarchy = 'date'
+
+
+@admin.register(DailyAttendanceSummary)
+class DailyAttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ['date', 'department', 'present', 'absent']
+    list_filter = ['department']
+    ordering = ['-date', 'department']
+    date_hierarchy = 'date'
+
+    # Rows are maintained by database triggers
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,205 @@
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.db import connection
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .authentication import issue_tokens
+from .models import User
+from .serializers import CredentialsSerializer, SignupSerializer, UserSerializer
+
+logger = logging.getLogger(__name__)
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+
+
+def get_hash_executor():
+    """Bounded pool that runs password hashing off the event loop"""
+    global _hash_executor
+    if _hash_executor is None:
+        with _hash_executor_lock:
+            if _hash_executor is None:
+                _hash_executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix='password-hash'
+                )
+    return _hash_executor
+
+
+async def run_hasher(func, *args):
+    # hashlib's PBKDF2 releases the GIL, so the pool hashes in parallel
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), partial(func, *args))
+
+
+class LastLoginBuffer:
+    """
+    Collects last_login timestamps and writes them in one UPDATE once the
+    buffer holds `max_size` users or its oldest entry is `interval` seconds
+    old. A timer started with the first entry covers the second case when no
+    further login comes along to trigger it.
+    """
+
+    def __init__(self, max_size, interval):
+        self.max_size = max_size
+        self.interval = interval
+        self.pending = {}
+        self.oldest = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def add(self, user_id, when):
+        with self.lock:
+            self.pending[user_id] = when
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+                self.timer = threading.Timer(self.interval, self.flush_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+            return len(self.pending) >= self.max_size or time.monotonic() - self.oldest >= self.interval
+
+    def take(self):
+        with self.lock:
+            pending, self.pending, self.oldest = self.pending, {}, None
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            return pending
+
+    def flush(self):
+        pending = self.take()
+        if not pending:
+            return 0
+        placeholders = ', '.join(['(%s::uuid, %s::timestamptz)'] * len(pending))
+        params = [value for item in pending.items() for value in item]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {User._meta.db_table} AS u SET last_login = v.last_login
+                FROM (VALUES {placeholders}) AS v(id, last_login)
+                WHERE u.id = v.id
+                """,
+                params,
+            )
+        return len(pending)
+
+    def flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not write buffered last_login timestamps')
+        finally:
+            # The timer thread ends here, so its connection must not linger
+            connection.close()
+
+    async def record(self, user_id):
+        if self.add(user_id, timezone.now()):
+            await sync_to_async(self.flush)()
+
+
+last_logins = LastLoginBuffer(
+    max_size=settings.LAST_LOGIN_BATCH_SIZE,
+    interval=settings.LAST_LOGIN_FLUSH_INTERVAL
+)
+
+
+@atexit.register
+def _flush_last_logins():
+    try:
+        last_logins.flush()
+    except Exception:
+        logger.exception('Could not write buffered last_login timestamps at shutdown')
+
+
+def parse_body(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST.dict()
+
+
+def error_response(errors, status=400):
+    return JsonResponse(errors, status=status)
+
+
+def token_response(user, status=200):
+    refresh = issue_tokens(user)
+    return JsonResponse({
+        'user': UserSerializer(user).data,
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+    }, status=status)
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    """Login user and return JWT tokens, hashing on the password pool"""
+    data = parse_body(request)
+    if data is None:
+        return error_response({'detail': 'JSON parse error'})
+
+    serializer = CredentialsSerializer(data=data)
+    if not serializer.is_valid():
+        return error_response(serializer.errors)
+    email = serializer.validated_data['email']
+    password = serializer.validated_data['password']
+
+    user = await User.objects.filter(email=email).afirst()
+    if user is None:
+        # Hash anyway so unknown emails take as long as wrong passwords
+        await run_hasher(make_password, password)
+        return error_response({'non_field_errors': ['Invalid email or password']})
+
+    is_correct, must_update = await run_hasher(verify_password, password, user.password)
+    if not is_correct or not user.is_active:
+        return error_response({'non_field_errors': ['Invalid email or password']})
+
+    if must_update:
+        # Re-encode at the currently configured hash cost
+        user.password = await run_hasher(make_password, password)
+        await User.objects.filter(pk=user.pk).aupdate(password=user.password)
+
+    await last_logins.record(user.pk)
+    return token_response(user)
+
+
+@csrf_exempt
+@require_POST
+async def signup(request):
+    """Register a new user, hashing on the password pool"""
+    data = parse_body(request)
+    if data is None:
+        return error_response({'detail': 'JSON parse error'})
+
+    serializer = SignupSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return error_response(serializer.errors)
+
+    # Same fields as SignupSerializer.create, with the hash computed off-loop
+    validated = serializer.validated_data
+    user = await User.objects.acreate(
+        email=User.objects.normalize_email(validated['email']),
+        password=await run_hasher(make_password, validated['password']),
+        name=validated['name'],
+        phone=validated.get('phone', ''),
+        department=validated.get('department', ''),
+        role='HR Manager'
+    )
+    return token_response(user, status=201)
@@ -0,0 +1,214 @@
+"""
+Native async versions of the read-heavy endpoints, served under ASGI.
+
+They return the same payloads as the DRF views in views.py, rendered through
+the same REST_FRAMEWORK renderers and content negotiation (so `?format=`,
+`Accept` and the encoders behave alike), but never tie up a worker thread
+while waiting on the database, so one process can hold many concurrent
+dashboard connections. Writes on the same URLs are handed to the sync DRF
+views.
+"""
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, NotAcceptable, NotFound
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .authentication import CachedJWTAuthentication
+from .db_router import replica_reads
+from .directory import get_directory
+from .encoders import RowEncoder
+from .models import AttendanceRecord, DailyAttendanceSummary, Employee
+from .pagination import AttendancePagination
+from .serializers import AttendanceRecordSerializer, AttendanceStatsSerializer, EmployeeSerializer
+from .views import filter_employees
+
+
+def error_response(exc):
+    data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    response = Response(data, status=exc.status_code)
+    if exc.status_code == 401:
+        response['WWW-Authenticate'] = CachedJWTAuthentication().authenticate_header(None)
+    return response
+
+
+def get_renderers():
+    # The browsable API needs a DRF view to render, so it is only offered by the sync views
+    return [
+        renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+        if not issubclass(renderer, BrowsableAPIRenderer)
+    ]
+
+
+def finalize_response(request, response):
+    """Negotiate and render a DRF Response the way APIView.finalize_response does"""
+    drf_request = Request(request)
+    renderers = get_renderers()
+    try:
+        renderer, media_type = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS().select_renderer(drf_request, renderers)
+    except (NotAcceptable, Http404) as exc:
+        # An unknown ?format= is a 404 and an unsatisfiable Accept a 406, as in DRF
+        exc = NotFound() if isinstance(exc, Http404) else exc
+        renderer, media_type = renderers[0], renderers[0].media_type
+        response = Response({'detail': exc.detail}, status=exc.status_code)
+    response.accepted_renderer = renderer
+    response.accepted_media_type = media_type
+    response.renderer_context = {'request': drf_request, 'response': response, 'view': None, 'args': (), 'kwargs': {}}
+    patch_vary_headers(response, ('Accept',))
+    return response.render()
+
+
+async def authenticate(request):
+    """JWT authentication without leaving the event loop on a cache hit"""
+    auth = CachedJWTAuthentication()
+    auth.safe_request = request.method in SAFE_METHODS
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    return await auth.aget_user(auth.get_validated_token(raw_token))
+
+
+def async_api_view(sync_view=None):
+    """
+    Authenticate GET requests and run the async view; any other method is
+    passed to `sync_view`, the DRF view normally mounted on the same URL.
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                if sync_view is None:
+                    return finalize_response(
+                        request, Response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+                    )
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+            try:
+                request.user = await authenticate(request)
+                if request.user is None:
+                    return finalize_response(request, Response(
+                        {'detail': 'Authentication credentials were not provided.'},
+                        status=401,
+                        headers={'WWW-Authenticate': CachedJWTAuthentication().authenticate_header(None)}
+                    ))
+                data = await view(request, *args, **kwargs)
+            except APIException as exc:
+                return finalize_response(request, error_response(exc))
+
+            return finalize_response(request, data if isinstance(data, Response) else Response(data))
+        return wrapper
+    return decorator
+
+
+def not_found(detail='Not found.'):
+    return Response({'detail': detail}, status=404)
+
+
+@async_api_view()
+@replica_reads
+async def dashboard_stats(request):
+    """Get dashboard statistics"""
+    today_stats = await DailyAttendanceSummary.objects.adashboard(date.today())
+    return {
+        'total_employees': today_stats['employees'],
+        'present_today': today_stats['present'],
+        'absent_today': today_stats['absent'],
+        'attendance_marked': today_stats['total'],
+    }
+
+
+@async_api_view()
+@replica_reads
+async def today_stats(request):
+    """Get today's attendance statistics"""
+    stats = await DailyAttendanceSummary.objects.atotals(date.today())
+    return AttendanceStatsSerializer(stats).data
+
+
+@async_api_view()
+@replica_reads
+async def by_employee(request):
+    """Get attendance records for a specific employee"""
+    employee_id = request.GET.get('employee_id', None)
+    if not employee_id:
+        return Response({'error': 'employee_id is required'}, status=400)
+
+    employee = await sync_to_async(get_directory().get_by_id)(employee_id)
+    if employee is None:
+        return Response({'error': 'Employee not found'}, status=404)
+
+    records = AttendanceRecord.objects.filter(employee_id=employee.id).order_by('-date', '-employee_id', '-id')
+    return await paginated_records(request, records)
+
+
+@async_api_view()
+@replica_reads
+async def by_date(request):
+    """Get attendance records for a specific date"""
+    date_param = request.GET.get('date', None)
+    if not date_param:
+        return Response({'error': 'date is required'}, status=400)
+
+    try:
+        date.fromisoformat(date_param)
+    except ValueError:
+        return Response({'error': 'date must be YYYY-MM-DD'}, status=400)
+
+    records = AttendanceRecord.objects.filter(date=date_param).order_by('-date', '-employee_id', '-id')
+    return await paginated_records(request, records)
+
+
+async def paginated_records(request, queryset):
+    """Page and serialize records exactly like AttendanceViewSet does"""
+    paginator = AttendancePagination()
+    encoder = RowEncoder.for_serializer(AttendanceRecordSerializer(context={'request': request}))
+    if encoder is None:
+        queryset = AttendanceRecordSerializer.restrict_queryset(queryset, request)
+        page = await sync_to_async(paginator.paginate_queryset)(queryset, Request(request))
+        data = AttendanceRecordSerializer(page, many=True, context={'request': request}).data
+    else:
+        page = await sync_to_async(paginator.paginate_queryset)(encoder.values(queryset, paginator), Request(request))
+        data = encoder.encode_many(page)
+    return paginator.get_paginated_response(data)
+
+
+def employee_list_view(sync_view):
+    @async_api_view(sync_view)
+    @replica_reads
+    async def employee_list(request):
+        """List employees with the same filters, paginator and encoder as the DRF view"""
+        queryset = EmployeeSerializer.restrict_queryset(filter_employees(Employee.objects.all(), request.GET), request)
+        paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+        encoder = RowEncoder.for_serializer(EmployeeSerializer(context={'request': request}))
+        if encoder is None:
+            page = await sync_to_async(paginator.paginate_queryset)(queryset, Request(request))
+            data = EmployeeSerializer(page, many=True, context={'request': request}).data
+        else:
+            page = await sync_to_async(paginator.paginate_queryset)(encoder.values(queryset, paginator), Request(request))
+            data = encoder.encode_many(page)
+        return paginator.get_paginated_response(data)
+    return employee_list
+
+
+def employee_detail_view(sync_view):
+    @async_api_view(sync_view)
+    @replica_reads
+    async def employee_detail(request, pk):
+        """Retrieve one employee"""
+        try:
+            employee = await EmployeeSerializer.restrict_queryset(Employee.objects.all(), request).aget(pk=pk)
+        except (Employee.DoesNotExist, ValidationError):
+            return not_found('No Employee matches the given query.')
+        return EmployeeSerializer(employee, context={'request': request}).data
+    return employee_detail
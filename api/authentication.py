@@ -0,0 +1,137 @@
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# Profile fields embedded in issued tokens, enough to build a request user
+# without touching the database when AUTH_TRUST_TOKEN_CLAIMS is enabled
+TOKEN_USER_CLAIMS = ('email', 'name', 'role')
+
+
+def get_user_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    get_user_cache().delete(user_cache_key(user_id))
+
+
+def issue_tokens(user):
+    """Create a refresh/access token pair carrying the trusted profile claims"""
+    refresh = RefreshToken.for_user(user)
+    for claim in TOKEN_USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return refresh
+
+
+# User fields kept in the shared cache: what authentication and permission
+# checks read. Never the password hash, only a digest of it when
+# CHECK_REVOKE_TOKEN needs one.
+CACHED_USER_FIELDS = ('id', 'email', 'name', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+
+def get_full_user(user):
+    """Load the complete user row for a request user built from the cache or token claims"""
+    if not getattr(user, 'partial', False):
+        return user
+    return type(user)._default_manager.get(pk=user.pk)
+
+
+def partial_user(user_model, **fields):
+    """
+    An unsaved-looking instance with only `fields` set. It behaves as an
+    existing row, so it can be assigned to foreign keys, but must go through
+    get_full_user before being serialized in full or saved.
+    """
+    user = user_model(**fields)
+    user._state.adding = False
+    user._state.db = 'default'
+    user.partial = True
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user through a short-lived cache
+    instead of querying the users table on every request.
+
+    Cached users are invalidated when the user row is saved or deleted (see
+    api/signals.py). With AUTH_TRUST_TOKEN_CLAIMS enabled, safe requests
+    skip the lookup altogether and use the profile claims in the token.
+    """
+
+    def authenticate(self, request):
+        self.safe_request = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        if settings.AUTH_TRUST_TOKEN_CLAIMS and getattr(self, 'safe_request', False):
+            user = self.user_from_claims(user_id, validated_token)
+            if user is not None:
+                return user
+
+        entry = self.load_user_entry(user_id)
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['password_digest']:
+                raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+
+        return partial_user(self.user_model, **{field: entry[field] for field in CACHED_USER_FIELDS})
+
+    async def aget_user(self, validated_token):
+        """
+        Async counterpart of get_user for the native async views. Django's
+        async ORM and cache calls run in a worker thread anyway, so this
+        reuses the sync lookup rather than duplicating it.
+        """
+        return await sync_to_async(self.get_user)(validated_token)
+
+    def load_user_entry(self, user_id):
+        """The cached fields of an active user, read through the cache"""
+        cache = get_user_cache()
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None or (api_settings.CHECK_REVOKE_TOKEN and 'password_digest' not in entry):
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed('User not found', code='user_not_found')
+            if not user.is_active:
+                raise AuthenticationFailed('User is inactive', code='user_inactive')
+            entry = {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+            if api_settings.CHECK_REVOKE_TOKEN:
+                entry['password_digest'] = get_md5_hash_password(user.password)
+            cache.set(key, entry, settings.AUTH_USER_CACHE_TIMEOUT)
+        return entry
+
+    def user_from_claims(self, user_id, validated_token):
+        if any(claim not in validated_token for claim in TOKEN_USER_CLAIMS):
+            return None
+        try:
+            user_id = uuid.UUID(str(user_id))
+        except ValueError:
+            return None
+
+        return partial_user(
+            self.user_model,
+            id=user_id,
+            is_active=True,
+            **{claim: validated_token[claim] for claim in TOKEN_USER_CLAIMS}
+        )
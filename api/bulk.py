@@ -0,0 +1,69 @@
+import uuid
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AttendanceRecord
+
+
+UPSERT_BATCH_SIZE = 1000
+
+
+def upsert_attendance(rows, marked_by_id=None, batch_size=UPSERT_BATCH_SIZE, only_newer=False):
+    """
+    Insert or update attendance records in multi-row statements.
+
+    `rows` is an iterable of (employee_id, date, status) tuples, optionally
+    followed by a marked_by_id overriding `marked_by_id` and by the time the
+    mark was made (default now), which becomes the record's updated_at.
+    Duplicate (employee_id, date) keys are coalesced with the last one
+    winning, since a single INSERT ... ON CONFLICT cannot touch the same row
+    twice. With `only_newer`, records updated after a row's mark time are
+    left alone.
+
+    Returns a dict mapping (employee_id, date) to (record_id, created) for
+    every record written.
+    """
+    now = timezone.now()
+    latest = {}
+    for employee_id, date_value, status_value, *extra in rows:
+        latest[(employee_id, date_value)] = (
+            status_value,
+            extra[0] if extra else marked_by_id,
+            extra[1] if len(extra) > 1 else now,
+        )
+
+    if not latest:
+        return {}
+
+    table = AttendanceRecord._meta.db_table
+    values = [
+        (uuid.uuid4(), employee_id, date_value, status_value, now, marker, marked_at)
+        for (employee_id, date_value), (status_value, marker, marked_at) in latest.items()
+    ]
+    # A row that comes back with the id we generated was inserted; an updated
+    # row keeps its existing id. (xmax = 0 is not available on partitioned tables.)
+    new_ids = {row[0] for row in values}
+    condition = 'WHERE r.updated_at <= EXCLUDED.updated_at' if only_newer else ''
+
+    results = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+            placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(batch))
+            params = [param for row in batch for param in row]
+            cursor.execute(
+                f"""
+                INSERT INTO {table} AS r (id, employee_id, date, status, created_at, marked_by_id, updated_at)
+                VALUES {placeholders}
+                ON CONFLICT (employee_id, date) DO UPDATE
+                SET status = EXCLUDED.status, marked_by_id = EXCLUDED.marked_by_id, updated_at = EXCLUDED.updated_at
+                {condition}
+                RETURNING r.id, r.employee_id, r.date
+                """,
+                params,
+            )
+            for record_id, employee_id, date_value in cursor.fetchall():
+                results[(employee_id, date_value)] = (record_id, record_id in new_ids)
+
+    return results
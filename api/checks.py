@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends whose entries other worker processes never see
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_replica_pin_cache(app_configs, **kwargs):
+    """Per-user primary pins only reach every worker through a shared cache"""
+    if not settings.DATABASE_REPLICAS:
+        return []
+    alias = settings.AUTH_USER_CACHE_ALIAS
+    if settings.CACHES.get(alias, {}).get('BACKEND') not in PER_PROCESS_CACHES:
+        return []
+    return [Warning(
+        f"Read replicas are configured but AUTH_USER_CACHE_ALIAS ('{alias}') is a per-process cache.",
+        hint=(
+            'Primary pins set after a write are then only seen by the worker that handled it, so clients '
+            'without the primary_pin cookie can read stale data from a replica. Point '
+            'AUTH_USER_CACHE_ALIAS at a shared cache such as Redis or Memcached.'
+        ),
+        id='api.W001',
+    )]
@@ -0,0 +1,144 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+from .authentication import get_user_cache
+
+
+class RoutingState:
+    """Where the current request may read from"""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = None
+
+
+_routing = ContextVar('db_routing', default=None)
+
+
+def current_state():
+    return _routing.get()
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    """Give the enclosed request its own routing state"""
+    token = _routing.set(RoutingState(pinned))
+    try:
+        yield _routing.get()
+    finally:
+        _routing.reset(token)
+
+
+def pin_key(user_id):
+    return f'primary-pin:{user_id}'
+
+
+def pin_user(user):
+    """
+    Keep the user's reads on the primary for REPLICA_PIN_SECONDS, in every
+    worker if the user cache is shared and in this one otherwise
+    """
+    if user is not None and user.is_authenticated:
+        get_user_cache().set(pin_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(request, state):
+    if state.pinned:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and get_user_cache().get(pin_key(user.pk)))
+
+
+@contextmanager
+def replica_reads_for(request):
+    """Send the enclosed reads to a replica unless the request is pinned"""
+    if not settings.DATABASE_REPLICAS:
+        yield
+        return
+
+    state = current_state()
+    token = None
+    if state is None:
+        # Called outside PrimaryPinningMiddleware
+        token = _routing.set(RoutingState())
+        state = current_state()
+    previous = state.replica
+    if not is_pinned(request, state):
+        state.replica = random.choice(settings.DATABASE_REPLICAS)
+    try:
+        yield
+    finally:
+        state.replica = previous
+        if token is not None:
+            _routing.reset(token)
+
+
+def replica_reads(view):
+    """Run a function view's reads on a replica; works for async views too"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with replica_reads_for(request):
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads_for(request):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin routing the reads of `replica_actions` to a replica.
+
+    Authentication and permission checks still read from the primary; only
+    the handler itself is routed.
+    """
+    replica_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        self.replica_scope = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.replica_scope is not None:
+                self.replica_scope.__exit__(None, None, None)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and self.action in self.replica_actions:
+            self.replica_scope = replica_reads_for(request)
+            self.replica_scope.__enter__()
+
+
+class ReplicaRouter:
+    """
+    Reads go to the replica chosen for the current request, if any;
+    everything else, including every write, goes to `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = current_state()
+        if state is None or state.replica is None or state.pinned:
+            return None
+        # Authentication must see users created or changed a moment ago
+        if model._meta.label == settings.AUTH_USER_MODEL:
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,286 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+
+from .models import Employee
+
+
+DirectoryEntry = namedtuple('DirectoryEntry', ['id', 'employee_id', 'full_name', 'email', 'department'])
+
+ENTRY_FIELDS = list(DirectoryEntry._fields)
+LOOKUP_FIELDS = ('id', 'employee_id', 'email')
+
+logger = logging.getLogger(__name__)
+
+
+class LocalStore:
+    """
+    Per-process LRU of directory entries with secondary key indexes.
+
+    Signals only evict entries in the process that saved the employee, so
+    entries expire after `timeout` seconds to bound how long other processes
+    keep serving a stale or deleted employee.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.expires = {}
+        self.indexes = {'employee_id': {}, 'email': {}}
+        self.lock = threading.Lock()
+
+    def get(self, field, value):
+        with self.lock:
+            pk = value if field == 'id' else self.indexes[field].get(value)
+            entry = self.entries.get(pk)
+            if entry is None:
+                return None
+            if self.expires[pk] <= time.monotonic():
+                self._remove(pk)
+                return None
+            self.entries.move_to_end(pk)
+            return entry
+
+    def put_many(self, entries):
+        expires = time.monotonic() + self.timeout
+        with self.lock:
+            for entry in entries:
+                self._remove(entry.id)
+                self.entries[entry.id] = entry
+                self.expires[entry.id] = expires
+                self.indexes['employee_id'][entry.employee_id] = entry.id
+                self.indexes['email'][entry.email] = entry.id
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def evict(self, pk):
+        with self.lock:
+            self._remove(pk)
+
+    def _remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if entry is not None:
+            del self.expires[pk]
+            for field, index in self.indexes.items():
+                if index.get(getattr(entry, field)) == pk:
+                    del index[getattr(entry, field)]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.expires.clear()
+            for index in self.indexes.values():
+                index.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class CacheStore:
+    """
+    Entries kept in a Django cache so every worker process shares them.
+
+    Keys carry a generation stamp stored in the cache itself; clearing
+    replaces it, which orphans every entry without touching the cache's other
+    keys. Stamps are timestamps, so one lost to eviction is never reused.
+    """
+
+    prefix = 'employee-directory'
+
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    @property
+    def generation_key(self):
+        return f'{self.prefix}:generation'
+
+    def generation(self):
+        return self.cache.get_or_set(self.generation_key, time.time_ns, None)
+
+    def key(self, field, value, generation=None):
+        return f'{self.prefix}:{generation or self.generation()}:{field}:{value}'
+
+    def get(self, field, value):
+        return self.cache.get(self.key(field, value))
+
+    def put_many(self, entries):
+        generation = self.generation()
+        self.cache.set_many({
+            self.key(field, getattr(entry, field), generation): entry
+            for entry in entries
+            for field in LOOKUP_FIELDS
+        }, self.timeout)
+
+    def evict(self, pk):
+        generation = self.generation()
+        entry = self.cache.get(self.key('id', pk, generation))
+        if entry is not None:
+            self.cache.delete_many([self.key(field, getattr(entry, field), generation) for field in LOOKUP_FIELDS])
+
+    def clear(self):
+        self.cache.set(self.generation_key, time.time_ns(), None)
+
+    def __len__(self):
+        return 0
+
+
+class EmployeeDirectory:
+    """
+    Read-through cache of the employee fields needed to resolve employees by
+    UUID, employee_id or email.
+
+    The WSGI/ASGI entry points fill it with one bulk query at startup (see
+    warm_directory), the first lookup does if that could not. Saves and
+    deletes evict entries through signals (see api/signals.py); misses are
+    read from the database and cached, absent employees are never cached.
+    """
+
+    def __init__(self, max_size=None, cache_alias=None, timeout=None):
+        self.max_size = max_size or settings.EMPLOYEE_DIRECTORY_MAX_SIZE
+        cache_alias = cache_alias if cache_alias is not None else settings.EMPLOYEE_DIRECTORY_CACHE_ALIAS
+        if cache_alias:
+            self.store = CacheStore(cache_alias, timeout or settings.EMPLOYEE_DIRECTORY_TIMEOUT)
+        else:
+            self.store = LocalStore(self.max_size, timeout or settings.EMPLOYEE_DIRECTORY_LOCAL_TIMEOUT)
+        self.warmed = False
+        self.warm_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def warm(self):
+        """Load the most recent employees with a single query"""
+        rows = Employee.objects.order_by('-created_at').values_list(*ENTRY_FIELDS)[:self.max_size]
+        # Oldest first, so the most recent employees end up most recently used
+        self.store.put_many([DirectoryEntry(*row) for row in reversed(rows)])
+        self.warmed = True
+
+    def ensure_warm(self):
+        """Warm once, however many threads get here first"""
+        if not self.warmed:
+            with self.warm_lock:
+                if not self.warmed:
+                    self.warm()
+
+    def count(self, hits=0, misses=0):
+        with self.stats_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def lookup(self, field, value):
+        self.ensure_warm()
+
+        entry = self.store.get(field, value)
+        if entry is not None:
+            self.count(hits=1)
+            return entry
+
+        self.count(misses=1)
+        rows = list(Employee.objects.filter(**{field: value}).values_list(*ENTRY_FIELDS).order_by()[:1])
+        if not rows:
+            return None
+        entry = DirectoryEntry(*rows[0])
+        self.store.put_many([entry])
+        return entry
+
+    def get_by_id(self, pk):
+        try:
+            pk = pk if isinstance(pk, uuid.UUID) else uuid.UUID(str(pk))
+        except ValueError:
+            return None
+        return self.lookup('id', pk)
+
+    def get_by_employee_id(self, employee_id):
+        return self.lookup('employee_id', employee_id)
+
+    def get_by_email(self, email):
+        return self.lookup('email', email)
+
+    def get_many_by_id(self, pks):
+        """Resolve many UUIDs, fetching every miss with one IN query"""
+        self.ensure_warm()
+
+        found = {}
+        missing = []
+        for pk in set(pks):
+            entry = self.store.get('id', pk)
+            if entry is None:
+                missing.append(pk)
+            else:
+                found[pk] = entry
+        self.count(hits=len(found), misses=len(missing))
+
+        if missing:
+            entries = [
+                DirectoryEntry(*row)
+                for row in Employee.objects.filter(id__in=missing).values_list(*ENTRY_FIELDS)
+            ]
+            self.store.put_many(entries)
+            found.update((entry.id, entry) for entry in entries)
+        return found
+
+    def evict(self, pk):
+        self.store.evict(pk)
+
+    def clear(self):
+        self.store.clear()
+        self.warmed = False
+        with self.stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.stats_lock:
+            hits, misses = self.hits, self.misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'size': len(self.store),
+            'max_size': self.max_size,
+        }
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def get_directory():
+    """Return the process-wide employee directory"""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = EmployeeDirectory()
+    return _directory
+
+
+def warm_directory():
+    """
+    Fill the process-wide directory before the first request, so no request
+    pays for the bulk query. Called from the WSGI/ASGI entry points, which
+    management commands never import.
+
+    The query runs in a short-lived thread: ASGI servers import the
+    application inside a running event loop, where the ORM refuses
+    synchronous queries. Its connection is closed afterwards so a server
+    that forks workers after loading the application does not share it.
+    """
+    def run():
+        try:
+            get_directory().ensure_warm()
+        except DatabaseError:
+            logger.exception('Could not warm the employee directory; the first lookup will')
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=run, name='employee-directory-warm')
+    thread.start()
+    thread.join()
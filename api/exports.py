@@ -0,0 +1,144 @@
+import csv
+import hashlib
+import io
+import json
+import re
+import tempfile
+import zlib
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Extract
+
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = ['id', 'employee_id', 'date', 'status', 'created_at']
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_BUFFER_SIZE = 64 * 1024
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d+)-$')
+
+
+def format_datetime(value):
+    # Same output as the serializers' DATETIME_FORMAT in UTC
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def export_rows(queryset):
+    """
+    Read attendance rows through a server-side cursor in a stable order, so
+    the same range always produces the same bytes.
+    """
+    rows = queryset.order_by('date', 'employee_id', 'id').values_list(*EXPORT_COLUMNS)
+    for record_id, employee_id, date_value, status_value, created_at in rows.iterator(
+        chunk_size=settings.ATTENDANCE_EXPORT_CHUNK_SIZE
+    ):
+        yield (str(record_id), str(employee_id), date_value.isoformat(), status_value, format_datetime(created_at))
+
+
+def encode_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_BUFFER_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def encode_ndjson(rows):
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(EXPORT_COLUMNS, row)), separators=(',', ':')) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_BUFFER_SIZE:
+            yield ''.join(lines).encode()
+            lines = []
+            size = 0
+    yield ''.join(lines).encode()
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
+
+
+def gzip_chunks(chunks, level=6):
+    # wbits=31 writes a gzip container with a zero mtime, keeping output deterministic
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def parse_range_start(header):
+    """Return N for a `bytes=N-` Range header, or None for anything else"""
+    match = RANGE_RE.match((header or '').strip())
+    return int(match.group(1)) if match else None
+
+
+def export_etag(queryset, file_format, compress=False):
+    """
+    Strong ETag for an export from cheap metadata: a hash of the filtered
+    query and the encoding, plus the row count, latest updated_at and sum of
+    updated_at of the exported rows. Every write stamps updated_at; the sum
+    also catches write-behind marks, which carry the time the mark was made
+    and so may be older than the latest stamp. Deletes change the count.
+    """
+    stats = queryset.order_by().aggregate(
+        count=Count('id'),
+        latest=Max('updated_at'),
+        stamps=Sum(Extract('updated_at', 'epoch')),
+    )
+    sql, params = queryset.order_by().values_list(*EXPORT_COLUMNS).query.sql_with_params()
+    digest = hashlib.sha256(
+        f'{sql}|{params}|{file_format}|{compress}|{stats["count"]}|{stats["latest"]}|{stats["stamps"]}'.encode()
+    ).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def spool_export(queryset, file_format, compress=False):
+    """
+    Generate the export once into a temporary file, which spills to disk past
+    EXPORT_SPOOL_SIZE, and return it with its length in bytes. A resumed
+    download needs the total length for Content-Range before sending
+    anything, and this serves both from a single generation pass.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
+    for chunk in export_attendance(queryset, file_format, compress=compress):
+        spool.write(chunk)
+    return spool, spool.tell()
+
+
+def read_spool(spool, offset=0):
+    """Yield a spooled export from `offset` in chunks, closing it at the end"""
+    try:
+        spool.seek(offset)
+        while True:
+            chunk = spool.read(EXPORT_BUFFER_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        spool.close()
+
+
+def export_attendance(queryset, file_format, compress=False):
+    """Yield the encoded export as byte chunks"""
+    chunks = ENCODERS[file_format](export_rows(queryset))
+    if compress:
+        chunks = gzip_chunks(chunks)
+    return chunks
@@ -0,0 +1,238 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import Employee
+from .serializers import EmployeeImportSerializer
+
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_CHUNK_SIZE = 1000
+# Row errors kept for the report; the rest are only counted
+IMPORT_MAX_ERRORS = 1000
+
+
+class ImportFileError(ValueError):
+    """The file itself cannot be read, e.g. a line that is not UTF-8"""
+
+    def __init__(self, message, line):
+        super().__init__(f'Line {line}: {message}')
+        self.line = line
+        self.report = None
+
+
+def detect_format(filename):
+    """Guess the import format from a file name"""
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    return None
+
+
+def decode_lines(binary_stream):
+    """
+    Yield (line_number, text) for each line of a binary stream, decoding one
+    line at a time so a bad byte is reported on the line that holds it
+    """
+    for line_number, raw in enumerate(binary_stream, start=1):
+        try:
+            yield line_number, raw.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise ImportFileError('File is not valid UTF-8', line_number)
+
+
+def read_rows(binary_stream, file_format):
+    """
+    Yield (line_number, row, error) tuples from a binary stream without
+    reading the whole file into memory.
+    """
+    lines = decode_lines(binary_stream)
+
+    if file_format == 'csv':
+        reader = csv.DictReader(line for _, line in lines)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif file_format == 'ndjson':
+        for line_number, line in lines:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, None, {'non_field_errors': ['Invalid JSON']}
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, {'non_field_errors': ['Expected a JSON object']}
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unsupported import format: {file_format}')
+
+
+class EmployeeImporter:
+    """
+    Validates and inserts employees chunk by chunk.
+
+    Uniqueness of employee_id and email is checked against the table with one
+    query per chunk, and against earlier rows of the same file with in-memory
+    key sets. Only the first `max_errors` row errors are kept; the rest are
+    counted in `errors_omitted`.
+    """
+
+    def __init__(self, created_by=None, chunk_size=IMPORT_CHUNK_SIZE, max_errors=IMPORT_MAX_ERRORS):
+        self.created_by = created_by
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.seen_employee_ids = set()
+        self.seen_emails = set()
+        self.total = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = []
+            try:
+                chunk.extend(islice(rows, self.chunk_size))
+            finally:
+                # Rows read before a file error are imported like the earlier chunks
+                if chunk:
+                    self.import_chunk(chunk)
+                    self.trim_errors()
+            if not chunk:
+                break
+        return self.report()
+
+    def report(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+            'errors_omitted': self.failed - len(self.errors),
+        }
+
+    def add_error(self, line_number, errors):
+        self.failed += 1
+        self.errors.append({'line': line_number, 'errors': errors})
+
+    def trim_errors(self):
+        # Chunks arrive in line order, so this keeps the first errors of the file
+        if len(self.errors) > self.max_errors:
+            self.errors.sort(key=lambda error: error['line'])
+            del self.errors[self.max_errors:]
+
+    def import_chunk(self, chunk):
+        candidates = []
+        for line_number, row, error in chunk:
+            self.total += 1
+            if error:
+                self.add_error(line_number, error)
+                continue
+
+            serializer = EmployeeImportSerializer(data=row)
+            if not serializer.is_valid():
+                self.add_error(line_number, serializer.errors)
+                continue
+            candidates.append((line_number, serializer.validated_data))
+
+        # One IN query for every key in the chunk
+        employee_ids = {data['employee_id'] for _, data in candidates}
+        emails = {data['email'] for _, data in candidates}
+        taken_ids = set()
+        taken_emails = set()
+        if candidates:
+            existing = Employee.objects.filter(
+                Q(employee_id__in=employee_ids) | Q(email__in=emails)
+            ).values_list('employee_id', 'email')
+            for employee_id, email in existing:
+                taken_ids.add(employee_id)
+                taken_emails.add(email)
+
+        pending = []
+        for line_number, data in candidates:
+            errors = {}
+            if data['employee_id'] in taken_ids or data['employee_id'] in self.seen_employee_ids:
+                errors['employee_id'] = ['Employee ID already exists']
+            if data['email'] in taken_emails or data['email'] in self.seen_emails:
+                errors['email'] = ['Email already exists']
+            if errors:
+                self.add_error(line_number, errors)
+                continue
+
+            self.seen_employee_ids.add(data['employee_id'])
+            self.seen_emails.add(data['email'])
+            pending.append((line_number, Employee(created_by=self.created_by, **data)))
+
+        if pending:
+            self.insert(pending)
+
+    def insert(self, pending):
+        """Bulk insert (line_number, employee) pairs, rejecting only rows that conflict"""
+        while pending:
+            try:
+                with transaction.atomic():
+                    Employee.objects.bulk_create([employee for _, employee in pending])
+            except IntegrityError:
+                # Another writer inserted a conflicting employee after our
+                # check; drop the rows that now conflict and retry the rest
+                conflicting = self.conflicting(pending)
+                if not conflicting:
+                    self.insert_each(pending)
+                    return
+                for line_number, _ in pending:
+                    if line_number in conflicting:
+                        self.add_error(line_number, {
+                            'non_field_errors': ['Conflicts with an employee created concurrently']
+                        })
+                pending = [(line_number, employee) for line_number, employee in pending if line_number not in conflicting]
+                continue
+            self.created += len(pending)
+            return
+
+    def conflicting(self, pending):
+        """Line numbers of pending rows whose employee_id or email is now taken"""
+        existing = list(Employee.objects.filter(
+            Q(employee_id__in={employee.employee_id for _, employee in pending})
+            | Q(email__in={employee.email for _, employee in pending})
+        ).values_list('employee_id', 'email'))
+        taken_ids = {employee_id for employee_id, _ in existing}
+        taken_emails = {email for _, email in existing}
+        return {
+            line_number for line_number, employee in pending
+            if employee.employee_id in taken_ids or employee.email in taken_emails
+        }
+
+    def insert_each(self, pending):
+        # The failure is not a visible conflict, so find the offending rows one by one
+        for line_number, employee in pending:
+            try:
+                with transaction.atomic():
+                    employee.save(force_insert=True)
+            except IntegrityError:
+                self.add_error(line_number, {
+                    'non_field_errors': ['Conflicts with an employee created concurrently']
+                })
+            else:
+                self.created += 1
+
+
+def import_employees(binary_stream, file_format, created_by=None, chunk_size=IMPORT_CHUNK_SIZE,
+                     max_errors=IMPORT_MAX_ERRORS):
+    """
+    Stream employees from a CSV or NDJSON file into the database. An
+    ImportFileError stops the import; its `report` covers the rows before it.
+    """
+    importer = EmployeeImporter(created_by=created_by, chunk_size=chunk_size, max_errors=max_errors)
+    try:
+        return importer.run(read_rows(binary_stream, file_format))
+    except ImportFileError as e:
+        e.report = importer.report()
+        raise
@@ -0,0 +1,247 @@
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from http.client import HTTPConnection
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import AttendanceRecord, Employee
+from .seed_data import ADMIN_EMAIL, ADMIN_PASSWORD, Command as SeedCommand
+
+DB_TIMING_RE = re.compile(r'db;dur=([\d.]+)')
+
+ENDPOINTS = [
+    'login', 'employee_list', 'employee_search', 'attendance_list', 'mark',
+    'by_date', 'by_employee', 'today_stats', 'dashboard_stats',
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = 'Drives each API endpoint at fixed concurrency and reports latency percentiles and throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server; without it a local gunicorn is started')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for the local server (default: 2)')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='gunicorn threads per worker for the local server (default: 4)')
+        parser.add_argument('--employees', type=int, default=1000, help='Employees to seed (default: 1000)')
+        parser.add_argument('--days', type=int, default=30, help='Days of attendance to seed (default: 30)')
+        parser.add_argument('--no-seed', action='store_true', help='Benchmark the data already in the database')
+        parser.add_argument('--prefix', default='BENCH',
+                            help='Employee ID prefix of the benchmark dataset, seeded and requested (default: BENCH)')
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                            help=f'Comma-separated endpoints to run (default: all of {", ".join(ENDPOINTS)})')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint (default: 200)')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per endpoint first (default: 20)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once (default: 8)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the dataset and request mix')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='JSON report to compare against; regressions fail the command')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 increase / throughput drop against the baseline (default: 0.2)')
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(sorted(unknown))}')
+        if options['requests'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--requests and --concurrency must be positive')
+        if options['tolerance'] < 0:
+            raise CommandError('--tolerance must not be negative')
+
+        if not options['no_seed']:
+            call_command(
+                'seed_data', employees=options['employees'], days=options['days'], seed=options['seed'],
+                prefix=options['prefix'], replace=True, stdout=self.stdout,
+            )
+        SeedCommand(stdout=self.stdout).get_admin()
+        # Only the benchmark dataset is requested, never other employees or
+        # days the seed did not cover
+        employees = Employee.objects.filter(employee_id__startswith=options['prefix'])
+        self.employee_ids = [str(pk) for pk in employees.order_by('employee_id').values_list('id', flat=True)[:1000]]
+        self.days = [
+            day.isoformat() for day in AttendanceRecord.objects.filter(
+                employee__employee_id__startswith=options['prefix']
+            ).dates('date', 'day', order='DESC')[:options['days']]
+        ]
+        if not self.employee_ids or not self.days:
+            raise CommandError('No employees or attendance to benchmark; run without --no-seed')
+
+        server = None
+        url = options['url']
+        if not url:
+            server, url = self.start_server(options['workers'], options['threads'])
+        try:
+            split = urlsplit(url)
+            self.host, self.port = split.hostname, split.port or 80
+            self.token = self.login_token()
+            results = {}
+            for name in endpoints:
+                # Its own request mix, so the timed run does not replay cached requests
+                self.run(name, options['warmup'], options['concurrency'], f'{options["seed"]}:warmup')
+                results[name] = self.run(name, options['requests'], options['concurrency'], options['seed'])
+                self.print_result(name, results[name])
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+        report = {
+            'created_at': datetime.now(dt_timezone.utc).isoformat(),
+            'config': {
+                key: options[key] for key in ('employees', 'days', 'prefix', 'requests', 'concurrency', 'seed', 'no_seed')
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        failures = [f'{name}: {result["errors"]} failed requests' for name, result in results.items() if result['errors']]
+        if options['baseline']:
+            failures += self.compare(results, options['baseline'], options['tolerance'])
+        if failures:
+            raise CommandError('Benchmark failed:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('✓ All endpoints within budget'))
+
+    def start_server(self, workers, threads):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'staff_hub_backend.wsgi', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning'],
+            env=os.environ.copy(),
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('The local gunicorn server exited during startup')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return server, f'http://127.0.0.1:{port}'
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError('The local gunicorn server did not start within 30 seconds')
+
+    def login_token(self):
+        status, body, _ = self.request(HTTPConnection(self.host, self.port, timeout=30), *self.login_request())
+        if status != 200:
+            raise CommandError(f'Login failed with status {status}: {body[:200]!r}')
+        return json.loads(body)['access']
+
+    def login_request(self):
+        return 'POST', '/api/auth/login/', {'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD}
+
+    def build_request(self, name, rng):
+        """(method, path, json body) for one request to `name`"""
+        day = rng.choice(self.days)
+        employee_id = rng.choice(self.employee_ids)
+        if name == 'login':
+            return self.login_request()
+        if name == 'employee_list':
+            return 'GET', '/api/employees/', None
+        if name == 'employee_search':
+            return 'GET', '/api/employees/?' + urlencode({'search': rng.choice(['smith', 'priya', 'lee kim'])}), None
+        if name == 'attendance_list':
+            return 'GET', '/api/attendance/?' + urlencode({'date': day}), None
+        if name == 'mark':
+            status = 'absent' if rng.random() < 0.1 else 'present'
+            return 'POST', '/api/attendance/mark/', {'employee_id': employee_id, 'date': day, 'status': status}
+        if name == 'by_date':
+            return 'GET', '/api/attendance/by_date/?' + urlencode({'date': day}), None
+        if name == 'by_employee':
+            return 'GET', '/api/attendance/by_employee/?' + urlencode({'employee_id': employee_id}), None
+        if name == 'today_stats':
+            return 'GET', '/api/attendance/today_stats/', None
+        return 'GET', '/api/dashboard/stats/', None
+
+    def request(self, connection, method, path, body):
+        headers = {'Content-Type': 'application/json'}
+        if getattr(self, 'token', None) and path != '/api/auth/login/':
+            headers['Authorization'] = f'Bearer {self.token}'
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read(), response.getheader('Server-Timing') or ''
+
+    def run(self, name, count, concurrency, seed):
+        def worker(index):
+            rng = random.Random(f'{seed}:{name}:{index}')
+            connection = HTTPConnection(self.host, self.port, timeout=60)
+            samples = []
+            for _ in range(count // concurrency + (index < count % concurrency)):
+                start = time.perf_counter()
+                try:
+                    status, _, timing = self.request(connection, *self.build_request(name, rng))
+                except OSError:
+                    connection.close()
+                    status, timing = 0, ''
+                elapsed = time.perf_counter() - start
+                db_match = DB_TIMING_RE.search(timing)
+                samples.append((elapsed, status, float(db_match.group(1)) if db_match else None))
+            connection.close()
+            return samples
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = [sample for worker_samples in pool.map(worker, range(concurrency)) for sample in worker_samples]
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(sample[0] * 1000 for sample in samples)
+        db_times = sorted(sample[2] for sample in samples if sample[2] is not None)
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for sample in samples if not 200 <= sample[1] < 300),
+            'rps': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'db_p50_ms': round(percentile(db_times, 50), 2),
+        }
+
+    def print_result(self, name, result):
+        self.stdout.write(
+            f'{name:>16}: {result["rps"]:8.1f} req/s  p50 {result["p50_ms"]:8.2f}ms  '
+            f'p95 {result["p95_ms"]:8.2f}ms  p99 {result["p99_ms"]:8.2f}ms  '
+            f'db p50 {result["db_p50_ms"]:7.2f}ms  errors {result["errors"]}'
+        )
+
+    def compare(self, results, baseline_path, tolerance):
+        """Regressions against a saved report, as messages"""
+        try:
+            with open(baseline_path) as baseline_file:
+                baseline = json.load(baseline_file)['endpoints']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Could not read the baseline {baseline_path}: {exc}')
+
+        failures = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                failures.append(f'{name}: p95 {result["p95_ms"]}ms, baseline {previous["p95_ms"]}ms')
+            if result['rps'] < previous['rps'] * (1 - tolerance):
+                failures.append(f'{name}: {result["rps"]} req/s, baseline {previous["rps"]} req/s')
+        return failures
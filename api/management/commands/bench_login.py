@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory
+from api import async_auth, views
+
+User = get_user_model()
+
+BENCH_EMAIL = 'bench-login@example.com'
+BENCH_PASSWORD = 'bench-login-password'
+
+
+class Command(BaseCommand):
+    help = 'Measures logins per second per core for the sync and async login paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200, help='Logins to perform per path')
+        parser.add_argument('--concurrency', type=int, default=32, help='Logins in flight at once')
+        parser.add_argument('--path', choices=['sync', 'async', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=BENCH_EMAIL).first()
+        if user is None:
+            user = User.objects.create_user(email=BENCH_EMAIL, password=BENCH_PASSWORD, name='Login Benchmark')
+        else:
+            user.set_password(BENCH_PASSWORD)
+            user.save()
+
+        body = json.dumps({'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})
+        try:
+            if options['path'] in ('sync', 'both'):
+                elapsed = self.run_sync(body, options['logins'], options['concurrency'])
+                self.report('sync', options['logins'], elapsed, options['concurrency'])
+            if options['path'] in ('async', 'both'):
+                elapsed = asyncio.run(self.run_async(body, options['logins'], options['concurrency']))
+                async_auth.last_logins.flush()
+                self.report('async', options['logins'], elapsed, settings.PASSWORD_HASH_WORKERS)
+        finally:
+            user.delete()
+
+    def run_sync(self, body, logins, concurrency):
+        factory = RequestFactory()
+
+        def login(_):
+            response = views.login(factory.post('/api/auth/login/', body, content_type='application/json'))
+            assert response.status_code == 200, response.data
+
+        # One thread per simulated sync worker
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(login, range(logins)))
+        return time.perf_counter() - start
+
+    async def run_async(self, body, logins, concurrency):
+        factory = AsyncRequestFactory()
+        limit = asyncio.Semaphore(concurrency)
+
+        async def login():
+            async with limit:
+                response = await async_auth.login(
+                    factory.post('/api/auth/login/', body, content_type='application/json')
+                )
+                assert response.status_code == 200, response.content
+
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        return time.perf_counter() - start
+
+    def report(self, name, logins, elapsed, threads):
+        cores = min(threads, os.cpu_count() or 1)
+        rate = logins / elapsed
+        self.stdout.write(self.style.SUCCESS(
+            f'{name:>5}: {logins} logins in {elapsed:.2f}s = {rate:.1f} logins/s, '
+            f'{rate / cores:.1f} logins/s per core ({cores} cores, '
+            f'{settings.PASSWORD_HASH_ITERATIONS} PBKDF2 iterations)'
+        ))
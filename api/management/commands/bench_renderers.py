@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.encoders import RowEncoder
+from api.middleware import brotli, compress_brotli, compress_gzip
+from api.models import AttendanceRecord, Employee
+from api.renderers import ColumnarJSONRenderer, FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from api.serializers import AttendanceRecordSerializer, EmployeeSerializer
+
+from .bench_serializers import Rollback, create_bench_data
+
+
+class Command(BaseCommand):
+    help = 'Compares payload size and encode time of each response format and compression on temporary data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per list page')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per format; the best is reported')
+
+    def handle(self, *args, **options):
+        renderers = [
+            ('json', JSONRenderer()),
+            ('fast-json' if orjson else 'fast-json (no orjson)', FastJSONRenderer()),
+            ('columnar', ColumnarJSONRenderer()),
+        ]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+        codings = [('gzip', compress_gzip)]
+        if brotli is not None:
+            codings.append(('br', compress_brotli))
+
+        # Everything is created inside a transaction that is rolled back at the end
+        try:
+            with transaction.atomic():
+                create_bench_data(options['rows'])
+                pages = [
+                    ('employees', self.page(EmployeeSerializer, Employee.objects.order_by('-created_at'))),
+                    ('attendance', self.page(AttendanceRecordSerializer, AttendanceRecord.objects.all())),
+                ]
+                raise Rollback
+        except Rollback:
+            pass
+
+        for name, page in pages:
+            self.stdout.write(f'{name} ({len(page["results"])} rows)')
+            for label, renderer in renderers:
+                seconds, content = self.best_of(lambda: renderer.render(page), options['repeat'])
+                columns = [f'{len(content):>9} B {seconds * 1000:7.2f}ms']
+                for coding, compress in codings:
+                    coding_seconds, compressed = self.best_of(lambda: compress(content), options['repeat'])
+                    columns.append(f'{coding} {len(compressed):>8} B {coding_seconds * 1000:7.2f}ms')
+                self.stdout.write(f'  {label:>22}: ' + ' | '.join(columns))
+
+    def page(self, serializer_class, queryset):
+        """A paginated list payload as the list endpoints build it"""
+        request = Request(RequestFactory().get('/'))
+        encoder = RowEncoder.for_serializer(serializer_class(context={'request': request}))
+        rows = encoder.encode_many(encoder.values(queryset))
+        return {'count': len(rows), 'next': 'http://testserver/?page=2', 'previous': None, 'results': rows}
+
+    def best_of(self, run, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            output = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
@@ -0,0 +1,91 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.bulk import upsert_attendance
+from api.encoders import RowEncoder
+from api.models import AttendanceRecord, Employee
+from api.serializers import AttendanceRecordSerializer, EmployeeSerializer
+
+
+def create_bench_data(rows):
+    """`rows` employees and `rows` attendance records; call inside a rolled-back transaction"""
+    employees = Employee.objects.bulk_create([
+        Employee(
+            employee_id=f'BENCH{i:06d}',
+            full_name=f'Bench Employee {i}',
+            email=f'bench{i}@example.com',
+            department=Employee.DEPARTMENTS[i % len(Employee.DEPARTMENTS)][0],
+        )
+        for i in range(rows)
+    ])
+    start = date(2024, 1, 1)
+    upsert_attendance([
+        (employees[i % len(employees)].id, start + timedelta(days=i // len(employees)), 'present' if i % 5 else 'absent')
+        for i in range(rows)
+    ])
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compares ModelSerializer and precompiled row encoder list serialization on temporary data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows per list')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per path; the best is reported')
+        parser.add_argument('--fields', default='', help='Optional ?fields= value to benchmark a sparse fieldset')
+
+    def handle(self, *args, **options):
+        # Everything is created inside a transaction that is rolled back at the end
+        try:
+            with transaction.atomic():
+                create_bench_data(options['rows'])
+                request = Request(RequestFactory().get('/', {'fields': options['fields']} if options['fields'] else {}))
+                self.compare('employees', EmployeeSerializer, Employee.objects.order_by('-created_at'),
+                             request, options['repeat'])
+                self.compare('attendance', AttendanceRecordSerializer, AttendanceRecord.objects.all(),
+                             request, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def compare(self, name, serializer_class, queryset, request, repeat):
+        encoder = RowEncoder.for_serializer(serializer_class(context={'request': request}))
+        if encoder is None:
+            raise CommandError(f'No row encoder can be compiled for {serializer_class.__name__}')
+
+        # Fresh querysets each run so neither path is served from a result cache
+        def serializer_path():
+            rows = serializer_class.restrict_queryset(queryset.all(), request)
+            return JSONRenderer().render(serializer_class(rows, many=True, context={'request': request}).data)
+
+        def encoder_path():
+            return JSONRenderer().render(encoder.encode_many(encoder.values(queryset.all())))
+
+        serializer_seconds, expected = self.best_of(serializer_path, repeat)
+        encoder_seconds, actual = self.best_of(encoder_path, repeat)
+        if actual != expected:
+            raise CommandError(f'{name}: encoder output differs from the serializer output')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{name:>10}: serializer {serializer_seconds * 1000:.1f}ms, '
+            f'encoder {encoder_seconds * 1000:.1f}ms '
+            f'({serializer_seconds / encoder_seconds:.1f}x, {len(expected)} identical bytes)'
+        ))
+
+    def best_of(self, run, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            output = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
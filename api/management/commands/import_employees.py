@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from api.importers import IMPORT_CHUNK_SIZE, IMPORT_FORMATS, ImportFileError, detect_format, import_employees
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports employees from a CSV or NDJSON file in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import')
+        parser.add_argument('--format', dest='file_format', choices=IMPORT_FORMATS,
+                            help='File format (detected from the extension by default)')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help='Rows validated and inserted per batch')
+        parser.add_argument('--created-by', help='Email of the user recorded as creator')
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or detect_format(options['path'])
+        if not file_format:
+            raise CommandError('Could not detect the file format, pass --format')
+
+        created_by = None
+        if options['created_by']:
+            try:
+                created_by = User.objects.get(email=options['created_by'])
+            except User.DoesNotExist:
+                raise CommandError(f'User not found: {options["created_by"]}')
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = import_employees(
+                    stream, file_format, created_by=created_by, chunk_size=options['chunk_size']
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        except ImportFileError as e:
+            raise CommandError(f'{e} ({e.report["created"]} employees from earlier lines were imported)')
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f'Line {error["line"]}: {error["errors"]}'))
+        if report['errors_omitted']:
+            self.stdout.write(self.style.WARNING(f'... and {report["errors_omitted"]} more rejected lines'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Imported {report["created"]} of {report["total"]} employees '
+            f'({report["failed"]} rejected)'
+        ))
@@ -0,0 +1,180 @@
+import csv
+import gzip
+import io
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import AttendanceRecord, Employee
+
+User = get_user_model()
+
+STAGING_TABLE = 'badge_swipes_staging'
+
+# One statement: every distinct (employee, day) in the staging table becomes
+# a present record. Records that are already present are left untouched, so
+# re-running a file changes nothing. Inserted rows come back with the id
+# generated here; updated rows keep their own (xmax = 0 is not available on
+# partitioned tables).
+MERGE_SQL = f"""
+    WITH swipes AS (
+        SELECT gen_random_uuid() AS id, employee_id, date
+        FROM (SELECT DISTINCT employee_id, date FROM {STAGING_TABLE}) days
+    ),
+    merged AS (
+        INSERT INTO {AttendanceRecord._meta.db_table} AS r (id, employee_id, date, status, created_at, marked_by_id)
+        SELECT id, employee_id, date, 'present', now(), %(marked_by)s FROM swipes
+        ON CONFLICT (employee_id, date) DO UPDATE
+        SET status = EXCLUDED.status, marked_by_id = EXCLUDED.marked_by_id, updated_at = now()
+        WHERE r.status IS DISTINCT FROM EXCLUDED.status
+        RETURNING r.id
+    )
+    SELECT
+        (SELECT count(*) FROM swipes),
+        count(*) FILTER (WHERE swipes.id IS NOT NULL),
+        count(*) FILTER (WHERE swipes.id IS NULL)
+    FROM merged LEFT JOIN swipes USING (id)
+"""
+
+
+def open_binary(path):
+    """Open a CSV file, gzipped or not, for streaming"""
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+class Command(BaseCommand):
+    help = 'Loads turnstile badge swipe CSV files into attendance with COPY and one set-based upsert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='CSV files of badge swipes (optionally .gz)')
+        parser.add_argument('--badge-column', default='badge_number',
+                            help='Column holding the badge number, i.e. the employee ID (default: badge_number)')
+        parser.add_argument('--time-column', default='timestamp',
+                            help='Column holding the swipe time (default: timestamp)')
+        parser.add_argument('--time-format',
+                            help='strptime format of the swipe time (default: ISO 8601); '
+                                 f'times without an offset are read as {timezone.get_default_timezone_name()}')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows per COPY statement (default: 50000)')
+        parser.add_argument('--marked-by', help='Email of the user recorded as having marked the attendance')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        marked_by = None
+        if options['marked_by']:
+            try:
+                marked_by = User.objects.get(email=options['marked_by'])
+            except User.DoesNotExist:
+                raise CommandError(f'User not found: {options["marked_by"]}')
+
+        self.verbosity = options['verbosity']
+        self.badge_column = options['badge_column']
+        self.time_column = options['time_column']
+        self.time_format = options['time_format']
+        self.rejected = Counter()
+        # Every badge number resolved from memory instead of a query per swipe
+        self.employees = dict(Employee.objects.values_list('employee_id', 'id'))
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Dropped at the end rather than ON COMMIT, which never comes when
+            # the command runs inside an outer transaction; a failure rolls
+            # the creation back
+            cursor.execute(f'CREATE TEMPORARY TABLE {STAGING_TABLE} (employee_id uuid NOT NULL, date date NOT NULL)')
+            staged = 0
+            for path in options['paths']:
+                try:
+                    with open_binary(path) as stream:
+                        staged += self.stage(cursor, path, stream, options['batch_size'])
+                except (OSError, EOFError) as e:
+                    raise CommandError(f'{path}: {e}')
+            cursor.execute(f'ANALYZE {STAGING_TABLE}')
+            cursor.execute(MERGE_SQL, {'marked_by': marked_by.pk if marked_by else None})
+            days, inserted, updated = cursor.fetchone()
+            cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+
+        rejected = sum(self.rejected.values())
+        if rejected:
+            reasons = ', '.join(f'{count} {reason}' for reason, count in self.rejected.most_common())
+            self.stdout.write(self.style.WARNING(f'Rejected {rejected} swipes: {reasons}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Loaded {staged} swipes into {days} attendance days: {inserted} inserted, {updated} updated, '
+            f'{days - inserted - updated} unchanged, {rejected} rejected'
+        ))
+
+    def stage(self, cursor, path, stream, batch_size):
+        """COPY the valid swipes of one file into the staging table"""
+        reader = csv.DictReader(self.decode_lines(path, stream))
+        try:
+            fieldnames = reader.fieldnames
+        except csv.Error as e:
+            raise CommandError(f'{path}:{reader.line_num}: {e}')
+        missing = {self.badge_column, self.time_column} - set(fieldnames or [])
+        if missing:
+            raise CommandError(f'{path}: missing column(s) {", ".join(sorted(missing))}')
+
+        lines = self.staging_lines(path, reader)
+        count = 0
+        while True:
+            batch = list(islice(lines, batch_size))
+            if not batch:
+                return count
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (employee_id, date) FROM STDIN', io.StringIO(''.join(batch))
+            )
+            count += len(batch)
+
+    def decode_lines(self, path, stream):
+        """
+        Decode one line at a time, rejecting lines that are not UTF-8. They
+        are replaced by blank lines, which the CSV reader skips, so its line
+        numbers still match the file.
+        """
+        for line_number, raw in enumerate(stream, start=1):
+            try:
+                yield raw.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+            except UnicodeDecodeError:
+                self.reject(path, line_number, 'not UTF-8')
+                yield '\n'
+
+    def staging_lines(self, path, reader):
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                self.reject(path, reader.line_num, 'malformed CSV')
+                continue
+            employee = self.employees.get((row[self.badge_column] or '').strip())
+            if employee is None:
+                self.reject(path, reader.line_num, 'unknown badge')
+                continue
+            day = self.swipe_date((row[self.time_column] or '').strip())
+            if day is None:
+                self.reject(path, reader.line_num, 'invalid time')
+                continue
+            yield f'{employee}\t{day.isoformat()}\n'
+
+    def swipe_date(self, value):
+        """The local date of a swipe time, or None"""
+        try:
+            if self.time_format:
+                moment = datetime.strptime(value, self.time_format)
+            else:
+                moment = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+        return moment.date()
+
+    def reject(self, path, line_number, reason):
+        self.rejected[reason] += 1
+        if self.verbosity >= 2:
+            self.stdout.write(self.style.WARNING(f'{path}:{line_number}: {reason}'))
@@ -0,0 +1,139 @@
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from api.models import AttendanceRecord, DailyAttendanceSummary, MonthlyAttendanceBitmap
+
+
+TABLE = AttendanceRecord._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+BOUND_RE = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def list_partitions(cursor):
+    """Return {name: (start, end)} for the monthly partitions"""
+    cursor.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        """,
+        [TABLE],
+    )
+    partitions = {}
+    for name, bound in cursor.fetchall():
+        match = BOUND_RE.search(bound)
+        if match:
+            partitions[name] = (date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2)))
+    return partitions
+
+
+class Command(BaseCommand):
+    help = 'Creates upcoming monthly attendance partitions and detaches or drops expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Months after the current one to create partitions for (default: 3)')
+        parser.add_argument('--retain-months', type=int,
+                            help='Full months before the current one to keep; older partitions expire')
+        parser.add_argument('--drop', action='store_true',
+                            help='Drop expired partitions instead of detaching them')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Print what would change without changing anything')
+
+    def handle(self, *args, **options):
+        if options['months_ahead'] < 0 or (options['retain_months'] is not None and options['retain_months'] < 0):
+            raise CommandError('Month counts must not be negative')
+
+        current = date.today().replace(day=1)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [TABLE])
+            if cursor.fetchone()[0] != 'p':
+                raise CommandError(f'{TABLE} is not a partitioned table; run the migrations first')
+
+            partitions = list_partitions(cursor)
+            # Upcoming months, plus any month whose rows fell into the default partition
+            months = {add_months(current, offset) for offset in range(options['months_ahead'] + 1)}
+            cursor.execute(f"SELECT DISTINCT date_trunc('month', date)::date FROM {DEFAULT_PARTITION}")
+            months.update(month for month, in cursor.fetchall())
+
+            created = []
+            for month in sorted(months):
+                name = partition_name(month)
+                if name not in partitions:
+                    created.append(month)
+                    partitions[name] = (month, add_months(month, 1))
+                    if not options['dry_run']:
+                        self.create_partition(cursor, month)
+
+            expired = []
+            if options['retain_months'] is not None:
+                cutoff = add_months(current, -options['retain_months'])
+                expired = sorted(
+                    (start, end, name) for name, (start, end) in partitions.items() if end <= cutoff
+                )
+                if not options['dry_run']:
+                    for start, end, name in expired:
+                        self.expire_partition(cursor, name, start, end, options['drop'])
+
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        prefix = 'Would have ' if options['dry_run'] else ''
+        for month in created:
+            self.stdout.write(f'{prefix}created {partition_name(month)}')
+        for _, _, name in expired:
+            self.stdout.write(f"{prefix}{'dropped' if options['drop'] else 'detached'} {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(created)} partitions created, {len(expired)} expired'
+        ))
+
+    def create_partition(self, cursor, month):
+        name = partition_name(month)
+        end = add_months(month, 1)
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s)',
+            [month, end],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                [month, end],
+            )
+            return
+
+        # Rows for this month landed in the default partition; move them into
+        # the new table before attaching it. Statement triggers on the parent
+        # do not fire, so the rollups stay as they are.
+        cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)')
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            [month, end],
+        )
+        cursor.execute(
+            f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+            [month, end],
+        )
+
+    def expire_partition(self, cursor, name, start, end, drop):
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+        if drop:
+            cursor.execute(f'DROP TABLE {name}')
+        # The rollups only describe records still in the table
+        DailyAttendanceSummary.objects.filter(date__gte=start, date__lt=end).delete()
+        MonthlyAttendanceBitmap.objects.filter(month__gte=start, month__lt=end).delete()
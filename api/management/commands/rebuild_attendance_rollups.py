@@ -0,0 +1,164 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from api.models import AttendanceRecord, DailyAttendanceSummary, DepartmentHeadcount, Employee, MonthlyAttendanceBitmap
+
+
+EXPECTED_SUMMARY_SQL = f"""
+    SELECT r.date, e.department,
+           COUNT(*) FILTER (WHERE r.status = 'present') AS present,
+           COUNT(*) FILTER (WHERE r.status = 'absent') AS absent
+    FROM {AttendanceRecord._meta.db_table} r
+    JOIN employees e ON e.id = r.employee_id
+    WHERE (%(start)s::date IS NULL OR r.date >= %(start)s::date)
+      AND (%(end)s::date IS NULL OR r.date <= %(end)s::date)
+    GROUP BY r.date, e.department
+"""
+
+# Bitmaps cover whole months, so the range widens to the months it touches
+DAY_BIT = "(1 << (extract(day FROM date)::int - 1))"
+EXPECTED_BITMAPS_SQL = f"""
+    SELECT employee_id, date_trunc('month', date)::date AS month,
+           COALESCE(bit_or({DAY_BIT}) FILTER (WHERE status = 'present'), 0) AS present_bits,
+           COALESCE(bit_or({DAY_BIT}) FILTER (WHERE status = 'absent'), 0) AS absent_bits
+    FROM {AttendanceRecord._meta.db_table}
+    WHERE (%(start)s::date IS NULL OR date >= date_trunc('month', %(start)s::date))
+      AND (%(end)s::date IS NULL OR date < date_trunc('month', %(end)s::date) + interval '1 month')
+    GROUP BY 1, 2
+"""
+
+# Headcounts are tiny, so they are always rebuilt whole whatever the range
+EXPECTED_HEADCOUNTS_SQL = f"""
+    SELECT department, COUNT(*) FROM {Employee._meta.db_table} GROUP BY department
+"""
+
+
+def month_start(value):
+    return date.fromisoformat(value).replace(day=1)
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds or verifies the attendance rollup tables from raw attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Compare the rollups with raw records without changing anything')
+        parser.add_argument('--start-date', help='First date to process (YYYY-MM-DD); bitmaps use its whole month')
+        parser.add_argument('--end-date', help='Last date to process (YYYY-MM-DD); bitmaps use its whole month')
+
+    def handle(self, *args, **options):
+        params = {'start': options['start_date'], 'end': options['end_date']}
+        if options['verify']:
+            self.verify(params)
+        else:
+            self.rebuild(params)
+
+    def summaries(self, params):
+        queryset = DailyAttendanceSummary.objects.all()
+        if params['start']:
+            queryset = queryset.filter(date__gte=params['start'])
+        if params['end']:
+            queryset = queryset.filter(date__lte=params['end'])
+        return queryset
+
+    def bitmaps(self, params):
+        queryset = MonthlyAttendanceBitmap.objects.all()
+        if params['start']:
+            queryset = queryset.filter(month__gte=month_start(params['start']))
+        if params['end']:
+            queryset = queryset.filter(month__lte=month_start(params['end']))
+        return queryset
+
+    def rebuild(self, params):
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Keep writers out while the counts are recomputed
+            cursor.execute(f'LOCK TABLE {AttendanceRecord._meta.db_table} IN SHARE MODE')
+            deleted, _ = self.summaries(params).delete()
+            cursor.execute(
+                f"""
+                INSERT INTO {DailyAttendanceSummary._meta.db_table} (date, department, present, absent)
+                {EXPECTED_SUMMARY_SQL}
+                """,
+                params,
+            )
+            inserted = cursor.rowcount
+
+            deleted_bitmaps, _ = self.bitmaps(params).delete()
+            cursor.execute(
+                f"""
+                INSERT INTO {MonthlyAttendanceBitmap._meta.db_table} (employee_id, month, present_bits, absent_bits)
+                {EXPECTED_BITMAPS_SQL}
+                """,
+                params,
+            )
+            inserted_bitmaps = cursor.rowcount
+
+            cursor.execute(f'LOCK TABLE {Employee._meta.db_table} IN SHARE MODE')
+            DepartmentHeadcount.objects.all().delete()
+            cursor.execute(
+                f'INSERT INTO {DepartmentHeadcount._meta.db_table} (department, employees) {EXPECTED_HEADCOUNTS_SQL}'
+            )
+            inserted_headcounts = cursor.rowcount
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rebuilt daily attendance summaries ({deleted} removed, {inserted} written)'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rebuilt monthly attendance bitmaps ({deleted_bitmaps} removed, {inserted_bitmaps} written)'
+        ))
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt department headcounts ({inserted_headcounts} written)'))
+
+    def verify(self, params):
+        with connection.cursor() as cursor:
+            cursor.execute(EXPECTED_SUMMARY_SQL, params)
+            expected = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+            cursor.execute(EXPECTED_BITMAPS_SQL, params)
+            expected_bitmaps = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+            cursor.execute(EXPECTED_HEADCOUNTS_SQL)
+            expected_headcounts = {(department, 'employees'): count for department, count in cursor.fetchall()}
+
+        stored = {
+            (date_value, department): (present, absent)
+            for date_value, department, present, absent in self.summaries(params).values_list(
+                'date', 'department', 'present', 'absent'
+            )
+            if present or absent
+        }
+        stored_bitmaps = {
+            (employee_id, month): (present_bits, absent_bits)
+            for employee_id, month, present_bits, absent_bits in self.bitmaps(params).values_list(
+                'employee_id', 'month', 'present_bits', 'absent_bits'
+            )
+            if present_bits or absent_bits
+        }
+        stored_headcounts = {
+            (department, 'employees'): count
+            for department, count in DepartmentHeadcount.objects.values_list('department', 'employees')
+            if count
+        }
+
+        mismatches = self.compare('daily summary', expected, stored)
+        mismatches += self.compare('monthly bitmap', expected_bitmaps, stored_bitmaps)
+        mismatches += self.compare('department headcount', expected_headcounts, stored_headcounts, empty=0)
+        if mismatches:
+            raise CommandError(f'{mismatches} attendance rollups are out of date')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Daily attendance summaries match raw records ({len(expected)} checked)'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Monthly attendance bitmaps match raw records ({len(expected_bitmaps)} checked)'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Department headcounts match employees ({len(expected_headcounts)} checked)'
+        ))
+
+    def compare(self, label, expected, stored, empty=(0, 0)):
+        mismatches = sorted(set(expected) | set(stored), key=str)
+        mismatches = [key for key in mismatches if expected.get(key) != stored.get(key)]
+        for first, second in mismatches:
+            self.stdout.write(self.style.WARNING(
+                f'{label} {first} {second}: expected {expected.get((first, second), empty)}, '
+                f'stored {stored.get((first, second), empty)}'
+            ))
+        return len(mismatches)
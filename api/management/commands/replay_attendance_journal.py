@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.write_behind import JOURNAL_PATTERN, REJECTED_PATTERN, recover_journals
+
+
+class Command(BaseCommand):
+    help = 'Writes the attendance marks left in write-behind journals by processes that are no longer running'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--journal-dir', default=settings.ATTENDANCE_WRITE_BEHIND_JOURNAL_DIR,
+                            help='Journal directory (default: ATTENDANCE_WRITE_BEHIND_JOURNAL_DIR)')
+        parser.add_argument('--rejected', action='store_true',
+                            help='Retry the marks set aside in rejected-*.log files instead')
+
+    def handle(self, *args, **options):
+        pattern = REJECTED_PATTERN if options['rejected'] else JOURNAL_PATTERN
+        count = recover_journals(options['journal_dir'], pattern)
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {count} journaled attendance marks'))
@@ -1,132 +1,229 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from api.models import Employee, AttendanceRecord
-from datetime import date, timedelta
+import io
 import random
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from itertools import groupby, islice
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.models import AttendanceRecord, Employee, MonthlyAttendanceBitmap
+from .manage_attendance_partitions import (
+    DEFAULT_PARTITION,
+    TABLE,
+    Command as PartitionCommand,
+    add_months,
+    list_partitions,
+    partition_name,
+)
 
 User = get_user_model()
 
+ADMIN_EMAIL = 'admin@hrms.com'
+ADMIN_PASSWORD = 'admin123'
+
+FIRST_NAMES = [
+    'John', 'Jane', 'Mike', 'Sarah', 'David', 'Emily', 'Robert', 'Lisa', 'James', 'Maria',
+    'Daniel', 'Laura', 'Kevin', 'Anna', 'Thomas', 'Priya', 'Carlos', 'Aisha', 'Wei', 'Olga',
+]
+LAST_NAMES = [
+    'Doe', 'Smith', 'Johnson', 'Williams', 'Brown', 'Davis', 'Miller', 'Anderson', 'Garcia', 'Lee',
+    'Martin', 'Clark', 'Lewis', 'Walker', 'Young', 'Patel', 'Nguyen', 'Khan', 'Kim', 'Novak',
+]
+
+EMPLOYEE_COLUMNS = ['id', 'employee_id', 'full_name', 'email', 'department', 'created_at', 'created_by_id']
+ATTENDANCE_COLUMNS = ['id', 'employee_id', 'date', 'status', 'created_at', 'marked_by_id']
+
+
+def parse_department_mix(value):
+    """'Engineering=5,Sales=2' -> [('Engineering', 5.0), ('Sales', 2.0)]; empty means an even mix"""
+    departments = [code for code, _ in Employee.DEPARTMENTS]
+    if not value:
+        return [(department, 1.0) for department in departments]
+
+    mix = []
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in departments:
+            raise CommandError(f'Unknown department {name!r}; choose from {", ".join(departments)}')
+        try:
+            weight = float(weight) if weight else 1.0
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name}: {weight!r}')
+        if weight <= 0:
+            raise CommandError(f'The weight for {name} must be positive')
+        mix.append((name, weight))
+    return mix
+
+
+def random_uuid(rng):
+    # Postgres accepts UUIDs as 32 hex digits; drawn from rng so --seed reproduces them
+    return f'{rng.getrandbits(128):032x}'
+
 
 class Command(BaseCommand):
-    help = 'Seeds the database with initial data'
+    help = 'Generates a reproducible synthetic dataset of employees and attendance'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100, help='Employees to create (default: 100)')
+        parser.add_argument('--departments', default='',
+                            help='Department weights, e.g. "Engineering=5,Sales=2,HR=1" (default: even mix)')
+        parser.add_argument('--days', type=int, default=30, help='Calendar days of attendance (default: 30)')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                            help='Last day of attendance, YYYY-MM-DD (default: today)')
+        parser.add_argument('--include-weekends', action='store_true',
+                            help='Also mark attendance on Saturdays and Sundays')
+        parser.add_argument('--absence-rate', type=float, default=0.1,
+                            help='Average share of absent days, varied per employee (default: 0.1)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same options give the same data')
+        parser.add_argument('--prefix', default='EMP', help='Employee ID prefix (default: EMP)')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows per COPY statement (default: 50000)')
+        parser.add_argument('--replace', action='store_true',
+                            help='Delete existing employees with the prefix, and their attendance, first')
+
+    def handle(self, *args, **options):
+        if options['employees'] < 0 or options['days'] < 0 or options['batch_size'] <= 0:
+            raise CommandError('--employees and --days must not be negative, and --batch-size must be positive')
+        if not 0 <= options['absence_rate'] <= 1:
+            raise CommandError('--absence-rate must be between 0 and 1')
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write('Seeding database...')
+        self.verbosity = options['verbosity']
+        # Seeded per prefix, so datasets with different prefixes never share ids
+        rng = random.Random(f"{options['seed']}:{options['prefix']}")
+        mix = parse_department_mix(options['departments'])
+        end = options['end_date'] or date.today()
+        days = [end - timedelta(days=offset) for offset in range(options['days'] - 1, -1, -1)]
+        if not options['include_weekends']:
+            days = [day for day in days if day.weekday() < 5]
 
-        # Create admin user if not exists
-        if not User.objects.filter(email='admin@hrms.com').exists():
+        admin = self.get_admin()
+        start = time.perf_counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            self.clear(cursor, options['prefix'], options['replace'])
+            employees = self.create_employees(cursor, rng, options['employees'], mix, options['prefix'], admin, end)
+            records = self.create_attendance(
+                cursor, rng, employees, days, options['absence_rate'], admin, options['batch_size']
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Employee._meta.db_table}, {AttendanceRecord._meta.db_table}')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Created {len(employees)} employees and {records} attendance records '
+            f'over {len(days)} days in {elapsed:.1f}s ({records / elapsed if elapsed else 0:.0f} records/s)'
+        ))
+        self.stdout.write(self.style.SUCCESS(f'  Login with {ADMIN_EMAIL} / {ADMIN_PASSWORD}'))
+
+    def get_admin(self):
+        admin = User.objects.filter(email=ADMIN_EMAIL).first()
+        if admin is None:
             admin = User.objects.create_user(
-                email='admin@hrms.com',
-                password='admin123',
+                email=ADMIN_EMAIL,
+                password=ADMIN_PASSWORD,
                 name='Admin User',
                 role='Administrator',
                 department='Management'
             )
             self.stdout.write(self.style.SUCCESS(f'✓ Created admin user: {admin.email}'))
-        else:
-            admin = User.objects.get(email='admin@hrms.com')
-            self.stdout.write(self.style.WARNING('Admin user already exists'))
-
-        # Sample employees data
-        employees_data = [
-            {
-                'employee_id': 'EMP001',
-                'full_name': 'John Doe',
-                'email': 'john.doe@company.com',
-                'department': 'Engineering'
-            },
-            {
-                'employee_id': 'EMP002',
-                'full_name': 'Jane Smith',
-                'email': 'jane.smith@company.com',
-                'department': 'Design'
-            },
-            {
-                'employee_id': 'EMP003',
-                'full_name': 'Mike Johnson',
-                'email': 'mike.johnson@company.com',
-                'department': 'Marketing'
-            },
-            {
-                'employee_id': 'EMP004',
-                'full_name': 'Sarah Williams',
-                'email': 'sarah.williams@company.com',
-                'department': 'Sales'
-            },
-            {
-                'employee_id': 'EMP005',
-                'full_name': 'David Brown',
-                'email': 'david.brown@company.com',
-                'department': 'HR'
-            },
-            {
-                'employee_id': 'EMP006',
-                'full_name': 'Emily Davis',
-                'email': 'emily.davis@company.com',
-                'department': 'Finance'
-            },
-            {
-                'employee_id': 'EMP007',
-                'full_name': 'Robert Miller',
-                'email': 'robert.miller@company.com',
-                'department': 'Operations'
-            },
-            {
-                'employee_id': 'EMP008',
-                'full_name': 'Lisa Anderson',
-                'email': 'lisa.anderson@company.com',
-                'department': 'Engineering'
-            },
-        ]
-
-        # Create employees
-        created_employees = []
-        for emp_data in employees_data:
-            employee, created = Employee.objects.get_or_create(
-                employee_id=emp_data['employee_id'],
-                defaults={
-                    'full_name': emp_data['full_name'],
-                    'email': emp_data['email'],
-                    'department': emp_data['department'],
-                    'created_by': admin
-                }
+        return admin
+
+    def clear(self, cursor, prefix, replace):
+        employees = Employee.objects.filter(employee_id__startswith=prefix)
+        if not employees.exists():
+            return
+        if not replace:
+            raise CommandError(f'Employees with IDs starting with {prefix!r} already exist; pass --replace to delete them')
+
+        # Set-based deletes; the ORM's cascade would load every record first
+        selected = f'SELECT id FROM {Employee._meta.db_table} WHERE starts_with(employee_id, %s)'
+        for model in (MonthlyAttendanceBitmap, AttendanceRecord):
+            cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE employee_id IN ({selected})', [prefix])
+        cursor.execute(f'DELETE FROM {Employee._meta.db_table} WHERE starts_with(employee_id, %s)', [prefix])
+        self.stdout.write(self.style.WARNING(f'Deleted {cursor.rowcount} existing employees'))
+
+    def copy(self, cursor, table, columns, lines):
+        cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN', io.StringIO(''.join(lines)))
+
+    def create_employees(self, cursor, rng, count, mix, prefix, admin, end):
+        """Insert `count` employees and return [(id, absence_weight)]"""
+        departments = [name for name, _ in mix]
+        weights = [weight for _, weight in mix]
+        hired = datetime.combine(end, datetime.min.time(), tzinfo=dt_timezone.utc) - timedelta(seconds=count)
+
+        employees = []
+        lines = []
+        for n in range(1, count + 1):
+            pk = random_uuid(rng)
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            department = rng.choices(departments, weights)[0]
+            # Some people are absent far more often than others
+            employees.append((pk, rng.uniform(0.25, 1.75)))
+            employee_id = f'{prefix}{n:06d}'
+            lines.append('\t'.join([
+                pk,
+                employee_id,
+                f'{first} {last}',
+                f'{first}.{last}.{employee_id}@company.com'.lower(),
+                department,
+                (hired + timedelta(seconds=n)).isoformat(),
+                str(admin.pk),
+            ]) + '\n')
+        self.copy(cursor, Employee._meta.db_table, EMPLOYEE_COLUMNS, lines)
+        self.stdout.write(f'Created {count} employees')
+        return employees
+
+    def create_attendance(self, cursor, rng, employees, days, absence_rate, admin, batch_size):
+        partitions = list_partitions(cursor)
+        total = 0
+        bypassed_triggers = False
+        for month, month_days in groupby(days, key=lambda day: day.replace(day=1)):
+            lines = self.attendance_lines(rng, employees, month_days, absence_rate, admin)
+            name = partition_name(month)
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s)',
+                [month, add_months(month, 1)],
             )
-            if created:
-                created_employees.append(employee)
-                self.stdout.write(self.style.SUCCESS(f'✓ Created employee: {employee.full_name}'))
+            if name in partitions or cursor.fetchone()[0]:
+                if name not in partitions:
+                    PartitionCommand().create_partition(cursor, month)
+                total += self.copy_batches(cursor, TABLE, lines, batch_size)
             else:
-                created_employees.append(employee)
-                self.stdout.write(self.style.WARNING(f'Employee already exists: {employee.full_name}'))
-
-        # Create attendance records for the last 7 days
-        if created_employees:
-            self.stdout.write('\nCreating attendance records...')
-            today = date.today()
-            
-            for i in range(7):
-                attendance_date = today - timedelta(days=i)
-                
-                for employee in created_employees:
-                    # Random attendance status (90% present, 10% absent)
-                    status = 'present' if random.random() < 0.9 else 'absent'
-                    
-                    attendance, created = AttendanceRecord.objects.get_or_create(
-                        employee=employee,
-                        date=attendance_date,
-                        defaults={
-                            'status': status,
-                            'marked_by': admin
-                        }
-                    )
-                    
-                    if created:
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'✓ Marked {employee.full_name} as {status} on {attendance_date}'
-                            )
-                        )
-
-        self.stdout.write(self.style.SUCCESS('\n✓ Database seeding completed successfully!'))
-        self.stdout.write(self.style.SUCCESS('\nYou can now login with:'))
-        self.stdout.write(self.style.SUCCESS('  Email: admin@hrms.com'))
-        self.stdout.write(self.style.SUCCESS('  Password: admin123'))
+                # A new month goes into a bare table that is attached once full, so
+                # its indexes are built in one pass instead of row by row. The
+                # rollup triggers do not see these rows; the rollups are rebuilt below.
+                cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)')
+                total += self.copy_batches(cursor, name, lines, batch_size)
+                cursor.execute(
+                    f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+                    [month, add_months(month, 1)],
+                )
+                bypassed_triggers = True
+            if self.verbosity >= 2:
+                self.stdout.write(f'  {total} attendance records (through {month:%Y-%m})')
+
+        if bypassed_triggers:
+            call_command(
+                'rebuild_attendance_rollups', start_date=days[0].isoformat(), end_date=days[-1].isoformat(),
+                stdout=self.stdout,
+            )
+        return total
+
+    def attendance_lines(self, rng, employees, days, absence_rate, admin):
+        marked_by = str(admin.pk)
+        for day in days:
+            created_at = f'{day.isoformat()} 09:00:00+00'
+            for pk, weight in employees:
+                status = 'absent' if rng.random() < absence_rate * weight else 'present'
+                yield f'{random_uuid(rng)}\t{pk}\t{day.isoformat()}\t{status}\t{created_at}\t{marked_by}\n'
+
+    def copy_batches(self, cursor, table, lines, batch_size):
+        count = 0
+        while True:
+            batch = list(islice(lines, batch_size))
+            if not batch:
+                return count
+            self.copy(cursor, table, ATTENDANCE_COLUMNS, batch)
+            count += len(batch)
@@ -0,0 +1,58 @@
+import calendar
+from functools import lru_cache
+
+from django.db.models import FilteredRelation, Q
+
+from .models import Employee
+
+
+PRESENT_CODE = 'P'
+ABSENT_CODE = 'A'
+UNMARKED_CODE = '-'
+
+
+@lru_cache(maxsize=None)
+def byte_codes(present, absent):
+    """Status codes for the 8 days covered by one byte of each bitmap"""
+    return ''.join(
+        PRESENT_CODE if present >> day & 1 else ABSENT_CODE if absent >> day & 1 else UNMARKED_CODE
+        for day in range(8)
+    )
+
+
+def encode_month(present_bits, absent_bits, days):
+    """Turn a month's bitmaps into one status code per day, e.g. 'PPA-P...'"""
+    return ''.join(
+        byte_codes(present_bits >> shift & 0xFF, absent_bits >> shift & 0xFF)
+        for shift in (0, 8, 16, 24)
+    )[:days]
+
+
+def attendance_matrix(month, department=None):
+    """
+    Employees x days grid for the month starting at `month`, as columnar
+    arrays in employee_id order, read with a single query.
+    """
+    days = calendar.monthrange(month.year, month.month)[1]
+    employees = Employee.objects.all()
+    if department:
+        employees = employees.filter(department=department)
+    rows = employees.annotate(
+        bitmap=FilteredRelation('attendance_bitmaps', condition=Q(attendance_bitmaps__month=month))
+    ).order_by('employee_id').values_list('id', 'employee_id', 'bitmap__present_bits', 'bitmap__absent_bits')
+
+    ids = []
+    employee_ids = []
+    statuses = []
+    for pk, employee_id, present_bits, absent_bits in rows:
+        ids.append(pk)
+        employee_ids.append(employee_id)
+        statuses.append(encode_month(present_bits or 0, absent_bits or 0, days))
+
+    return {
+        'month': f'{month:%Y-%m}',
+        'days': days,
+        'ids': ids,
+        'employee_ids': employee_ids,
+        'statuses': statuses,
+    }
@@ -0,0 +1,212 @@
+"""
+In-process request metrics in the Prometheus text format.
+
+RequestMetricsMiddleware (api/middleware.py) records every request here; the
+`/metrics` view renders the registry together with the connection pool and
+employee directory statistics. Each worker process keeps its own registry.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from staff_hub_backend.postgres_pool.base import pool_stats
+
+from .directory import get_directory
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Literals that vary between otherwise identical statements
+FINGERPRINT_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'"s\d+_x\d+"'), '?'),  # savepoint names
+    (re.compile(r'"_django_curs_\d+_\w+"'), '?'),  # server-side cursor names
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def fingerprint(sql):
+    """SQL with its literal values replaced, so repeats of one statement match"""
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryRecorder:
+    """Count, total time and statements of the SQL one request runs"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        """{fingerprint: executions} for statements run at least `threshold` times"""
+        fingerprints = Counter()
+        for sql, count in self.statements.items():
+            fingerprints[fingerprint(sql)] += count
+        return {sql: count for sql, count in fingerprints.items() if count >= threshold}
+
+
+# Follows the request into sync_to_async threads, unlike the connections
+_recorder = ContextVar('query_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection (see api/signals.py)"""
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.duration += time.perf_counter() - start
+        recorder.count += 1
+        recorder.statements[sql] += 1
+
+
+def start_recording(recorder=None):
+    """Record this context's queries into a new recorder, or resume `recorder`"""
+    recorder = recorder or QueryRecorder()
+    return recorder, _recorder.set(recorder)
+
+
+def stop_recording(token):
+    _recorder.reset(token)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket', labels + (('le', bound if bound == '+Inf' else format_value(float(bound))),), cumulative
+        yield f'{name}_sum', labels, self.total
+        yield f'{name}_count', labels, self.count
+
+
+class MetricsRegistry:
+    """Counters and histograms by metric name and label values"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def describe(self, name, kind, help_text):
+        with self.lock:
+            self.metrics.setdefault(name, (kind, help_text, {}))
+
+    def inc(self, name, labels=(), amount=1):
+        with self.lock:
+            series = self.metrics[name][2]
+            series[labels] = series.get(labels, 0) + amount
+
+    def set(self, name, labels, value):
+        with self.lock:
+            self.metrics[name][2][labels] = value
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            series = self.metrics[name][2]
+            if labels not in series:
+                series[labels] = Histogram(buckets)
+            series[labels].observe(value)
+
+    def clear(self):
+        with self.lock:
+            for _, _, series in self.metrics.values():
+                series.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (kind, help_text, series) in sorted(self.metrics.items()):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in sorted(series.items()):
+                    if isinstance(value, Histogram):
+                        for sample, sample_labels, sample_value in value.samples(name, labels):
+                            lines.append(f'{sample}{format_labels(sample_labels)} {format_value(sample_value)}')
+                    else:
+                        lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        return lines
+
+
+registry = MetricsRegistry()
+registry.describe('http_requests_total', 'counter', 'Requests by route, method and status')
+registry.describe('http_request_duration_seconds', 'histogram', 'Request latency by route')
+registry.describe('http_request_sql_duration_seconds', 'histogram', 'Time spent in SQL per request by route')
+registry.describe('http_request_queries', 'histogram', 'SQL queries per request by route')
+registry.describe('http_request_n_plus_one_total', 'counter', 'Requests that repeated one SQL statement many times')
+registry.describe('attendance_write_behind_pending', 'gauge', 'Buffered attendance marks not yet written')
+registry.describe('attendance_write_behind_coalesced_total', 'counter', 'Buffered marks replaced by a later mark')
+registry.describe('attendance_write_behind_flushed_total', 'counter', 'Buffered marks written to the database')
+registry.describe('attendance_write_behind_rejected_total', 'counter', 'Buffered marks set aside as unwritable')
+registry.describe('attendance_write_behind_flush_lag_seconds', 'histogram',
+                  'Time from accepting the oldest mark of a flush to writing it')
+
+
+def record_request(route, method, status, duration, sql_duration, queries, n_plus_one):
+    labels = (('route', route),)
+    registry.inc('http_requests_total', labels + (('method', method), ('status', str(status))))
+    registry.observe('http_request_duration_seconds', labels, duration, LATENCY_BUCKETS)
+    registry.observe('http_request_sql_duration_seconds', labels, sql_duration, LATENCY_BUCKETS)
+    registry.observe('http_request_queries', labels, queries, QUERY_COUNT_BUCKETS)
+    if n_plus_one:
+        registry.inc('http_request_n_plus_one_total', labels)
+
+
+def sample_lines(name, kind, help_text, samples):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    lines.extend(f'{name}{format_labels(labels)} {format_value(value)}' for labels, value in samples)
+    return lines
+
+
+def render_metrics():
+    """The full /metrics payload"""
+    lines = registry.render()
+
+    pools = sorted(pool_stats().items())
+    for stat, kind in [('size', 'gauge'), ('in_use', 'gauge'), ('idle', 'gauge'), ('checkouts', 'counter'),
+                       ('waits', 'counter'), ('timeouts', 'counter'), ('discarded', 'counter')]:
+        name = f'db_pool_{stat}' + ('_total' if kind == 'counter' else '')
+        samples = [((('alias', alias),), stats[stat]) for alias, stats in pools]
+        lines += sample_lines(name, kind, f'Connection pool {stat.replace("_", " ")}', samples)
+
+    directory = get_directory().stats()
+    lines += sample_lines('employee_directory_hits_total', 'counter', 'Employee directory hits', [((), directory['hits'])])
+    lines += sample_lines('employee_directory_misses_total', 'counter', 'Employee directory misses', [((), directory['misses'])])
+    lines += sample_lines('employee_directory_size', 'gauge', 'Employees held in the directory', [((), directory['size'])])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,259 @@
+import logging
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from .db_router import pin_user, routing_scope
+from .exports import gzip_chunks
+from .metrics import record_request, start_recording, stop_recording
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+ACCEPT_ENCODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+class PrimaryPinningMiddleware:
+    """
+    Read-your-writes for replica routing: after a successful write, the
+    client's reads stay on the primary for REPLICA_PIN_SECONDS.
+
+    The pin travels in a cookie, so it holds whichever worker process serves
+    the next request. It is also stored per user in the user cache for
+    clients that drop cookies, which only reaches other workers when
+    AUTH_USER_CACHE_ALIAS is a shared cache (see check api.W001).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_scope(self.is_pinned(request)):
+            response = self.get_response(request)
+        self.process_response(request, response)
+        return response
+
+    async def __acall__(self, request):
+        with routing_scope(self.is_pinned(request)):
+            response = await self.get_response(request)
+        self.process_response(request, response)
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def process_response(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        if not settings.DATABASE_REPLICAS:
+            return
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE,
+            str(time.time() + settings.REPLICA_PIN_SECONDS),
+            max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite='Lax',
+        )
+        pin_user(getattr(request, 'user', None))
+
+
+def accepted_encodings(header):
+    """Map each coding in an Accept-Encoding header to its q value"""
+    accepted = {}
+    for part in (header or '').split(','):
+        match = ACCEPT_ENCODING_RE.match(part)
+        if not match:
+            continue
+        try:
+            accepted[match.group(1).lower()] = float(match.group(2) or 1)
+        except ValueError:
+            continue
+    return accepted
+
+
+def compress_gzip(content):
+    return b''.join(gzip_chunks([content], settings.COMPRESSION_GZIP_LEVEL))
+
+
+def compress_brotli(content):
+    return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Brotli (when installed) or gzip for responses of at least
+    COMPRESSION_MIN_SIZE bytes, following the client's Accept-Encoding.
+
+    Streaming responses are left alone; the attendance export compresses
+    itself so its byte ranges stay resumable.
+    """
+
+    def get_codings(self):
+        codings = [('gzip', compress_gzip)]
+        if brotli is not None:
+            codings.insert(0, ('br', compress_brotli))
+        return codings
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+        for coding, compress in self.get_codings():
+            if accepted.get(coding, accepted.get('*', 0)) > 0:
+                break
+        else:
+            return response
+
+        compressed = compress(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+        # The body changed, so a strong ETag no longer matches it byte for byte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class RequestMetricsMiddleware:
+    """
+    Records each request's route, latency, SQL query count and SQL time into
+    the /metrics histograms, adds a Server-Timing header, and logs statements
+    repeated N_PLUS_ONE_THRESHOLD times or more as likely N+1 queries.
+
+    Streaming responses run most of their queries while the body is sent, so
+    they are recorded once the stream is exhausted or closed, and get no
+    Server-Timing header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REQUEST_METRICS:
+            return self.get_response(request)
+        start = time.perf_counter()
+        recorder, token = start_recording()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_recording(token)
+        if response.streaming:
+            self.record_stream(request, response, recorder, start)
+        else:
+            self.process_response(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_METRICS:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        recorder, token = start_recording()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_recording(token)
+        if response.streaming:
+            self.record_stream(request, response, recorder, start)
+        else:
+            self.process_response(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    def get_route(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        return match.view_name or match.route
+
+    def record(self, request, response, recorder, duration):
+        route = self.get_route(request)
+        repeated = recorder.repeated(settings.N_PLUS_ONE_THRESHOLD)
+        for sql, count in repeated.items():
+            logger.warning('Possible N+1 on %s %s (%s): %d executions of %s', request.method, request.path, route, count, sql)
+        record_request(
+            route, request.method, response.status_code, duration, recorder.duration, recorder.count, bool(repeated)
+        )
+
+    def record_stream(self, request, response, recorder, start):
+        if response.is_async:
+            response.streaming_content = self.arecord_chunks(
+                request, response, recorder, start, response.streaming_content
+            )
+        else:
+            response.streaming_content = self.record_chunks(
+                request, response, recorder, start, response.streaming_content
+            )
+
+    def record_chunks(self, request, response, recorder, start, content):
+        # The recorder is resumed around each step only, so it never leaks
+        # into the server code consuming the stream
+        iterator = iter(content)
+        try:
+            while True:
+                _, token = start_recording(recorder)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    stop_recording(token)
+                yield chunk
+        finally:
+            self.record(request, response, recorder, time.perf_counter() - start)
+
+    async def arecord_chunks(self, request, response, recorder, start, content):
+        iterator = aiter(content)
+        try:
+            while True:
+                _, token = start_recording(recorder)
+                try:
+                    chunk = await anext(iterator)
+                except StopAsyncIteration:
+                    return
+                finally:
+                    stop_recording(token)
+                yield chunk
+        finally:
+            self.record(request, response, recorder, time.perf_counter() - start)
+
+    def process_response(self, request, response, recorder, duration):
+        self.record(request, response, recorder, duration)
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"',
+                f'app;dur={(duration - recorder.duration) * 1000:.2f}',
+                f'total;dur={duration * 1000:.2f}',
+            ])
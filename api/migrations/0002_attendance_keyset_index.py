@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['date', 'employee', 'id'], name='attendance_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:43
+
+from django.db import migrations, models
+
+
+# Statement-level triggers fold each INSERT/UPDATE/DELETE on attendance_records
+# into per (date, department) deltas. Summary rows are upserted in key order so
+# concurrent bulk writers always lock them in the same order.
+SUMMARY_UPSERT = """
+        INSERT INTO daily_attendance_summaries AS s (date, department, present, absent)
+        SELECT d.date, e.department, SUM(d.present), SUM(d.absent)
+        FROM ({deltas}) d JOIN employees e ON e.id = d.employee_id
+        GROUP BY d.date, e.department
+        HAVING SUM(d.present) <> 0 OR SUM(d.absent) <> 0
+        ORDER BY d.date, e.department
+        ON CONFLICT (date, department) DO UPDATE
+        SET present = s.present + EXCLUDED.present, absent = s.absent + EXCLUDED.absent;
+"""
+
+ADDED_ROWS = """
+            SELECT date, employee_id,
+                   (status = 'present')::int AS present, (status = 'absent')::int AS absent
+            FROM new_rows
+"""
+
+REMOVED_ROWS = """
+            SELECT date, employee_id,
+                   -(status = 'present')::int AS present, -(status = 'absent')::int AS absent
+            FROM old_rows
+"""
+
+CREATE_TRIGGERS_SQL = f"""
+CREATE FUNCTION attendance_summary_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {SUMMARY_UPSERT.format(deltas=ADDED_ROWS)}
+    ELSIF TG_OP = 'DELETE' THEN
+        {SUMMARY_UPSERT.format(deltas=REMOVED_ROWS)}
+    ELSE
+        {SUMMARY_UPSERT.format(deltas=REMOVED_ROWS + ' UNION ALL ' + ADDED_ROWS)}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER attendance_summary_insert
+    AFTER INSERT ON attendance_records
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_summary_sync();
+
+CREATE TRIGGER attendance_summary_update
+    AFTER UPDATE ON attendance_records
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_summary_sync();
+
+CREATE TRIGGER attendance_summary_delete
+    AFTER DELETE ON attendance_records
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_summary_sync();
+
+-- Moving an employee to another department moves their counts with them
+CREATE FUNCTION employee_department_summary_sync() RETURNS trigger AS $$
+BEGIN
+    IF OLD.department IS DISTINCT FROM NEW.department THEN
+        INSERT INTO daily_attendance_summaries AS s (date, department, present, absent)
+        SELECT r.date, m.department,
+               m.sign * COUNT(*) FILTER (WHERE r.status = 'present'),
+               m.sign * COUNT(*) FILTER (WHERE r.status = 'absent')
+        FROM attendance_records r
+        CROSS JOIN (VALUES (OLD.department, -1), (NEW.department, 1)) AS m(department, sign)
+        WHERE r.employee_id = NEW.id
+        GROUP BY r.date, m.department, m.sign
+        ORDER BY r.date, m.department
+        ON CONFLICT (date, department) DO UPDATE
+        SET present = s.present + EXCLUDED.present, absent = s.absent + EXCLUDED.absent;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER employee_department_summary
+    AFTER UPDATE OF department ON employees
+    FOR EACH ROW EXECUTE FUNCTION employee_department_summary_sync();
+
+-- Backfill from existing records
+INSERT INTO daily_attendance_summaries (date, department, present, absent)
+SELECT r.date, e.department,
+       COUNT(*) FILTER (WHERE r.status = 'present'),
+       COUNT(*) FILTER (WHERE r.status = 'absent')
+FROM attendance_records r JOIN employees e ON e.id = r.employee_id
+GROUP BY r.date, e.department;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS employee_department_summary ON employees;
+DROP FUNCTION IF EXISTS employee_department_summary_sync();
+DROP TRIGGER IF EXISTS attendance_summary_insert ON attendance_records;
+DROP TRIGGER IF EXISTS attendance_summary_update ON attendance_records;
+DROP TRIGGER IF EXISTS attendance_summary_delete ON attendance_records;
+DROP FUNCTION IF EXISTS attendance_summary_sync();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_attendance_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('department', models.CharField(max_length=100)),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'daily_attendance_summaries',
+                'ordering': ['-date', 'department'],
+                'unique_together': {('date', 'department')},
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 01:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_daily_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('full_name', 'employee_id', 'email', config='simple'), name='employee_search_idx'),
+        ),
+    ]
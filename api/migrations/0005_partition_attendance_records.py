@@ -0,0 +1,86 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:10
+
+from django.db import migrations
+
+
+# attendance_records becomes a table range-partitioned by month on `date`.
+# Postgres requires the partition key in every unique constraint, so the
+# primary key widens to (id, date); (employee_id, date) already contains it.
+# Rows are copied before indexes and triggers exist, and the constraints keep
+# the names Django generated for them.
+CONSTRAINTS_SQL = """
+ALTER TABLE attendance_records
+    ADD CONSTRAINT attendance_records_pkey PRIMARY KEY ({primary_key}),
+    ADD CONSTRAINT attendance_records_employee_id_date_70016c73_uniq UNIQUE (employee_id, date),
+    ADD CONSTRAINT attendance_records_employee_id_4084fb3e_fk_employees_id
+        FOREIGN KEY (employee_id) REFERENCES employees(id) DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT attendance_records_marked_by_id_013b84a6_fk_users_id
+        FOREIGN KEY (marked_by_id) REFERENCES users(id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX attendance_records_employee_id_4084fb3e ON attendance_records (employee_id);
+CREATE INDEX attendance_records_marked_by_id_013b84a6 ON attendance_records (marked_by_id);
+CREATE INDEX attendance_keyset_idx ON attendance_records (date, employee_id, id);
+
+CREATE TRIGGER attendance_summary_insert
+    AFTER INSERT ON attendance_records
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_summary_sync();
+
+CREATE TRIGGER attendance_summary_update
+    AFTER UPDATE ON attendance_records
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_summary_sync();
+
+CREATE TRIGGER attendance_summary_delete
+    AFTER DELETE ON attendance_records
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_summary_sync();
+"""
+
+PARTITION_SQL = """
+ALTER TABLE attendance_records RENAME TO attendance_records_unpartitioned;
+
+CREATE TABLE attendance_records (LIKE attendance_records_unpartitioned INCLUDING DEFAULTS)
+    PARTITION BY RANGE (date);
+
+-- One partition per month that has data, through three months ahead
+DO $$
+DECLARE
+    month date;
+    last_month date := date_trunc('month', CURRENT_DATE + interval '3 months');
+BEGIN
+    SELECT date_trunc('month', LEAST(MIN(date), CURRENT_DATE)) INTO month
+    FROM attendance_records_unpartitioned;
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF attendance_records FOR VALUES FROM (%L) TO (%L)',
+            'attendance_records_p' || to_char(month, 'YYYY_MM'), month, month + interval '1 month'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END $$;
+
+-- Catches dates nobody created a partition for yet
+CREATE TABLE attendance_records_default PARTITION OF attendance_records DEFAULT;
+
+INSERT INTO attendance_records SELECT * FROM attendance_records_unpartitioned;
+DROP TABLE attendance_records_unpartitioned;
+""" + CONSTRAINTS_SQL.format(primary_key='id, date')
+
+UNPARTITION_SQL = """
+ALTER TABLE attendance_records RENAME TO attendance_records_partitioned;
+
+CREATE TABLE attendance_records (LIKE attendance_records_partitioned INCLUDING DEFAULTS);
+INSERT INTO attendance_records SELECT * FROM attendance_records_partitioned;
+DROP TABLE attendance_records_partitioned;
+""" + CONSTRAINTS_SQL.format(primary_key='id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_employee_search_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(PARTITION_SQL, UNPARTITION_SQL),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Bit (day - 1) of present_bits/absent_bits mirrors the record for that day.
+# Rows removed by a statement clear their day's bit in both bitmaps; rows
+# added set it in the bitmap of their status. An UPDATE does both, so a
+# status change or a moved date ends up right.
+DAY_BIT = "(1 << (extract(day FROM date)::int - 1))"
+
+CLEAR_BITS = f"""
+        PERFORM 1 FROM monthly_attendance_bitmaps b
+        JOIN (SELECT DISTINCT employee_id, date_trunc('month', date)::date AS month FROM old_rows) d
+          ON b.employee_id = d.employee_id AND b.month = d.month
+        ORDER BY b.employee_id, b.month
+        FOR UPDATE OF b;
+
+        UPDATE monthly_attendance_bitmaps b
+        SET present_bits = b.present_bits & ~d.mask, absent_bits = b.absent_bits & ~d.mask
+        FROM (
+            SELECT employee_id, date_trunc('month', date)::date AS month, bit_or({DAY_BIT}) AS mask
+            FROM old_rows
+            GROUP BY 1, 2
+        ) d
+        WHERE b.employee_id = d.employee_id AND b.month = d.month;
+"""
+
+SET_BITS = f"""
+        INSERT INTO monthly_attendance_bitmaps AS b (employee_id, month, present_bits, absent_bits)
+        SELECT employee_id, date_trunc('month', date)::date,
+               COALESCE(bit_or({DAY_BIT}) FILTER (WHERE status = 'present'), 0),
+               COALESCE(bit_or({DAY_BIT}) FILTER (WHERE status = 'absent'), 0)
+        FROM new_rows
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (employee_id, month) DO UPDATE
+        SET present_bits = b.present_bits | EXCLUDED.present_bits,
+            absent_bits = b.absent_bits | EXCLUDED.absent_bits;
+"""
+
+CREATE_TRIGGERS_SQL = f"""
+CREATE FUNCTION attendance_bitmap_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        {CLEAR_BITS}
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        {SET_BITS}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER attendance_bitmap_insert
+    AFTER INSERT ON attendance_records
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_bitmap_sync();
+
+CREATE TRIGGER attendance_bitmap_update
+    AFTER UPDATE ON attendance_records
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_bitmap_sync();
+
+CREATE TRIGGER attendance_bitmap_delete
+    AFTER DELETE ON attendance_records
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION attendance_bitmap_sync();
+
+-- Backfill from existing records
+INSERT INTO monthly_attendance_bitmaps (employee_id, month, present_bits, absent_bits)
+SELECT employee_id, date_trunc('month', date)::date,
+       COALESCE(bit_or({DAY_BIT}) FILTER (WHERE status = 'present'), 0),
+       COALESCE(bit_or({DAY_BIT}) FILTER (WHERE status = 'absent'), 0)
+FROM attendance_records
+GROUP BY 1, 2;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS attendance_bitmap_insert ON attendance_records;
+DROP TRIGGER IF EXISTS attendance_bitmap_update ON attendance_records;
+DROP TRIGGER IF EXISTS attendance_bitmap_delete ON attendance_records;
+DROP FUNCTION IF EXISTS attendance_bitmap_sync();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_partition_attendance_records'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyAttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('present_bits', models.IntegerField(default=0)),
+                ('absent_bits', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to='api.employee')),
+            ],
+            options={
+                'db_table': 'monthly_attendance_bitmaps',
+                'ordering': ['-month', 'employee_id'],
+                'unique_together': {('employee', 'month')},
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
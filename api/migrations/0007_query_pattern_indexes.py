@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_monthly_attendance_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['date', 'status'], include=('employee',), name='attendance_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['created_at'], name='employee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['department', 'created_at'], name='employee_dept_created_idx'),
+        ),
+    ]
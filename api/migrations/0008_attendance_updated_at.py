@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:46
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now()),
+        ),
+    ]
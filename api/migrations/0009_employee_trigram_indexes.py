@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:05
+
+from django.db import migrations
+
+
+SEARCH_FIELDS = ('full_name', 'employee_id', 'email')
+
+# Employee search filters with icontains, which Django renders as
+# UPPER(column::text) LIKE UPPER(...). Trigram indexes on that expression
+# serve any substring, not just word prefixes. pg_trgm ships with contrib,
+# so the indexes are only built where it can be installed; elsewhere search
+# still works, it just scans.
+CREATE_INDEXES_SQL = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+%s
+    END IF;
+END
+$$;
+""" % '\n'.join(
+    f"        CREATE INDEX IF NOT EXISTS employee_{field}_trgm_idx ON employees"
+    f" USING gin (UPPER({field}::text) gin_trgm_ops);"
+    for field in SEARCH_FIELDS
+)
+
+DROP_INDEXES_SQL = '\n'.join(f"DROP INDEX IF EXISTS employee_{field}_trgm_idx;" for field in SEARCH_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_attendance_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='employee',
+            name='employee_search_idx',
+        ),
+        migrations.RunSQL(CREATE_INDEXES_SQL, DROP_INDEXES_SQL),
+    ]
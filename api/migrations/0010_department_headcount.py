@@ -0,0 +1,89 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+# Statement-level triggers fold each INSERT/DELETE on employees into
+# per-department deltas, upserted in department order so concurrent writers
+# lock the counter rows in the same order.
+HEADCOUNT_UPSERT = """
+        INSERT INTO department_headcounts AS h (department, employees)
+        SELECT department, SUM(delta) FROM ({deltas}) d(department, delta)
+        GROUP BY department
+        ORDER BY department
+        ON CONFLICT (department) DO UPDATE
+        SET employees = h.employees + EXCLUDED.employees;
+"""
+
+CREATE_TRIGGERS_SQL = f"""
+CREATE FUNCTION employee_headcount_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {HEADCOUNT_UPSERT.format(deltas='SELECT department, 1 FROM new_rows')}
+    ELSIF TG_OP = 'DELETE' THEN
+        {HEADCOUNT_UPSERT.format(deltas='SELECT department, -1 FROM old_rows')}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER employee_headcount_insert
+    AFTER INSERT ON employees
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_headcount_sync();
+
+CREATE TRIGGER employee_headcount_delete
+    AFTER DELETE ON employees
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION employee_headcount_sync();
+
+-- Transition tables cannot be combined with UPDATE OF department, so moves
+-- are counted row by row, and only when the department actually changes
+CREATE FUNCTION employee_headcount_move() RETURNS trigger AS $$
+BEGIN
+    {HEADCOUNT_UPSERT.format(deltas='VALUES (OLD.department, -1), (NEW.department, 1)')}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER employee_headcount_update
+    AFTER UPDATE OF department ON employees
+    FOR EACH ROW WHEN (OLD.department IS DISTINCT FROM NEW.department)
+    EXECUTE FUNCTION employee_headcount_move();
+
+-- Backfill from existing employees
+INSERT INTO department_headcounts (department, employees)
+SELECT department, COUNT(*) FROM employees GROUP BY department;
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS employee_headcount_update ON employees;
+DROP FUNCTION IF EXISTS employee_headcount_move();
+DROP TRIGGER IF EXISTS employee_headcount_insert ON employees;
+DROP TRIGGER IF EXISTS employee_headcount_delete ON employees;
+DROP FUNCTION IF EXISTS employee_headcount_sync();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_employee_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentHeadcount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=100)),
+                ('employees', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'department_headcounts',
+                'ordering': ['department'],
+                'constraints': [models.UniqueConstraint(fields=('department',), include=('employees',), name='department_headcount_unique')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, DROP_TRIGGERS_SQL),
+    ]
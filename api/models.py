@@ -1,5 +1,11 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from asgiref.sync import sync_to_async
+from django.db import connections, models
+from django.db.models.functions import Now
+import functools
+import operator
+import re
 import uuid
 
 
@@ -51,6 +57,36 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.email
 
 
+EMPLOYEE_SEARCH_FIELDS = ('full_name', 'employee_id', 'email')
+
+EMPLOYEE_SEARCH_VECTOR = SearchVector(*EMPLOYEE_SEARCH_FIELDS, config='simple')
+
+TSQUERY_SPECIAL_CHARS = re.compile(r"[&|!():*<>'\\\s]+")
+
+
+class EmployeeQuerySet(models.QuerySet):
+    def search(self, text):
+        """
+        Match every word of `text` as a substring of name, employee ID or
+        email. Employees where the words are word prefixes rank first.
+
+        Where pg_trgm is installed the substring filters are served by the
+        trigram indexes from migration 0009.
+        """
+        terms = [term for term in TSQUERY_SPECIAL_CHARS.split(text) if term]
+        if not terms:
+            return self
+        matches = models.Q()
+        for term in terms:
+            matches &= functools.reduce(
+                operator.or_, (models.Q(**{f'{field}__icontains': term}) for field in EMPLOYEE_SEARCH_FIELDS)
+            )
+        query = SearchQuery(' & '.join(f"'{term}':*" for term in terms), search_type='raw', config='simple')
+        return self.filter(matches).annotate(
+            search_rank=SearchRank(EMPLOYEE_SEARCH_VECTOR, query)
+        ).order_by('-search_rank', '-created_at')
+
+
 class Employee(models.Model):
     DEPARTMENTS = [
         ('Engineering', 'Engineering'),
@@ -70,9 +106,16 @@ class Employee(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='employees_created')
 
+    objects = EmployeeQuerySet.as_manager()
+
     class Meta:
         db_table = 'employees'
         ordering = ['-created_at']
+        indexes = [
+            # Default ordering, and the department filter with that ordering
+            models.Index(fields=['created_at'], name='employee_created_idx'),
+            models.Index(fields=['department', 'created_at'], name='employee_dept_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} ({self.employee_id})"
@@ -90,11 +133,128 @@ class AttendanceRecord(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
     marked_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='attendance_marked')
+    # When the status was last set; the database default covers raw SQL writers
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
 
     class Meta:
         db_table = 'attendance_records'
         unique_together = ['employee', 'date']
         ordering = ['-date', 'employee']
+        indexes = [
+            # Keyset pagination walks this index by (date, employee, id)
+            models.Index(fields=['date', 'employee', 'id'], name='attendance_keyset_idx'),
+            # Per-day status filters and counts, answered from the index alone
+            models.Index(fields=['date', 'status'], include=['employee'], name='attendance_date_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.employee.full_name} - {self.date} - {self.status}"
+
+
+DASHBOARD_SQL = """
+    SELECT (SELECT COALESCE(SUM(employees), 0) FROM department_headcounts),
+           COALESCE(SUM(present), 0), COALESCE(SUM(absent), 0)
+    FROM daily_attendance_summaries
+    WHERE date = %s
+"""
+
+
+class DailyAttendanceSummaryManager(models.Manager):
+    def totals(self, day):
+        """Present/absent/total counts for one day across all departments"""
+        totals = self.filter(date=day).aggregate(
+            present=models.Sum('present', default=0),
+            absent=models.Sum('absent', default=0),
+        )
+        totals['total'] = totals['present'] + totals['absent']
+        return totals
+
+    async def atotals(self, day):
+        totals = await self.filter(date=day).aaggregate(
+            present=models.Sum('present', default=0),
+            absent=models.Sum('absent', default=0),
+        )
+        totals['total'] = totals['present'] + totals['absent']
+        return totals
+
+    def dashboard(self, day):
+        """
+        Headcount plus the present/absent/total counts for one day, read from
+        the rollup tables in a single query
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(DASHBOARD_SQL, [day])
+            employees, present, absent = cursor.fetchone()
+        return {'employees': employees, 'present': present, 'absent': absent, 'total': present + absent}
+
+    async def adashboard(self, day):
+        return await sync_to_async(self.dashboard)(day)
+
+
+class DailyAttendanceSummary(models.Model):
+    """
+    Per-day, per-department attendance counts.
+
+    Maintained by statement-level triggers on attendance_records (see
+    migration 0003), so every write path keeps it current in the same
+    transaction. Rebuild or verify it with `manage.py rebuild_attendance_rollups`.
+    """
+    date = models.DateField()
+    department = models.CharField(max_length=100)
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+
+    objects = DailyAttendanceSummaryManager()
+
+    class Meta:
+        db_table = 'daily_attendance_summaries'
+        unique_together = ['date', 'department']
+        ordering = ['-date', 'department']
+
+    def __str__(self):
+        return f"{self.date} - {self.department}: {self.present} present, {self.absent} absent"
+
+
+class DepartmentHeadcount(models.Model):
+    """
+    Number of employees per department.
+
+    Maintained by triggers on employees (see migration 0010) like the
+    attendance rollups, so the dashboard never counts the employees table.
+    Rebuild or verify it with `manage.py rebuild_attendance_rollups`.
+    """
+    department = models.CharField(max_length=100)
+    employees = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'department_headcounts'
+        ordering = ['department']
+        constraints = [
+            # Covers the dashboard's SUM(employees) with an index-only scan
+            models.UniqueConstraint(fields=['department'], include=['employees'], name='department_headcount_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.department}: {self.employees} employees"
+
+
+class MonthlyAttendanceBitmap(models.Model):
+    """
+    One employee's attendance for one month as two bitmaps, bit (day - 1)
+    set when the employee was present / absent that day.
+
+    Maintained by statement-level triggers on attendance_records (see
+    migration 0006) and rebuilt with `manage.py rebuild_attendance_rollups`.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    month = models.DateField(help_text='First day of the month')
+    present_bits = models.IntegerField(default=0)
+    absent_bits = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'monthly_attendance_bitmaps'
+        unique_together = ['employee', 'month']
+        ordering = ['-month', 'employee_id']
+
+    def __str__(self):
+        return f"{self.employee_id} - {self.month:%Y-%m}"
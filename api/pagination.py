@@ -0,0 +1,184 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite key.
+
+    Rows are ordered by `key_fields` descending and each page is fetched with
+    a row-value comparison against the last key seen, so every page is a
+    single index range scan regardless of how deep it is. Cursors are opaque
+    base64 tokens carrying the boundary key and the direction.
+    """
+    key_fields = ()
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.key_columns = self.get_row_columns(queryset.model)
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        direction = '' if reverse else '-'
+        queryset = queryset.order_by(*[direction + field for field in self.key_fields])
+        if position is not None:
+            queryset = queryset.filter(self.compare(queryset, position, '>' if reverse else '<'))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None if not reverse else has_more
+        self.first_position = self.get_position(results[0]) if results else None
+        self.last_position = self.get_position(results[-1]) if results else None
+        if not results and position is not None:
+            # An empty page still links back to where the client came from
+            self.first_position = self.last_position = self.serialize_position(position)
+            self.has_next, self.has_previous = reverse, not reverse
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def compare(self, queryset, position, operator):
+        table = queryset.model._meta.db_table
+        columns = ', '.join(
+            f'"{table}"."{queryset.model._meta.get_field(field).column}"' for field in self.key_fields
+        )
+        placeholders = ', '.join(['%s'] * len(self.key_fields))
+        return RawSQL(f'({columns}) {operator} ({placeholders})', position, output_field=BooleanField())
+
+    def get_row_columns(self, model):
+        """Columns a `.values()` row needs for get_position to work"""
+        return [model._meta.get_field(field).attname for field in self.key_fields]
+
+    def get_position(self, instance):
+        # Model instances, or `.values()` rows from the encoded list path
+        return self.serialize_position([
+            instance[column] if isinstance(instance, dict) else getattr(instance, column)
+            for column in self.key_columns
+        ])
+
+    def serialize_position(self, values):
+        return [value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values]
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            reverse = bool(payload['r'])
+            if not isinstance(payload['p'], list) or len(payload['p']) != len(self.key_fields):
+                raise ValueError
+            # Typed like the key columns, so a tampered cursor is a 404 rather
+            # than a database error
+            position = [
+                self.model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.key_fields, payload['p'])
+            ]
+            if None in position:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self.encode_cursor(self.first_position, reverse=True)
+
+
+class AttendanceKeysetPagination(KeysetPagination):
+    key_fields = ('date', 'employee_id', 'id')
+
+
+class AttendancePagination(PageNumberPagination):
+    """
+    Page-number pagination for existing clients, switching to keyset
+    pagination when `?pagination=cursor` or a `cursor` is supplied.
+    """
+    keyset_class = AttendanceKeysetPagination
+    mode_query_param = 'pagination'
+
+    def use_keyset(self, request):
+        return (
+            self.keyset_class.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_row_columns(self, model):
+        return self.keyset_class().get_row_columns(model)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_previous_link()
+        return super().get_previous_link()
+
+
+class ReportPagination(PageNumberPagination):
+    """Optional paging for report rows, sized with `?page_size=`"""
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def is_requested(self, request):
+        return self.page_query_param in request.query_params or self.page_size_query_param in request.query_params
@@ -0,0 +1,122 @@
+"""
+Alternative response formats, chosen by content negotiation (`Accept`
+header or `?format=`).
+
+- FastJSONRenderer: the default `application/json`, encoded with orjson when
+  it is installed. Output is byte-for-byte the JSON DRF's JSONRenderer
+  writes: dates and times go through DRF's encoder, and payloads with floats
+  orjson formats differently (or NaN/infinity) are left to JSONRenderer.
+- ColumnarJSONRenderer: lists of objects become `{"columns": [...],
+  "rows": [[...], ...]}`, so repeated keys are sent once.
+- MessagePackRenderer: `application/msgpack`, only offered when msgpack is
+  installed.
+"""
+import math
+import re
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+# Anything orjson may have written for a float: 1.5, 1e16, 1e-7 or null (NaN)
+FLOAT_RE = re.compile(rb'\d[.e]-?\d|null')
+
+
+def default_encoder(value):
+    # Types orjson/msgpack do not know natively get DRF's JSON conversions
+    return JSONEncoder().default(value)
+
+
+def has_unportable_float(data):
+    """
+    True if `data` holds a float orjson would write differently from
+    json.dumps (exponent notation outside 1e-4 <= |x| < 1e16) or cannot
+    write at all (NaN and infinity, which JSONRenderer rejects)
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value) or (value and not 1e-4 <= abs(value) < 1e16):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that hands compact, unindented output to orjson"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or '', renderer_context or {}) or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=default_encoder,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except (TypeError, orjson.JSONEncodeError):
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # Only walk the payload when the output could hold a float
+        if FLOAT_RE.search(ret) and has_unportable_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like JSONRenderer does, so the output is valid JavaScript too
+        return ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+
+
+def to_columns(rows):
+    """Return {columns, rows} for a list of dicts sharing the same keys, else None"""
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        return None
+    columns = list(rows[0])
+    if any(len(row) != len(columns) or list(row) != columns for row in rows):
+        return None
+    return {'columns': columns, 'rows': [list(row.values()) for row in rows]}
+
+
+def columnar(data):
+    """Rewrite a list payload, or the `results` of a paginated one, column-wise"""
+    if isinstance(data, list):
+        return to_columns(data) or data
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        results = to_columns(data['results'])
+        if results is not None:
+            return {**data, 'results': results}
+    return data
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    media_type = 'application/vnd.staffhub.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar(data), accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=default_encoder, use_bin_type=True)
@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.db.models import Count, FilteredRelation, Q, Sum
+
+from .models import DailyAttendanceSummary, Employee
+
+
+# ISO weekdays Monday to Friday, as Django's week_day lookup numbers them
+WORKING_WEEK_DAYS = [2, 3, 4, 5, 6]
+
+
+def count_working_days(start, end):
+    """Number of Monday-Friday days between start and end, inclusive"""
+    days = (end - start).days + 1
+    weeks, extra = divmod(days, 7)
+    working = weeks * 5
+    for offset in range(extra):
+        if (start + timedelta(days=weeks * 7 + offset)).weekday() < 5:
+            working += 1
+    return working
+
+
+def ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def employee_report(start, end, department=None):
+    """
+    Per-employee counts for the period as one grouped query. The date range
+    is part of the join condition, so only the period's partitions are read
+    and employees without records still appear with zeros.
+    """
+    employees = Employee.objects.all()
+    if department:
+        employees = employees.filter(department=department)
+    return employees.annotate(
+        period=FilteredRelation('attendance_records', condition=Q(attendance_records__date__range=(start, end)))
+    ).values('id', 'employee_id', 'full_name', 'department').annotate(
+        present=Count('period', filter=Q(period__status='present')),
+        absent=Count('period', filter=Q(period__status='absent')),
+        marked_working_days=Count('period', filter=Q(period__date__week_day__in=WORKING_WEEK_DAYS)),
+    ).order_by('employee_id')
+
+
+def employee_row(row, working_days):
+    return {
+        'id': row['id'],
+        'employee_id': row['employee_id'],
+        'full_name': row['full_name'],
+        'department': row['department'],
+        'present': row['present'],
+        'absent': row['absent'],
+        'rate': ratio(row['present'], row['present'] + row['absent']),
+        'coverage': ratio(row['marked_working_days'], working_days),
+    }
+
+
+def department_report(start, end, department=None):
+    """
+    Per-department totals from the daily summaries, plus an overall total.
+    Coverage is marked working days over employees x working days.
+    """
+    working_days = count_working_days(start, end)
+    summaries = DailyAttendanceSummary.objects.filter(date__range=(start, end))
+    employees = Employee.objects.all()
+    if department:
+        summaries = summaries.filter(department=department)
+        employees = employees.filter(department=department)
+
+    headcounts = dict(employees.order_by().values_list('department').annotate(Count('id')))
+    totals = {
+        row['department']: row
+        for row in summaries.order_by().values('department').annotate(
+            present_total=Sum('present'),
+            absent_total=Sum('absent'),
+            marked_working_days=Sum('present', filter=Q(date__week_day__in=WORKING_WEEK_DAYS), default=0)
+            + Sum('absent', filter=Q(date__week_day__in=WORKING_WEEK_DAYS), default=0),
+        )
+    }
+
+    departments = []
+    overall = {'employees': 0, 'present': 0, 'absent': 0, 'marked_working_days': 0}
+    for name in sorted(set(headcounts) | set(totals)):
+        row = totals.get(name, {})
+        entry = {
+            'employees': headcounts.get(name, 0),
+            'present': row.get('present_total') or 0,
+            'absent': row.get('absent_total') or 0,
+            'marked_working_days': row.get('marked_working_days') or 0,
+        }
+        for key in overall:
+            overall[key] += entry[key]
+        departments.append({'department': name, **summarize(entry, working_days)})
+
+    return departments, summarize(overall, working_days)
+
+
+def summarize(counts, working_days):
+    return {
+        'employees': counts['employees'],
+        'present': counts['present'],
+        'absent': counts['absent'],
+        'rate': ratio(counts['present'], counts['present'] + counts['absent']),
+        'coverage': ratio(counts['marked_working_days'], counts['employees'] * working_days),
+    }
@@ -1,8 +1,53 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth import authenticate
+from django.core.exceptions import FieldDoesNotExist
+from .directory import get_directory
 from .models import User, Employee, AttendanceRecord
 
 
+def requested_fields(request):
+    """Field names from a `?fields=a,b` parameter on a read, or None"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    if 'fields' not in params:
+        return None
+    return {name.strip() for name in params['fields'].split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Limits output to the fields named in `?fields=`; `restrict_queryset`
+    makes the matching query load only the columns those fields need.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    @classmethod
+    def restrict_queryset(cls, queryset, request):
+        fields = requested_fields(request)
+        if fields is None:
+            return queryset
+
+        model = cls.Meta.model
+        columns = {model._meta.pk.name}
+        for name in fields & set(cls.Meta.fields):
+            declared = cls._declared_fields.get(name)
+            source = declared.source if declared is not None and declared.source else name
+            try:
+                columns.add(model._meta.get_field(source).name)
+            except FieldDoesNotExist:
+                # Not a model column (e.g. a method field); load everything
+                return queryset
+        return queryset.only(*columns)
+
+
 class UserSerializer(serializers.ModelSerializer):
     joined_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%SZ', read_only=True)
 
@@ -31,10 +76,12 @@ class SignupSerializer(serializers.ModelSerializer):
         return user
 
 
-class LoginSerializer(serializers.Serializer):
+class CredentialsSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
+
+class LoginSerializer(CredentialsSerializer):
     def validate(self, data):
         email = data.get('email')
         password = data.get('password')
@@ -52,7 +99,7 @@ class LoginSerializer(serializers.Serializer):
         return data
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     created_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%SZ', read_only=True)
 
     class Meta:
@@ -87,9 +134,17 @@ class EmployeeSerializer(serializers.ModelSerializer):
         return value
 
 
-class AttendanceRecordSerializer(serializers.ModelSerializer):
+class EmployeeImportSerializer(serializers.Serializer):
+    """Field-level validation for one imported row; uniqueness is checked per chunk"""
+    employee_id = serializers.CharField(max_length=50)
+    full_name = serializers.CharField(max_length=255)
+    email = serializers.EmailField(max_length=255)
+    department = serializers.ChoiceField(choices=Employee.DEPARTMENTS)
+
+
+class AttendanceRecordSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     created_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%SZ', read_only=True)
-    employee_id = serializers.CharField(source='employee.id', read_only=True)
+    employee_id = serializers.CharField(read_only=True)
 
     class Meta:
         model = AttendanceRecord
@@ -97,13 +152,15 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'employee_id']
 
 
-class MarkAttendanceSerializer(serializers.Serializer):
+class AttendanceMarkItemSerializer(serializers.Serializer):
     employee_id = serializers.UUIDField()
     date = serializers.DateField()
     status = serializers.ChoiceField(choices=['present', 'absent'])
 
+
+class MarkAttendanceSerializer(AttendanceMarkItemSerializer):
     def validate_employee_id(self, value):
-        if not Employee.objects.filter(id=value).exists():
+        if get_directory().get_by_id(value) is None:
             raise serializers.ValidationError('Employee does not exist')
         return value
 
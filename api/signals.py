@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .directory import get_directory
+from .metrics import record_query
+from .models import Employee, User
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def evict_employee_from_directory(sender, instance, **kwargs):
+    """Drop the cached entry now, and again once the write is committed"""
+    directory = get_directory()
+    directory.evict(instance.pk)
+    transaction.on_commit(lambda: directory.evict(instance.pk))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    """Profile and is_active changes must not be served from the auth cache"""
+    invalidate_cached_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_cached_user(instance.pk))
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Time every query run while a request is being recorded"""
+    # First in the list, so connection.execute_wrapper() blocks open at
+    # connect time still pop their own wrapper on exit
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
@@ -1,7 +1,46 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db.models.functions import Now
 from django.contrib.auth import get_user_model
-from api.models import Employee, AttendanceRecord
-from datetime import date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from api import async_auth, async_views, metrics, views, write_behind
+from api.authentication import get_user_cache, issue_tokens
+from api.checks import check_replica_pin_cache
+from api.bulk import upsert_attendance
+from api.db_router import ReplicaRouter, pin_user, replica_reads_for, routing_scope
+from api.directory import EmployeeDirectory, get_directory, warm_directory
+from api.encoders import RowEncoder
+from api.importers import EmployeeImporter, import_employees, read_rows
+from api.management.commands.bench_endpoints import Command as BenchEndpointsCommand, percentile
+from api.middleware import RequestMetricsMiddleware, brotli
+from api.models import Employee, AttendanceRecord, DailyAttendanceSummary, DepartmentHeadcount, MonthlyAttendanceBitmap
+from api.renderers import FastJSONRenderer, columnar, msgpack
+from api.serializers import AttendanceRecordSerializer, EmployeeSerializer
+from staff_hub_backend.postgres_pool.pool import ConnectionPool, PoolTimeout
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from itertools import groupby
+from unittest import mock, skipUnless
+import base64
+import csv
+import difflib
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import uuid
 
 User = get_user_model()
 
@@ -86,3 +125,2174 @@ class AttendanceRecordTest(TestCase):
                 date=date.today(),  # Same employee, same date
                 status='absent'
             )
+
+
+class BulkMarkAttendanceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employees = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Employee {i}',
+                email=f'employee{i}@example.com',
+                department='Engineering'
+            )
+            for i in range(3)
+        ]
+        self.directory = get_directory()
+        self.directory.clear()
+        self.directory.warm()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_mark_bulk_creates_and_updates(self):
+        today = date.today()
+        AttendanceRecord.objects.create(employee=self.employees[0], date=today, status='absent')
+
+        response = self.client.post('/api/attendance/mark_bulk/', {
+            'items': [
+                {'employee_id': str(employee.id), 'date': today.isoformat(), 'status': 'present'}
+                for employee in self.employees
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(response.data['errors'], 0)
+        self.assertEqual(response.data['results'][0]['result'], 'updated')
+        self.assertEqual(
+            AttendanceRecord.objects.filter(date=today, status='present', marked_by=self.user).count(),
+            3
+        )
+
+    def test_mark_bulk_reports_item_errors(self):
+        today = date.today().isoformat()
+        response = self.client.post('/api/attendance/mark_bulk/', [
+            {'employee_id': str(self.employees[0].id), 'date': today, 'status': 'present'},
+            {'employee_id': str(uuid.uuid4()), 'date': today, 'status': 'present'},
+            {'employee_id': str(self.employees[1].id), 'date': today, 'status': 'late'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'], 2)
+        self.assertIn('employee_id', response.data['results'][1]['errors'])
+        self.assertIn('status', response.data['results'][2]['errors'])
+        self.assertEqual(AttendanceRecord.objects.count(), 1)
+
+    def test_mark_bulk_coalesces_repeated_items(self):
+        today = date.today().isoformat()
+        employee_id = str(self.employees[0].id)
+        response = self.client.post('/api/attendance/mark_bulk/', [
+            {'employee_id': employee_id, 'date': today, 'status': 'present'},
+            {'employee_id': str(self.employees[1].id), 'date': today, 'status': 'present'},
+            {'employee_id': employee_id, 'date': today, 'status': 'absent'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['coalesced'], 1)
+        self.assertEqual(response.data['results'][0]['result'], 'coalesced')
+        self.assertEqual(response.data['results'][0]['superseded_by'], 2)
+        self.assertEqual(response.data['results'][2]['result'], 'created')
+        self.assertEqual(response.data['results'][0]['id'], response.data['results'][2]['id'])
+        self.assertEqual(AttendanceRecord.objects.get(employee=self.employees[0]).status, 'absent')
+
+    def test_mark_bulk_uses_constant_queries(self):
+        today = date.today().isoformat()
+        items = [
+            {'employee_id': str(employee.id), 'date': today, 'status': 'present'}
+            for employee in self.employees
+        ]
+        # Employees come from the directory, leaving the upsert in a savepoint
+        with self.assertNumQueries(3):
+            self.client.post('/api/attendance/mark_bulk/', items, format='json')
+
+    def test_mark_bulk_rechecks_employees_deleted_elsewhere(self):
+        today = date.today().isoformat()
+        # Deleted by another process: this one's directory still has it
+        Employee.objects.filter(pk=self.employees[1].pk)._raw_delete('default')
+        with connection.cursor() as cursor:
+            # Surface the deferred foreign key check as the commit would
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        response = self.client.post('/api/attendance/mark_bulk/', [
+            {'employee_id': str(employee.id), 'date': today, 'status': 'present'}
+            for employee in self.employees
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors'], 1)
+        self.assertIn('employee_id', response.data['results'][1]['errors'])
+        self.assertIsNone(self.directory.store.get('id', self.employees[1].pk))
+        self.assertEqual(AttendanceRecord.objects.count(), 2)
+
+    def test_mark_bulk_requires_items(self):
+        response = self.client.post('/api/attendance/mark_bulk/', {'items': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class EmployeeImportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        Employee.objects.create(
+            employee_id='EMP001',
+            full_name='John Doe',
+            email='john@example.com',
+            department='Engineering'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_import_csv(self):
+        upload = SimpleUploadedFile('employees.csv', (
+            'employee_id,full_name,email,department\n'
+            'EMP002,Jane Smith,jane@example.com,Design\n'
+            'EMP001,Duplicate Id,dup@example.com,Design\n'
+            'EMP003,Bad Department,bad@example.com,Legal\n'
+            'EMP004,Repeat Email,jane@example.com,Sales\n'
+            'EMP005,Mike Johnson,mike@example.com,Sales\n'
+        ).encode())
+
+        response = self.client.post('/api/employees/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], 5)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4, 5])
+        self.assertEqual(
+            set(Employee.objects.values_list('employee_id', flat=True)),
+            {'EMP001', 'EMP002', 'EMP005'}
+        )
+        self.assertEqual(Employee.objects.get(employee_id='EMP002').created_by, self.user)
+
+    def test_import_ndjson_in_chunks(self):
+        lines = [
+            json.dumps({
+                'employee_id': f'NEW{i:03d}',
+                'full_name': f'New Hire {i}',
+                'email': f'new{i}@example.com',
+                'department': 'Sales',
+            })
+            for i in range(5)
+        ]
+        lines.insert(2, '{not json')
+        report = import_employees(io.BytesIO('\n'.join(lines).encode()), 'ndjson', chunk_size=2)
+
+        self.assertEqual(report['created'], 5)
+        self.assertEqual(report['errors'], [{'line': 3, 'errors': {'non_field_errors': ['Invalid JSON']}}])
+        self.assertEqual(Employee.objects.filter(employee_id__startswith='NEW').count(), 5)
+
+    def test_import_stops_at_undecodable_line(self):
+        upload = SimpleUploadedFile('employees.csv', (
+            b'employee_id,full_name,email,department\n'
+            b'EMP002,Jane Smith,jane@example.com,Design\n'
+            b'EMP003,Caf\xe9 Owner,cafe@example.com,Sales\n'
+            b'EMP004,Mike Johnson,mike@example.com,Sales\n'
+        ))
+        response = self.client.post('/api/employees/import/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['line'], 3)
+        self.assertEqual(response.data['created'], 1)
+        self.assertFalse(Employee.objects.filter(employee_id='EMP004').exists())
+
+    def test_import_caps_reported_errors(self):
+        lines = [json.dumps({'employee_id': f'BAD{i:03d}'}) for i in range(5)]
+        report = import_employees(io.BytesIO('\n'.join(lines).encode()), 'ndjson', chunk_size=2, max_errors=3)
+
+        self.assertEqual(report['failed'], 5)
+        self.assertEqual([error['line'] for error in report['errors']], [1, 2, 3])
+        self.assertEqual(report['errors_omitted'], 2)
+
+    def test_concurrent_conflict_rejects_only_conflicting_rows(self):
+        class RacingImporter(EmployeeImporter):
+            def insert(self, pending):
+                # Another writer takes one email between the check and the insert
+                Employee.objects.create(
+                    employee_id='EXT001', full_name='Elsewhere', email='new1@example.com', department='HR'
+                )
+                super().insert(pending)
+
+        lines = [
+            json.dumps({
+                'employee_id': f'NEW{i:03d}',
+                'full_name': f'New Hire {i}',
+                'email': f'new{i}@example.com',
+                'department': 'Sales',
+            })
+            for i in range(4)
+        ]
+        report = RacingImporter().run(read_rows(io.BytesIO('\n'.join(lines).encode()), 'ndjson'))
+
+        self.assertEqual(report['created'], 3)
+        self.assertEqual([error['line'] for error in report['errors']], [2])
+        self.assertEqual(Employee.objects.filter(employee_id__startswith='NEW').count(), 3)
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write('employee_id,full_name,email,department\nEMP010,Ann Lee,ann@example.com,HR\n')
+        self.addCleanup(os.remove, handle.name)
+
+        out = io.StringIO()
+        call_command('import_employees', handle.name, '--created-by', 'admin@test.com', stdout=out)
+
+        self.assertIn('Imported 1 of 1 employees', out.getvalue())
+        self.assertEqual(Employee.objects.get(employee_id='EMP010').created_by, self.user)
+
+    def test_import_requires_known_format(self):
+        upload = SimpleUploadedFile('employees.txt', b'employee_id\n')
+        response = self.client.post('/api/employees/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+
+class AttendanceKeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        employees = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Employee {i}',
+                email=f'employee{i}@example.com',
+                department='Engineering'
+            )
+            for i in range(3)
+        ]
+        for day in range(1, 4):
+            for employee in employees:
+                AttendanceRecord.objects.create(employee=employee, date=date(2024, 1, day), status='present')
+        self.expected = [
+            str(pk) for pk in AttendanceRecord.objects.order_by('-date', '-employee_id', '-id').values_list('id', flat=True)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_walks_all_pages_forward_and_back(self):
+        seen = []
+        url = '/api/attendance/?pagination=cursor&page_size=2'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            pages.append([record['id'] for record in response.data['results']])
+            seen.extend(pages[-1])
+            url = response.data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 5)
+
+        previous = response.data['previous']
+        walked_back = []
+        while previous:
+            response = self.client.get(previous)
+            walked_back.insert(0, [record['id'] for record in response.data['results']])
+            previous = response.data['previous']
+        self.assertEqual(walked_back, pages[:-1])
+
+    def test_page_cost_does_not_grow(self):
+        response = self.client.get('/api/attendance/?pagination=cursor&page_size=2')
+        next_url = response.data['next']
+        # Auth is forced, so each page is a single keyset query with no COUNT
+        with self.assertNumQueries(1):
+            self.client.get(next_url)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/attendance/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+        # Well-formed tokens whose values do not fit the key columns
+        for position in (['2024-13-01', str(uuid.uuid4()), str(uuid.uuid4())],
+                         ['2024-01-01', 'not-a-uuid', str(uuid.uuid4())],
+                         ['2024-01-01', str(uuid.uuid4()), None]):
+            token = base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+            response = self.client.get('/api/attendance/', {'cursor': token})
+            self.assertEqual(response.status_code, 404)
+
+    def test_cursor_past_the_end_links_back(self):
+        position = ['2000-01-01', str(uuid.uuid4()), str(uuid.uuid4())]
+        token = base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+        response = self.client.get('/api/attendance/', {'cursor': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_page_number_mode_still_available(self):
+        response = self.client.get('/api/attendance/?page=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 9)
+
+
+class AttendanceExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employee = Employee.objects.create(
+            employee_id='EMP001',
+            full_name='John Doe',
+            email='john@example.com',
+            department='Engineering'
+        )
+        for day in range(1, 6):
+            AttendanceRecord.objects.create(
+                employee=self.employee,
+                date=date(2024, 1, day),
+                status='present' if day % 2 else 'absent'
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get_content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_export_csv_range(self):
+        response = self.client.get('/api/attendance/export/?start_date=2024-01-02&end_date=2024-01-04')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+        rows = list(csv.reader(io.StringIO(self.get_content(response).decode())))
+        self.assertEqual(rows[0], ['id', 'employee_id', 'date', 'status', 'created_at'])
+        self.assertEqual([row[2] for row in rows[1:]], ['2024-01-02', '2024-01-03', '2024-01-04'])
+        self.assertEqual(rows[1][1], str(self.employee.id))
+
+    def test_export_matches_serializer_output(self):
+        response = self.client.get('/api/attendance/export/?file_format=ndjson&date=2024-01-01')
+        lines = self.get_content(response).decode().splitlines()
+        record = AttendanceRecord.objects.get(date=date(2024, 1, 1))
+        self.assertEqual([json.loads(line) for line in lines], [dict(AttendanceRecordSerializer(record).data)])
+
+    def test_export_gzip_resume(self):
+        full = self.get_content(self.client.get('/api/attendance/export/?file_format=ndjson&gzip=1'))
+        self.assertEqual(len(gzip.decompress(full).decode().splitlines()), 5)
+
+        etag = self.client.get('/api/attendance/export/?file_format=ndjson&gzip=1')['ETag']
+
+        response = self.client.get(
+            '/api/attendance/export/?file_format=ndjson&gzip=1', HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-{len(full) - 1}/{len(full)}')
+        self.assertEqual(self.get_content(response), full[10:])
+
+        # The ETag comes from an aggregate and the export is generated once
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                '/api/attendance/export/?file_format=ndjson&gzip=1', HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag
+            )
+            self.assertEqual(self.get_content(response), full[10:])
+
+        response = self.client.get(
+            '/api/attendance/export/?file_format=ndjson&gzip=1', HTTP_RANGE=f'bytes={len(full)}-', HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(full)}')
+
+    def test_export_range_requires_matching_if_range(self):
+        url = '/api/attendance/export/?start_date=2024-01-02&end_date=2024-01-04'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+        self.assertNotEqual(self.client.get(url + '&file_format=ndjson')['ETag'], etag)
+
+        # A range without a validator may splice two different exports
+        response = self.client.get(url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Range', response)
+
+        # Writes stamp updated_at, which is what the ETag is derived from
+        AttendanceRecord.objects.filter(date=date(2024, 1, 3)).update(status='present', updated_at=Now())
+        response = self.client.get(url, HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_export_etag_sees_older_stamps(self):
+        url = '/api/attendance/export/'
+        etag = self.client.get(url)['ETag']
+        # A write-behind mark made before the latest write leaves max(updated_at) alone
+        made_at = AttendanceRecord.objects.order_by('updated_at')[0].updated_at - timedelta(seconds=1)
+        upsert_attendance([(self.employee.id, date(2024, 1, 2), 'present', None, made_at)])
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_export_rejects_unknown_format(self):
+        response = self.client.get('/api/attendance/export/?file_format=xml')
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyAttendanceSummaryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.engineer = Employee.objects.create(
+            employee_id='EMP001',
+            full_name='John Doe',
+            email='john@example.com',
+            department='Engineering'
+        )
+        self.designer = Employee.objects.create(
+            employee_id='EMP002',
+            full_name='Jane Smith',
+            email='jane@example.com',
+            department='Design'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def mark(self, employee, status_value):
+        return self.client.post('/api/attendance/mark/', {
+            'employee_id': str(employee.id),
+            'date': date.today().isoformat(),
+            'status': status_value,
+        }, format='json')
+
+    def test_summary_follows_marks_updates_and_deletes(self):
+        self.mark(self.engineer, 'present')
+        self.mark(self.designer, 'absent')
+        self.assertEqual(
+            DailyAttendanceSummary.objects.totals(date.today()),
+            {'present': 1, 'absent': 1, 'total': 2}
+        )
+
+        response = self.mark(self.designer, 'present')
+        self.assertEqual(DailyAttendanceSummary.objects.totals(date.today())['present'], 2)
+
+        self.client.delete(f'/api/attendance/{response.data["id"]}/')
+        self.assertEqual(
+            DailyAttendanceSummary.objects.totals(date.today()),
+            {'present': 1, 'absent': 0, 'total': 1}
+        )
+
+    def test_summary_follows_department_changes(self):
+        self.mark(self.engineer, 'present')
+        self.engineer.department = 'Sales'
+        self.engineer.save()
+
+        counts = dict(DailyAttendanceSummary.objects.filter(date=date.today()).values_list('department', 'present'))
+        self.assertEqual(counts, {'Engineering': 0, 'Sales': 1})
+
+    def test_stats_endpoints_read_the_summary(self):
+        upsert_attendance([
+            (self.engineer.id, date.today(), 'present'),
+            (self.designer.id, date.today(), 'absent'),
+        ])
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/attendance/today_stats/')
+        self.assertEqual(response.data, {'present': 1, 'absent': 1, 'total': 2})
+
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.data, {
+            'total_employees': 2,
+            'present_today': 1,
+            'absent_today': 1,
+            'attendance_marked': 2,
+        })
+
+    def test_rebuild_and_verify_command(self):
+        self.mark(self.engineer, 'present')
+        call_command('rebuild_attendance_rollups', '--verify', stdout=io.StringIO())
+
+        DailyAttendanceSummary.objects.update(present=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_attendance_rollups', '--verify', stdout=io.StringIO())
+
+        call_command('rebuild_attendance_rollups', stdout=io.StringIO())
+        call_command('rebuild_attendance_rollups', '--verify', stdout=io.StringIO())
+        self.assertEqual(DailyAttendanceSummary.objects.totals(date.today())['present'], 1)
+
+    def test_headcount_follows_employee_writes(self):
+        def headcounts():
+            return dict(DepartmentHeadcount.objects.filter(employees__gt=0).values_list('department', 'employees'))
+
+        self.assertEqual(headcounts(), {'Engineering': 1, 'Design': 1})
+        Employee.objects.bulk_create([
+            Employee(employee_id=f'S{i}', full_name=f'Seller {i}', email=f's{i}@example.com', department='Sales')
+            for i in range(3)
+        ])
+        self.designer.department = 'Sales'
+        self.designer.save()
+        self.engineer.full_name = 'Renamed'
+        self.engineer.save()
+        Employee.objects.filter(employee_id='S0').delete()
+        self.assertEqual(headcounts(), {'Engineering': 1, 'Sales': 3})
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.data['total_employees'], 4)
+
+        DepartmentHeadcount.objects.update(employees=7)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_attendance_rollups', '--verify', stdout=io.StringIO())
+        call_command('rebuild_attendance_rollups', stdout=io.StringIO())
+        call_command('rebuild_attendance_rollups', '--verify', stdout=io.StringIO())
+        self.assertEqual(headcounts(), {'Engineering': 1, 'Sales': 3})
+
+
+class EmployeeSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        Employee.objects.create(
+            employee_id='EMP001',
+            full_name='John Doe',
+            email='john.doe@example.com',
+            department='Engineering'
+        )
+        Employee.objects.create(
+            employee_id='EMP002',
+            full_name='Johnny Walker',
+            email='walker@example.com',
+            department='Sales'
+        )
+        Employee.objects.create(
+            employee_id='OPS100',
+            full_name='Jane Smith',
+            email='jane@example.com',
+            department='Operations'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, term, **params):
+        response = self.client.get('/api/employees/', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [employee['employee_id'] for employee in response.data['results']]
+
+    def test_prefix_search_across_fields(self):
+        self.assertEqual(set(self.search('joh')), {'EMP001', 'EMP002'})
+        self.assertEqual(self.search('ops1'), ['OPS100'])
+        self.assertEqual(self.search('walker@example.com'), ['EMP002'])
+        self.assertEqual(self.search('john doe'), ['EMP001'])
+
+    def test_substring_search_across_fields(self):
+        self.assertEqual(self.search('001'), ['EMP001'])
+        self.assertEqual(len(self.search('example.com')), 3)
+        self.assertEqual(self.search('alk'), ['EMP002'])
+        self.assertEqual(self.search('ohn oe'), ['EMP001'])
+
+    def test_results_ordered_by_relevance(self):
+        # "John Doe" matches the prefix in both its name and email
+        self.assertEqual(self.search('john'), ['EMP001', 'EMP002'])
+
+    def test_search_combines_with_department_filter(self):
+        self.assertEqual(self.search('joh', department='Sales'), ['EMP002'])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.search("jo:* & !'"), ['EMP001', 'EMP002'])
+        self.assertEqual(len(self.search('&|!')), 3)
+
+
+class EmployeeDirectoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employees = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Employee {i}',
+                email=f'employee{i}@example.com',
+                department='Engineering'
+            )
+            for i in range(3)
+        ]
+        self.directory = get_directory()
+        self.directory.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_lookups_are_served_after_bulk_warm(self):
+        with self.assertNumQueries(1):
+            self.directory.warm()
+
+        employee = self.employees[1]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.directory.get_by_id(employee.id).employee_id, 'EMP001')
+            self.assertEqual(self.directory.get_by_employee_id('EMP002').id, self.employees[2].id)
+            self.assertEqual(self.directory.get_by_email('employee0@example.com').id, self.employees[0].id)
+        self.assertEqual(self.directory.stats()['hits'], 3)
+
+    def test_misses_are_not_cached(self):
+        self.directory.warm()
+        self.assertIsNone(self.directory.get_by_employee_id('EMP999'))
+        self.assertIsNone(self.directory.get_by_id('not-a-uuid'))
+
+        Employee.objects.create(
+            employee_id='EMP999',
+            full_name='Late Hire',
+            email='late@example.com',
+            department='Sales'
+        )
+        self.assertIsNotNone(self.directory.get_by_employee_id('EMP999'))
+        self.assertEqual(self.directory.stats()['misses'], 2)
+
+    def test_signals_evict_changed_and_deleted_employees(self):
+        self.directory.warm()
+        employee = self.employees[0]
+        employee.email = 'renamed@example.com'
+        employee.save()
+
+        self.assertIsNone(self.directory.get_by_email('employee0@example.com'))
+        self.assertEqual(self.directory.get_by_id(employee.id).email, 'renamed@example.com')
+
+        employee.delete()
+        self.assertIsNone(self.directory.get_by_employee_id('EMP000'))
+
+    def test_local_store_is_bounded(self):
+        directory = EmployeeDirectory(max_size=2, cache_alias='')
+        directory.warm()
+        self.assertEqual(directory.stats()['size'], 2)
+
+        self.assertIsNotNone(directory.get_by_employee_id('EMP000'))
+        self.assertEqual(directory.stats()['size'], 2)
+
+    def test_shared_cache_backend(self):
+        directory = EmployeeDirectory(cache_alias='default')
+        directory.clear()
+        directory.warm()
+        other_worker = EmployeeDirectory(cache_alias='default')
+        other_worker.warmed = True
+
+        with self.assertNumQueries(0):
+            self.assertEqual(other_worker.get_by_email('employee1@example.com').employee_id, 'EMP001')
+
+        directory.evict(self.employees[1].id)
+        self.assertIsNone(other_worker.store.get('email', 'employee1@example.com'))
+
+        caches['default'].set('unrelated', 1)
+        directory.warm()
+        directory.clear()
+        self.assertIsNone(other_worker.store.get('email', 'employee0@example.com'))
+        self.assertEqual(caches['default'].get('unrelated'), 1)
+
+    def test_local_entries_expire(self):
+        directory = EmployeeDirectory(cache_alias='')
+        directory.warm()
+        # Changed by another process, whose signal never reaches this one
+        Employee.objects.filter(pk=self.employees[0].pk).update(email='changed@example.com')
+        self.assertEqual(directory.get_by_id(self.employees[0].id).email, 'employee0@example.com')
+
+        directory.store.expires[self.employees[0].id] = 0
+        self.assertEqual(directory.get_by_id(self.employees[0].id).email, 'changed@example.com')
+        self.assertIsNone(directory.get_by_email('employee0@example.com'))
+
+    def test_counters_are_exact_under_concurrency(self):
+        self.directory.warm()
+
+        def look_up():
+            for _ in range(500):
+                self.directory.get_by_employee_id('EMP001')
+
+        threads = [threading.Thread(target=look_up) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.directory.stats()['hits'], 4000)
+
+    def test_warm_directory_at_startup(self):
+        warmed_in = []
+        with mock.patch.object(EmployeeDirectory, 'warm', lambda directory: warmed_in.append(threading.current_thread())):
+            warm_directory()
+        self.assertEqual(len(warmed_in), 1)
+        self.assertNotEqual(warmed_in[0], threading.current_thread())
+
+        # A database that is not up yet leaves warming to the first lookup
+        with mock.patch.object(EmployeeDirectory, 'warm', side_effect=OperationalError), \
+                self.assertLogs('api.directory', 'ERROR'):
+            warm_directory()
+        self.assertFalse(self.directory.warmed)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.directory.get_by_employee_id('EMP001').id, self.employees[1].id)
+
+    def test_mark_and_check_unique_use_the_directory(self):
+        self.directory.warm()
+        # Only the unknown email has to go to the database
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/employees/check_unique/', {'employee_id': 'EMP001', 'email': 'new@example.com'})
+        self.assertEqual(response.data, {'employee_id_unique': False, 'email_unique': True})
+
+        # Only update_or_create's savepoints, SELECT ... FOR UPDATE and INSERT
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/attendance/mark/', {
+                'employee_id': str(self.employees[0].id),
+                'date': date.today().isoformat(),
+                'status': 'present',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['employee_id'], str(self.employees[0].id))
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        get_user_cache().clear()
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {
+            'email': 'admin@test.com',
+            'password': 'admin123',
+        }, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(2):
+            self.client.get('/api/attendance/today_stats/')
+        # Only the stats query remains once the user is cached
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/attendance/today_stats/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_update_invalidates_cache(self):
+        self.client.get('/api/auth/profile/')
+        self.client.patch('/api/auth/profile/', {'name': 'Renamed'}, format='json')
+
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['name'], 'Renamed')
+
+    def test_cache_holds_no_password_hash(self):
+        self.client.get('/api/attendance/today_stats/')
+        entry = get_user_cache().get(f'auth-user:{self.user.pk}')
+        self.assertEqual(entry['email'], 'admin@test.com')
+        self.assertNotIn('password', entry)
+        self.assertNotIn(self.user.password, repr(entry))
+
+    def test_profile_update_keeps_uncached_fields(self):
+        User.objects.filter(pk=self.user.pk).update(phone='555-0100')
+        self.client.get('/api/attendance/today_stats/')
+        self.client.patch('/api/auth/profile/', {'name': 'Renamed'}, format='json')
+
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.phone, '555-0100')
+        self.assertTrue(user.check_password('admin123'))
+
+    @mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_revoked_token_rejected_from_cache(self):
+        # The setUp token predates the revoke claim
+        self.client.credentials()
+        response = self.client.post('/api/auth/login/', {
+            'email': 'admin@test.com',
+            'password': 'admin123',
+        }, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get('/api/attendance/today_stats/').status_code, 200)
+        self.assertIn('password_digest', get_user_cache().get(f'auth-user:{self.user.pk}'))
+
+        self.user.set_password('changed123')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/attendance/today_stats/').status_code, 401)
+
+    def test_deactivation_invalidates_cache(self):
+        self.client.get('/api/auth/profile/')
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(AUTH_TRUST_TOKEN_CLAIMS=True)
+    def test_trusted_claims_skip_lookup_for_safe_requests(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/employees/check_unique/')
+        self.assertEqual(response.status_code, 200)
+
+        # The profile still comes from the database
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['email'], 'admin@test.com')
+        self.assertEqual(response.data['id'], str(self.user.id))
+
+        employee = Employee.objects.create(
+            employee_id='EMP001',
+            full_name='John Doe',
+            email='john@example.com',
+            department='Engineering'
+        )
+        response = self.client.post('/api/attendance/mark/', {
+            'employee_id': str(employee.id),
+            'date': date.today().isoformat(),
+            'status': 'present',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AttendanceRecord.objects.get().marked_by, self.user)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class AsyncAuthTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.factory = AsyncRequestFactory()
+        async_auth.last_logins.take()
+        self.addCleanup(async_auth.last_logins.take)
+
+    def post(self, data):
+        return self.factory.post('/api/auth/login/', json.dumps(data), content_type='application/json')
+
+    async def test_login_returns_tokens(self):
+        response = await async_auth.login(self.post({'email': 'admin@test.com', 'password': 'admin123'}))
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertEqual(body['user']['email'], 'admin@test.com')
+        self.assertIn('access', body)
+
+    async def test_login_rejects_bad_credentials(self):
+        for data in ({'email': 'admin@test.com', 'password': 'wrong'}, {'email': 'nobody@test.com', 'password': 'x'}):
+            response = await async_auth.login(self.post(data))
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.content), {'non_field_errors': ['Invalid email or password']})
+
+        response = await async_auth.login(self.post({'email': 'admin@test.com'}))
+        self.assertIn('password', json.loads(response.content))
+
+    async def test_login_upgrades_hash_cost(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            response = await async_auth.login(self.post({'email': 'admin@test.com', 'password': 'admin123'}))
+        self.assertEqual(response.status_code, 200)
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    async def test_last_login_is_batched(self):
+        await async_auth.login(self.post({'email': 'admin@test.com', 'password': 'admin123'}))
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertIsNone(user.last_login)
+
+        await sync_to_async(async_auth.last_logins.flush)()
+        user = await User.objects.aget(pk=self.user.pk)
+        self.assertIsNotNone(user.last_login)
+
+    def test_last_login_buffer_flushes_on_a_timer(self):
+        flushed = threading.Event()
+        buffer = async_auth.LastLoginBuffer(max_size=100, interval=0.05)
+        buffer.flush = flushed.set
+        # One login and then silence: nothing else would trigger the write
+        self.assertFalse(buffer.add(self.user.pk, datetime.now(dt_timezone.utc)))
+        self.assertTrue(flushed.wait(5))
+
+    async def test_signup(self):
+        request = self.factory.post('/api/auth/signup/', json.dumps({
+            'email': 'new@test.com',
+            'password': 'secret123',
+            'name': 'New User',
+        }), content_type='application/json')
+        response = await async_auth.signup(request)
+        self.assertEqual(response.status_code, 201)
+
+        user = await User.objects.aget(email='new@test.com')
+        self.assertEqual(user.role, 'HR Manager')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+
+        response = await async_auth.signup(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', json.loads(response.content))
+
+
+class AsyncViewsTest(TestCase):
+    def setUp(self):
+        get_user_cache().clear()
+        get_directory().clear()
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employees = [
+            Employee.objects.create(
+                employee_id=f'EMP{i:03d}',
+                full_name=f'Employee {i}',
+                email=f'emp{i}@test.com',
+                department='Engineering' if i % 2 else 'Sales',
+                created_by=self.user
+            )
+            for i in range(3)
+        ]
+        today = date.today()
+        AttendanceRecord.objects.create(employee=self.employees[0], date=today, status='present')
+        AttendanceRecord.objects.create(employee=self.employees[1], date=today, status='absent')
+
+        self.factory = AsyncRequestFactory()
+        self.auth = f'Bearer {issue_tokens(self.user).access_token}'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    def get(self, path, **params):
+        return self.factory.get(path, params, headers={'Authorization': self.auth})
+
+    async def test_requires_authentication(self):
+        response = await async_views.dashboard_stats(self.factory.get('/api/dashboard/stats/'))
+        self.assertEqual(response.status_code, 401)
+
+        request = self.factory.get('/api/dashboard/stats/', headers={'Authorization': 'Bearer nonsense'})
+        response = await async_views.dashboard_stats(request)
+        self.assertEqual(response.status_code, 401)
+
+    async def test_matches_sync_views(self):
+        get = sync_to_async(self.client.get)
+        cases = [
+            (async_views.dashboard_stats, '/api/dashboard/stats/', {}),
+            (async_views.today_stats, '/api/attendance/today_stats/', {}),
+            (async_views.by_employee, '/api/attendance/by_employee/', {'employee_id': str(self.employees[0].id)}),
+            (async_views.by_date, '/api/attendance/by_date/', {'date': date.today().isoformat()}),
+        ]
+        employee_list = async_views.employee_list_view(None)
+        cases.append((employee_list, '/api/employees/', {'department': 'Sales'}))
+        for view, path, params in cases:
+            expected = await get(path, params)
+            response = await view(self.get(path, **params))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], expected['Content-Type'])
+            self.assertEqual(response.content, expected.content)
+
+    async def test_content_negotiation_matches_sync_views(self):
+        get = sync_to_async(self.client.get)
+        employee_list = async_views.employee_list_view(None)
+        for params, headers in (({'format': 'columnar'}, {}),
+                                ({}, {'Accept': 'application/vnd.staffhub.columnar+json'})):
+            expected = await get('/api/employees/', params, headers=headers)
+            request = self.factory.get('/api/employees/', params, headers={'Authorization': self.auth, **headers})
+            response = await employee_list(request)
+            self.assertEqual(response['Content-Type'], 'application/vnd.staffhub.columnar+json')
+            self.assertEqual(response.content, expected.content)
+
+        request = self.factory.get('/api/employees/', {'format': 'xml'}, headers={'Authorization': self.auth})
+        self.assertEqual((await employee_list(request)).status_code, 404)
+
+    async def test_by_employee_errors(self):
+        response = await async_views.by_employee(self.get('/api/attendance/by_employee/'))
+        self.assertEqual(response.status_code, 400)
+
+        request = self.get('/api/attendance/by_employee/', employee_id=str(uuid.uuid4()))
+        response = await async_views.by_employee(request)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_employee_list_and_detail(self):
+        employee_list = async_views.employee_list_view(None)
+        response = await employee_list(self.get('/api/employees/', department='Sales'))
+        expected = await sync_to_async(self.client.get)('/api/employees/', {'department': 'Sales'})
+        self.assertEqual(json.loads(response.content)['results'], expected.json()['results'])
+        self.assertEqual(json.loads(response.content)['count'], 2)
+
+        response = await employee_list(self.get('/api/employees/', page=5))
+        self.assertEqual(response.status_code, 404)
+
+        employee_detail = async_views.employee_detail_view(None)
+        response = await employee_detail(self.get('/api/employees/'), pk=self.employees[0].id)
+        self.assertEqual(json.loads(response.content)['employee_id'], 'EMP000')
+
+        response = await employee_detail(self.get('/api/employees/'), pk=uuid.uuid4())
+        self.assertEqual(response.status_code, 404)
+
+    async def test_writes_go_to_sync_view(self):
+        employee_list = async_views.employee_list_view(views.EmployeeViewSet.as_view({'post': 'create'}))
+        request = self.factory.post('/api/employees/', json.dumps({
+            'employee_id': 'EMP100',
+            'full_name': 'New Hire',
+            'email': 'new@test.com',
+            'department': 'HR',
+        }), content_type='application/json', headers={'Authorization': self.auth})
+        response = await employee_list(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Employee.objects.filter(employee_id='EMP100').aexists())
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.pings = 0
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(TestCase):
+    def make_pool(self, **options):
+        def ping(connection):
+            connection.pings += 1
+            if connection.pings > 1:
+                raise OSError('server closed the connection')
+        return ConnectionPool(FakeConnection, ping, lambda connection: None, **options)
+
+    def test_reuses_connections(self):
+        pool = self.make_pool(max_size=2)
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['in_use'], stats['checkouts']), (1, 1, 2))
+
+    def test_waits_then_times_out_when_exhausted(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_health_check_replaces_dead_connections(self):
+        pool = self.make_pool(check_after=0)
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+        pool.checkin(first)
+
+        # The second ping fails, so a fresh connection is opened
+        second = pool.checkout()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_closed_connections_are_not_pooled(self):
+        pool = self.make_pool()
+        connection = pool.checkout()
+        connection.close()
+        pool.checkin(connection)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_stats_endpoint_is_staff_only(self):
+        user = User.objects.create_user(email='user@test.com', password='pass123', name='User')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        self.assertEqual(client.get('/api/system/db-pool/').status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = client.get('/api/system/db-pool/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['pid'], os.getpid())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        get_user_cache().clear()
+        self.user = User.objects.create_user(email='admin@test.com', password='admin123', name='Admin')
+        self.router = ReplicaRouter()
+        self.request = RequestFactory().get('/api/employees/')
+        self.request.user = self.user
+
+    def test_reads_use_replica_only_inside_replica_scope(self):
+        self.assertIsNone(self.router.db_for_read(Employee))
+        with replica_reads_for(self.request):
+            self.assertEqual(self.router.db_for_read(Employee), 'replica1')
+            self.assertIsNone(self.router.db_for_read(User))
+            self.assertEqual(self.router.db_for_write(Employee), 'default')
+        self.assertIsNone(self.router.db_for_read(Employee))
+
+    def test_pinned_requests_read_from_primary(self):
+        with routing_scope(pinned=True), replica_reads_for(self.request):
+            self.assertIsNone(self.router.db_for_read(Employee))
+
+        pin_user(self.user)
+        with replica_reads_for(self.request):
+            self.assertIsNone(self.router.db_for_read(Employee))
+
+    def test_per_process_pin_cache_is_flagged(self):
+        self.assertEqual([warning.id for warning in check_replica_pin_cache(None)], ['api.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_replica_pin_cache(None), [])
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(check_replica_pin_cache(None), [])
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'api'))
+        self.assertTrue(self.router.allow_migrate('default', 'api'))
+
+    def test_successful_write_pins_client(self):
+        employee = Employee.objects.create(
+            employee_id='EMP001', full_name='John Doe', email='john@test.com',
+            department='Engineering', created_by=self.user
+        )
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post('/api/attendance/mark/', {
+            'employee_id': str(employee.id), 'date': '2024-01-15', 'status': 'present'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+        # Pinned, so this read is served by the primary
+        response = client.get('/api/attendance/by_employee/', {'employee_id': str(employee.id)})
+        self.assertEqual(response.data['count'], 1)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'set DATABASE_REPLICA_URLS to test against a replica')
+class ReplicaRoutingTest(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        get_user_cache().clear()
+        self.user = User.objects.create_user(email='admin@test.com', password='admin123', name='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_reads_from_replica_and_writes_from_primary(self):
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with CaptureQueriesContext(replica) as queries:
+            self.assertEqual(self.client.get('/api/employees/').status_code, 200)
+        self.assertTrue(queries.captured_queries)
+
+        response = self.client.post('/api/employees/', {
+            'employee_id': 'EMP100', 'full_name': 'New Hire', 'email': 'new@test.com', 'department': 'HR'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(replica) as queries:
+            self.client.get('/api/employees/')
+        self.assertFalse(queries.captured_queries)
+
+
+class AttendancePartitionTest(TestCase):
+    def setUp(self):
+        self.employee = Employee.objects.create(
+            employee_id='EMP001',
+            full_name='John Doe',
+            email='john@example.com',
+            department='Engineering'
+        )
+        self.this_month = date.today().replace(day=1)
+
+    def partition_of(self, record):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM attendance_records WHERE id = %s', [record.id])
+            return cursor.fetchone()[0]
+
+    def test_records_are_routed_to_monthly_partitions(self):
+        record = AttendanceRecord.objects.create(employee=self.employee, date=date.today(), status='present')
+        self.assertEqual(self.partition_of(record), f'attendance_records_p{self.this_month:%Y_%m}')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AttendanceRecord.objects.create(employee=self.employee, date=date.today(), status='absent')
+
+    def test_command_moves_rows_out_of_default_partition(self):
+        future = (self.this_month + timedelta(days=32 * 6)).replace(day=10)
+        record = AttendanceRecord.objects.create(employee=self.employee, date=future, status='present')
+        self.assertEqual(self.partition_of(record), 'attendance_records_default')
+
+        call_command('manage_attendance_partitions', stdout=io.StringIO())
+        self.assertEqual(self.partition_of(record), f'attendance_records_p{future:%Y_%m}')
+        self.assertEqual(DailyAttendanceSummary.objects.totals(future)['present'], 1)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AttendanceRecord.objects.create(employee=self.employee, date=future, status='absent')
+
+    def test_command_expires_old_partitions(self):
+        old = (self.this_month - timedelta(days=1)).replace(day=5)
+        AttendanceRecord.objects.create(employee=self.employee, date=old, status='present')
+        AttendanceRecord.objects.create(employee=self.employee, date=date.today(), status='present')
+
+        call_command('manage_attendance_partitions', retain_months=0, drop=True, stdout=io.StringIO())
+        self.assertEqual(list(AttendanceRecord.objects.values_list('date', flat=True)), [date.today()])
+        self.assertFalse(DailyAttendanceSummary.objects.filter(date=old).exists())
+        call_command('rebuild_attendance_rollups', verify=True, stdout=io.StringIO())
+
+
+class AttendanceMatrixTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.engineer = Employee.objects.create(
+            employee_id='EMP001',
+            full_name='John Doe',
+            email='john@example.com',
+            department='Engineering'
+        )
+        self.designer = Employee.objects.create(
+            employee_id='EMP002',
+            full_name='Jane Smith',
+            email='jane@example.com',
+            department='Design'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def mark(self, employee, day, status_value):
+        return self.client.post('/api/attendance/mark/', {
+            'employee_id': str(employee.id),
+            'date': day.isoformat(),
+            'status': status_value,
+        }, format='json')
+
+    def test_matrix_follows_marks(self):
+        self.mark(self.engineer, date(2024, 2, 1), 'present')
+        self.mark(self.engineer, date(2024, 2, 2), 'absent')
+        self.mark(self.engineer, date(2024, 2, 29), 'present')
+        self.mark(self.designer, date(2024, 3, 1), 'present')
+        # A later mark for the same day replaces the earlier one
+        self.mark(self.engineer, date(2024, 2, 2), 'present')
+
+        response = self.client.get('/api/attendance/matrix/', {'month': '2024-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['days'], 29)
+        self.assertEqual(response.data['employee_ids'], ['EMP001', 'EMP002'])
+        self.assertEqual(response.data['statuses'], ['PP' + '-' * 26 + 'P', '-' * 29])
+
+        AttendanceRecord.objects.filter(employee=self.engineer, date=date(2024, 2, 1)).delete()
+        response = self.client.get('/api/attendance/matrix/', {'month': '2024-02', 'department': 'Engineering'})
+        self.assertEqual(response.data['ids'], [self.engineer.id])
+        self.assertEqual(response.data['statuses'], ['-P' + '-' * 26 + 'P'])
+
+        call_command('rebuild_attendance_rollups', verify=True, stdout=io.StringIO())
+
+    def test_matrix_is_one_query(self):
+        upsert_attendance([(self.engineer.id, date(2024, 1, day), 'present') for day in range(1, 32)])
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/attendance/matrix/', {'month': '2024-01'}).data
+        self.assertEqual(data['statuses'][0], 'P' * 31)
+
+    def test_matrix_requires_month(self):
+        for params in ({}, {'month': '2024-13'}, {'month': 'January'}):
+            response = self.client.get('/api/attendance/matrix/', params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_repairs_bitmaps(self):
+        self.mark(self.engineer, date(2024, 2, 3), 'absent')
+        MonthlyAttendanceBitmap.objects.update(absent_bits=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_attendance_rollups', verify=True, stdout=io.StringIO())
+
+        call_command('rebuild_attendance_rollups', start_date='2024-02-10', stdout=io.StringIO())
+        self.assertEqual(MonthlyAttendanceBitmap.objects.get().absent_bits, 1 << 2)
+
+
+class AttendanceReportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.engineers = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Engineer {i}',
+                email=f'eng{i}@example.com',
+                department='Engineering'
+            )
+            for i in (1, 2)
+        ]
+        self.designer = Employee.objects.create(
+            employee_id='EMP003',
+            full_name='Jane Smith',
+            email='jane@example.com',
+            department='Design'
+        )
+        # Mon 2024-01-01 .. Sun 2024-01-07: 5 working days
+        upsert_attendance([
+            (self.engineers[0].id, date(2024, 1, 1), 'present'),
+            (self.engineers[0].id, date(2024, 1, 2), 'present'),
+            (self.engineers[0].id, date(2024, 1, 3), 'absent'),
+            (self.engineers[0].id, date(2024, 1, 6), 'present'),
+            (self.designer.id, date(2024, 1, 1), 'absent'),
+            # Outside the period
+            (self.designer.id, date(2024, 1, 8), 'present'),
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def report(self, **params):
+        return self.client.get('/api/attendance/report/', {
+            'start_date': '2024-01-01', 'end_date': '2024-01-07', **params
+        })
+
+    def test_report_totals(self):
+        with self.assertNumQueries(3):
+            response = self.report()
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        self.assertEqual(data['working_days'], 5)
+        self.assertEqual(data['totals'], {
+            'employees': 3, 'present': 3, 'absent': 2, 'rate': 0.6, 'coverage': round(4 / 15, 4)
+        })
+        self.assertEqual([row['department'] for row in data['departments']], ['Design', 'Engineering'])
+        self.assertEqual(data['departments'][1]['coverage'], 0.3)
+
+        first, second, designer = data['employees']['results']
+        self.assertEqual((first['present'], first['absent'], first['rate'], first['coverage']), (3, 1, 0.75, 0.6))
+        self.assertEqual((second['present'], second['rate'], second['coverage']), (0, None, 0.0))
+        self.assertEqual((designer['present'], designer['absent']), (0, 1))
+
+    def test_report_department_and_paging(self):
+        data = self.report(department='Engineering', page_size=1, page=2).data
+        self.assertEqual(data['totals']['employees'], 2)
+        self.assertEqual(data['employees']['count'], 2)
+        self.assertEqual([row['employee_id'] for row in data['employees']['results']], ['EMP002'])
+        self.assertIsNone(data['employees']['next'])
+
+    def test_report_validates_dates(self):
+        self.assertEqual(self.report(start_date='').status_code, 400)
+        self.assertEqual(self.report(start_date='2024-02-01').status_code, 400)
+
+
+class PaginatedFieldsetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employees = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Employee {i}',
+                email=f'emp{i}@example.com',
+                department='Engineering'
+            )
+            for i in range(3)
+        ]
+        upsert_attendance(
+            [(employee.id, date(2024, 1, 15), 'present') for employee in self.employees]
+            + [(self.employees[0].id, date(2024, 1, day), 'absent') for day in (16, 17)]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_by_employee_and_by_date_are_paginated(self):
+        response = self.client.get('/api/attendance/by_employee/', {'employee_id': str(self.employees[0].id)})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([row['date'] for row in response.data['results']], ['2024-01-17', '2024-01-16', '2024-01-15'])
+
+        seen = []
+        params = {'date': '2024-01-15', 'pagination': 'cursor', 'page_size': 2}
+        response = self.client.get('/api/attendance/by_date/', params)
+        while True:
+            seen += [row['employee_id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(sorted(seen), sorted(str(employee.id) for employee in self.employees))
+
+        self.assertEqual(self.client.get('/api/attendance/by_date/', {'date': '15/01/2024'}).status_code, 400)
+
+    def test_fields_limit_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/attendance/by_date/', {'date': '2024-01-15', 'fields': 'id,status'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status'})
+        select = queries.captured_queries[-1]['sql']
+        self.assertIn('"status"', select)
+        self.assertNotIn('"created_at"', select)
+
+        response = self.client.get('/api/employees/', {'fields': 'employee_id,full_name'})
+        self.assertEqual(dict(response.data['results'][0]), {'employee_id': 'EMP002', 'full_name': 'Employee 2'})
+
+        response = self.client.get('/api/attendance/', {'fields': 'employee_id,date'})
+        self.assertEqual(set(response.data['results'][0]), {'employee_id', 'date'})
+
+    def test_fields_are_ignored_on_writes(self):
+        response = self.client.post('/api/employees/?fields=id', {
+            'employee_id': 'EMP100',
+            'full_name': 'New Hire',
+            'email': 'new@example.com',
+            'department': 'HR',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('email', response.data)
+
+
+class EncodedListTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employees = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Employee {i}',
+                email=f'emp{i}@example.com',
+                department='Engineering' if i % 2 else 'HR',
+                created_by=self.user if i else None,
+            )
+            for i in range(3)
+        ]
+        upsert_attendance(
+            [(employee.id, date(2024, 1, 15), 'present') for employee in self.employees]
+            + [(self.employees[0].id, date(2024, 1, day), 'absent') for day in (16, 17)]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def serializer_bytes(self, serializer_class, queryset, params):
+        request = Request(RequestFactory().get('/', params))
+        data = serializer_class(queryset, many=True, context={'request': request}).data
+        return JSONRenderer().render(data)
+
+    def test_encoder_matches_serializer(self):
+        cases = [
+            (EmployeeSerializer, Employee.objects.all(), {}),
+            (EmployeeSerializer, Employee.objects.all(), {'fields': 'id,full_name,created_at'}),
+            (AttendanceRecordSerializer, AttendanceRecord.objects.all(), {}),
+            (AttendanceRecordSerializer, AttendanceRecord.objects.all(), {'fields': 'date,status'}),
+        ]
+        for serializer_class, queryset, params in cases:
+            with self.subTest(serializer=serializer_class.__name__, params=params):
+                request = Request(RequestFactory().get('/', params))
+                encoder = RowEncoder.for_serializer(serializer_class(context={'request': request}))
+                self.assertIsNotNone(encoder)
+                self.assertEqual(
+                    JSONRenderer().render(encoder.encode_many(encoder.values(queryset.order_by('id')))),
+                    self.serializer_bytes(serializer_class, queryset.order_by('id'), params),
+                )
+
+    def test_list_endpoints_are_byte_identical(self):
+        cases = [
+            ('/api/employees/', EmployeeSerializer, Employee.objects.order_by('-created_at'), {}),
+            ('/api/employees/', EmployeeSerializer, Employee.objects.order_by('-created_at'), {'fields': 'employee_id'}),
+            ('/api/attendance/', AttendanceRecordSerializer, AttendanceRecord.objects.all(), {}),
+            ('/api/attendance/', AttendanceRecordSerializer,
+             AttendanceRecord.objects.order_by('-date', '-employee_id', '-id'), {'pagination': 'cursor'}),
+        ]
+        for url, serializer_class, queryset, params in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(
+                    JSONRenderer().render(response.data['results']),
+                    self.serializer_bytes(serializer_class, queryset, params),
+                )
+
+    def test_list_reads_values_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/attendance/', {'pagination': 'cursor', 'page_size': 2, 'fields': 'status'})
+        self.assertEqual(response.data['results'], [{'status': 'absent'}, {'status': 'absent'}])
+        self.assertNotIn('"created_at"', queries.captured_queries[-1]['sql'])
+
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual([row['status'] for row in next_page.data['results']], ['present', 'present'])
+
+
+class RendererTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        for i in range(30):
+            Employee.objects.create(
+                employee_id=f'EMP{i:03d}',
+                full_name=f'Employee {i} ',
+                email=f'emp{i}@example.com',
+                department='Engineering'
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_fast_json_matches_json_renderer(self):
+        response = self.client.get('/api/employees/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+        self.assertEqual(FastJSONRenderer().render({1: 'a', 'b': date(2024, 1, 15)}), b'{"1":"a","b":"2024-01-15"}')
+
+    def test_fast_json_matches_drf_bytes(self):
+        payload = {
+            'created_at': datetime(2024, 1, 15, 9, 30, 5, 123456, tzinfo=dt_timezone.utc),
+            'local': datetime(2024, 1, 15, 9, 30, 5, tzinfo=dt_timezone(timedelta(hours=2))),
+            'naive': datetime(2024, 1, 15, 9, 30, 5, 500),
+            'time': time(9, 30, 5, 123456),
+            'floats': [0.0, 0.1, 1.0, 1e15, 1e16, -2.5e20, 1e-5, 2.5e-10],
+        }
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(FastJSONRenderer().render({'rate': 0.25}), b'{"rate":0.25}')
+
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'rate': value})
+
+    def test_columnar_lists(self):
+        response = self.client.get('/api/employees/', {'format': 'columnar', 'fields': 'employee_id,full_name'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.staffhub.columnar+json')
+        payload = json.loads(response.content)
+        self.assertEqual(payload['count'], 30)
+        self.assertEqual(payload['results']['columns'], ['employee_id', 'full_name'])
+        self.assertEqual(payload['results']['rows'][0], ['EMP029', 'Employee 29 '])
+
+        self.assertEqual(columnar({'detail': 'x'}), {'detail': 'x'})
+        self.assertEqual(columnar([{'a': 1}, {'b': 2}]), [{'a': 1}, {'b': 2}])
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        response = self.client.get('/api/employees/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['count'], 30)
+
+    def test_compression_follows_accept_encoding(self):
+        plain = self.client.get('/api/employees/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+        response = self.client.get('/api/employees/', HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+        response = self.client.get('/api/employees/', HTTP_ACCEPT_ENCODING='*, gzip;q=0')
+        self.assertEqual(response.get('Content-Encoding'), 'br' if brotli else None)
+
+        with override_settings(COMPRESSION_MIN_SIZE=len(plain.content) + 1):
+            response = self.client.get('/api/employees/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+class QueryPlanTest(TestCase):
+    """
+    EXPLAINs every query the read endpoints run and fails on sequential scans.
+
+    Sequential scans are disabled for the EXPLAIN, so the planner only picks
+    one when no index can serve the query at all, whatever the table size.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        departments = [code for code, _ in Employee.DEPARTMENTS]
+        cls.employees = Employee.objects.bulk_create([
+            Employee(
+                employee_id=f'EMP{i:03d}',
+                full_name=f'Employee {i}',
+                email=f'emp{i}@example.com',
+                department=departments[i % len(departments)],
+            )
+            for i in range(60)
+        ])
+        upsert_attendance([
+            (employee.id, date(2024, 1, day), 'present' if (i + day) % 4 else 'absent')
+            for i, employee in enumerate(cls.employees)
+            for day in range(1, 11)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def sequential_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0][0]['Plan']
+        return [node['Relation Name'] for node in plan_nodes(plan) if node['Node Type'] == 'Seq Scan']
+
+    def assertIndexedPlans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200, response.content)
+        selects = [query['sql'] for query in queries.captured_queries if query['sql'].lstrip().startswith('SELECT')]
+        self.assertTrue(selects)
+        for sql in selects:
+            with self.subTest(url=url, params=params, sql=sql):
+                self.assertEqual(self.sequential_scans(sql), [])
+
+    def test_employee_reads(self):
+        self.assertIndexedPlans('/api/employees/')
+        self.assertIndexedPlans('/api/employees/', {'department': 'Engineering'})
+        self.assertIndexedPlans(f'/api/employees/{self.employees[0].id}/')
+
+    def test_employee_search_reads(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest('substring search is only indexed where pg_trgm is installed')
+        self.assertIndexedPlans('/api/employees/', {'search': 'Employee 7'})
+        self.assertIndexedPlans('/api/employees/', {'search': '007'})
+
+    def test_attendance_reads(self):
+        self.assertIndexedPlans('/api/attendance/')
+        self.assertIndexedPlans('/api/attendance/', {'date': '2024-01-05'})
+        self.assertIndexedPlans('/api/attendance/', {'date': '2024-01-05', 'status': 'absent'})
+        self.assertIndexedPlans('/api/attendance/', {'start_date': '2024-01-02', 'end_date': '2024-01-04'})
+        self.assertIndexedPlans('/api/attendance/', {'employee_id': str(self.employees[0].id)})
+        self.assertIndexedPlans('/api/attendance/', {'pagination': 'cursor'})
+        self.assertIndexedPlans('/api/attendance/by_date/', {'date': '2024-01-05'})
+        self.assertIndexedPlans('/api/attendance/by_employee/', {'employee_id': str(self.employees[0].id)})
+
+    def test_rollup_reads(self):
+        self.assertIndexedPlans('/api/attendance/today_stats/')
+        self.assertIndexedPlans('/api/dashboard/stats/')
+        self.assertIndexedPlans('/api/attendance/matrix/', {'month': '2024-01', 'department': 'HR'})
+        self.assertIndexedPlans('/api/attendance/report/', {
+            'start_date': '2024-01-01', 'end_date': '2024-01-10', 'department': 'HR',
+        })
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employees = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Employee {i}',
+                email=f'emp{i}@example.com',
+                department='Engineering'
+            )
+            for i in range(6)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            metrics.fingerprint("SELECT *  FROM t WHERE id = 5 AND name = 'O''Hara' AND k IN (1, 2, 3) AND p2024 = 1.5"),
+            'SELECT * FROM t WHERE id = ? AND name = ? AND k IN (...) AND p2024 = ?',
+        )
+        self.assertEqual(metrics.fingerprint('RELEASE SAVEPOINT "s1396829_x32"'), 'RELEASE SAVEPOINT ?')
+
+    def test_server_timing_and_metrics(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/dashboard/stats/')
+        count = len(queries)
+        self.assertRegex(response['Server-Timing'], rf'^db;dur=[\d.]+;desc="{count} queries", app;dur=[\d.]+, total;dur=[\d.]+$')
+
+        response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_requests_total{route="dashboard-stats",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_queries_bucket{route="dashboard-stats",le="+Inf"} 1', body)
+        self.assertIn(f'http_request_queries_sum{{route="dashboard-stats"}} {count}', body)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('employee_directory_size ', body)
+
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.8').status_code, 404)
+
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 404)
+            response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1', HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+
+    def test_streaming_responses_are_recorded_when_exhausted(self):
+        def stream(request):
+            def chunks():
+                for employee in Employee.objects.all():
+                    yield employee.employee_id.encode()
+                yield Employee.objects.first().employee_id.encode()
+            return StreamingHttpResponse(chunks())
+
+        response = RequestMetricsMiddleware(stream)(RequestFactory().get('/export/'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertNotIn('http_requests_total{route="unmatched"', metrics.render_metrics())
+
+        self.assertEqual(len(b''.join(response.streaming_content)), 7 * 6)
+        body = metrics.render_metrics()
+        self.assertIn('http_requests_total{route="unmatched",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_queries_sum{route="unmatched"} 2', body)
+
+    def test_repeated_statements_are_flagged(self):
+        def n_plus_one(request):
+            for employee in self.employees:
+                Employee.objects.get(pk=employee.pk)
+            return HttpResponse()
+
+        request = RequestFactory().get('/employees/')
+        with self.assertLogs('api.middleware', 'WARNING') as logs:
+            response = RequestMetricsMiddleware(n_plus_one)(request)
+        self.assertIn('desc="6 queries"', response['Server-Timing'])
+        self.assertIn('6 executions of SELECT', logs.output[0])
+        self.assertIn('http_request_n_plus_one_total{route="unmatched"} 1', metrics.render_metrics())
+
+    async def test_async_views_are_recorded(self):
+        get_user_cache().clear()
+        auth = f'Bearer {issue_tokens(self.user).access_token}'
+        middleware = RequestMetricsMiddleware(async_views.dashboard_stats)
+        request = AsyncRequestFactory().get('/api/dashboard/stats/', headers={'Authorization': auth})
+        response = await middleware(request)
+        self.assertEqual(response.status_code, 200)
+        # User lookup and the dashboard rollup read, run in sync_to_async threads
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+
+class SeedDataTest(TestCase):
+    def seed(self, **options):
+        options = {
+            'employees': 30, 'days': 14, 'end_date': date(2024, 3, 8), 'departments': 'Engineering=3,HR=1',
+            'absence_rate': 0.2, 'seed': 7, 'prefix': 'GEN', 'stdout': io.StringIO(), **options,
+        }
+        call_command('seed_data', **options)
+        return list(AttendanceRecord.objects.order_by('id').values_list('id', 'employee__employee_id', 'date', 'status'))
+
+    def test_generates_dataset(self):
+        records = self.seed()
+        self.assertEqual(Employee.objects.filter(employee_id__startswith='GEN').count(), 30)
+        self.assertTrue(set(Employee.objects.values_list('department', flat=True)) <= {'Engineering', 'HR'})
+        # Weekdays from Monday 26 February to Friday 8 March, across a month boundary
+        self.assertEqual({record[2] for record in records}, {
+            date(2024, 2, day) for day in range(26, 30)
+        } | {date(2024, 3, day) for day in (1, 4, 5, 6, 7, 8)})
+        self.assertEqual(len(records), 30 * 10)
+        self.assertTrue(any(record[3] == 'absent' for record in records))
+        call_command('rebuild_attendance_rollups', verify=True, stdout=io.StringIO())
+
+    def test_same_seed_reproduces_dataset(self):
+        first = self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+        # The rerun writes through the now existing partitions and their triggers
+        self.assertEqual(self.seed(replace=True), first)
+        call_command('rebuild_attendance_rollups', verify=True, stdout=io.StringIO())
+        self.assertNotEqual(self.seed(replace=True, seed=8), first)
+
+
+class BenchEndpointsTest(TestCase):
+    def test_percentiles(self):
+        values = sorted(float(value) for value in range(1, 101))
+        self.assertEqual([percentile(values, pct) for pct in (50, 95, 99)], [50.0, 95.0, 99.0])
+        self.assertEqual(percentile([7.0], 99), 7.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_baseline_regressions(self):
+        baseline = {'endpoints': {
+            'by_date': {'p95_ms': 10.0, 'rps': 100.0},
+            'today_stats': {'p95_ms': 10.0, 'rps': 100.0},
+        }}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as baseline_file:
+            json.dump(baseline, baseline_file)
+        self.addCleanup(os.remove, baseline_file.name)
+
+        failures = BenchEndpointsCommand().compare({
+            'by_date': {'p95_ms': 11.9, 'rps': 81.0},
+            'today_stats': {'p95_ms': 12.1, 'rps': 79.0},
+            'mark': {'p95_ms': 500.0, 'rps': 1.0},
+        }, baseline_file.name, 0.2)
+        self.assertEqual(failures, [
+            'today_stats: p95 12.1ms, baseline 10.0ms',
+            'today_stats: 79.0 req/s, baseline 100.0 req/s',
+        ])
+
+
+def sql_report(statements, baseline=None):
+    """
+    Statements with literals replaced and repeats collapsed, or a diff of
+    them against a baseline run
+    """
+    def collapse(run):
+        return [f'{len(list(group))}x {sql}' for sql, group in groupby(metrics.fingerprint(sql) for sql in run)]
+
+    if baseline is None:
+        lines = collapse(statements)
+    else:
+        lines = list(difflib.unified_diff(collapse(baseline), collapse(statements), lineterm='', n=1))[2:]
+    return '\n'.join(f'    {line}' for line in lines)
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Calls every endpoint with 10, 100 and 1,000 employees and attendance
+    records and checks it runs the same, budgeted number of queries each
+    time, so a query per row fails here long before it is slow.
+
+    Caches are cleared before each request and writes are rolled back, so
+    every run starts from the same state.
+    """
+    SIZES = (10, 100, 1000)
+    DAY = date(2024, 1, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin',
+            is_staff=True
+        )
+        cls.employees = []
+
+    def grow(self, size):
+        """Top the fixture up to `size` employees, each marked on DAY"""
+        departments = [code for code, _ in Employee.DEPARTMENTS]
+        added = Employee.objects.bulk_create([
+            Employee(
+                employee_id=f'EMP{i:04d}',
+                full_name=f'Employee {i}',
+                email=f'emp{i}@example.com',
+                department=departments[i % len(departments)],
+                created_by=self.user,
+            )
+            for i in range(len(self.employees), size)
+        ])
+        upsert_attendance(
+            [(employee.id, self.DAY, 'present' if i % 5 else 'absent') for i, employee in enumerate(added)],
+            marked_by_id=self.user.pk
+        )
+        self.employees += added
+
+    def endpoints(self, size):
+        """(name, budget, method, path, data, format) for every endpoint"""
+        employee = self.employees[0]
+        record = AttendanceRecord.objects.filter(employee=employee).first()
+        day = self.DAY.isoformat()
+        upload = SimpleUploadedFile('employees.csv', (
+            'employee_id,full_name,email,department\n'
+            + ''.join(f'NEW{i:04d},New Hire {i},new{i}@example.com,Sales\n' for i in range(size))
+        ).encode())
+        mark_all = [{'employee_id': str(e.id), 'date': day, 'status': 'absent'} for e in self.employees]
+        return [
+            ('signup', 2, 'post', '/api/auth/signup/',
+             {'email': 'new@test.com', 'password': 'secret123', 'name': 'New'}, 'json'),
+            ('login', 1, 'post', '/api/auth/login/', {'email': 'admin@test.com', 'password': 'admin123'}, 'json'),
+            ('token refresh', 0, 'post', '/api/auth/token/refresh/',
+             {'refresh': str(issue_tokens(self.user))}, 'json'),
+            ('logout', 0, 'post', '/api/auth/logout/', {}, 'json'),
+            ('profile', 0, 'get', '/api/auth/profile/', None, None),
+            ('profile update', 1, 'patch', '/api/auth/profile/', {'department': 'People'}, 'json'),
+            ('dashboard stats', 1, 'get', '/api/dashboard/stats/', None, None),
+            ('db pool stats', 0, 'get', '/api/system/db-pool/', None, None),
+            ('metrics', 0, 'get', '/metrics', None, None),
+            ('employee list', 2, 'get', '/api/employees/', None, None),
+            ('employee list filtered', 2, 'get', '/api/employees/', {'department': 'Engineering'}, None),
+            ('employee search', 2, 'get', '/api/employees/', {'search': 'Employee 7'}, None),
+            ('employee list fields', 2, 'get', '/api/employees/', {'fields': 'id,full_name'}, None),
+            ('employee detail', 1, 'get', f'/api/employees/{employee.id}/', None, None),
+            ('employee create', 5, 'post', '/api/employees/', {
+                'employee_id': 'EMP9999', 'full_name': 'New Hire', 'email': 'hire@example.com',
+                'department': 'Sales',
+            }, 'json'),
+            ('employee update', 6, 'put', f'/api/employees/{employee.id}/', {
+                'employee_id': employee.employee_id, 'full_name': 'Renamed', 'email': employee.email,
+                'department': employee.department,
+            }, 'json'),
+            ('employee partial update', 2, 'patch', f'/api/employees/{employee.id}/',
+             {'full_name': 'Renamed'}, 'json'),
+            ('employee delete', 4, 'delete', f'/api/employees/{employee.id}/', None, None),
+            ('employee check unique', 2, 'get', '/api/employees/check_unique/',
+             {'employee_id': 'EMP0001', 'email': 'nobody@example.com'}, None),
+            ('employee import', 4, 'post', '/api/employees/import/', {'file': upload}, 'multipart'),
+            ('attendance list', 2, 'get', '/api/attendance/', None, None),
+            ('attendance list filtered', 2, 'get', '/api/attendance/',
+             {'date': day, 'status': 'absent'}, None),
+            ('attendance list cursor', 1, 'get', '/api/attendance/',
+             {'pagination': 'cursor', 'page_size': 1000}, None),
+            ('attendance list fields', 2, 'get', '/api/attendance/', {'fields': 'id,status'}, None),
+            ('attendance detail', 1, 'get', f'/api/attendance/{record.id}/', None, None),
+            ('attendance update', 2, 'patch', f'/api/attendance/{record.id}/', {'status': 'absent'}, 'json'),
+            ('attendance delete', 2, 'delete', f'/api/attendance/{record.id}/', None, None),
+            ('attendance mark', 5, 'post', '/api/attendance/mark/',
+             {'employee_id': str(employee.id), 'date': day, 'status': 'absent'}, 'json'),
+            ('attendance mark bulk', 4, 'post', '/api/attendance/mark_bulk/', {'items': mark_all}, 'json'),
+            ('attendance export', 2, 'get', '/api/attendance/export/', {'date': day}, None),
+            ('today stats', 1, 'get', '/api/attendance/today_stats/', None, None),
+            ('by date', 2, 'get', '/api/attendance/by_date/', {'date': day}, None),
+            ('by employee', 3, 'get', '/api/attendance/by_employee/', {'employee_id': str(employee.id)}, None),
+            ('matrix', 1, 'get', '/api/attendance/matrix/', {'month': '2024-01'}, None),
+            ('report', 3, 'get', '/api/attendance/report/', {'start_date': '2024-01-01', 'end_date': '2024-01-31'}, None),
+        ]
+
+    def run_endpoint(self, client, method, path, data, data_format):
+        """Status and SQL of one request, which is rolled back afterwards"""
+        get_directory().clear()
+        get_user_cache().clear()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(client, method)(path, data, format=data_format, REMOTE_ADDR='127.0.0.1')
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                statements = [query['sql'] for query in queries.captured_queries]
+            transaction.set_rollback(True)
+        return response.status_code, statements
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        runs = {}
+        for size in self.SIZES:
+            self.grow(size)
+            for name, budget, method, path, data, data_format in self.endpoints(size):
+                status_code, statements = self.run_endpoint(client, method, path, data, data_format)
+                self.assertLess(status_code, 400, f'{name} returned {status_code}')
+                runs.setdefault(name, (budget, {}))[1][size] = statements
+
+        failures = []
+        for name, (budget, by_size) in runs.items():
+            smallest = by_size[self.SIZES[0]]
+            for size, statements in by_size.items():
+                if len(statements) == budget:
+                    continue
+                if size == self.SIZES[0]:
+                    detail = sql_report(statements)
+                else:
+                    detail = sql_report(statements, baseline=smallest) or f'    as with {self.SIZES[0]} rows'
+                failures.append(f'{name}: {len(statements)} queries with {size} rows, budget {budget}\n{detail}')
+        if failures:
+            self.fail('Query budgets exceeded (diffs are against the smallest fixture):\n\n' + '\n\n'.join(failures))
+
+
+class IngestBadgeSwipesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employees = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Employee {i}',
+                email=f'emp{i}@example.com',
+                department='Engineering'
+            )
+            for i in range(3)
+        ]
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory.name, name)
+        content = ('badge_number,timestamp,reader\n' + ''.join(lines)).encode()
+        with (gzip.open if name.endswith('.gz') else open)(path, 'wb') as swipe_file:
+            swipe_file.write(content)
+        return path
+
+    def ingest(self, *paths):
+        out = io.StringIO()
+        call_command('ingest_badge_swipes', *paths, marked_by='admin@test.com', batch_size=2, stdout=out)
+        return out.getvalue()
+
+    def test_merges_swipes_idempotently(self):
+        upsert_attendance([
+            (self.employees[1].id, date(2024, 3, 4), 'absent'),
+            (self.employees[2].id, date(2024, 3, 4), 'present'),
+        ])
+        monday = self.write('2024-03-04.csv', [
+            'EMP000,2024-03-04T08:58:12,north\n',
+            'EMP000,2024-03-04T17:31:40,north\n',
+            'EMP001,2024-03-04T09:02:00+00:00,south\n',
+            'EMP002,2024-03-04 09:15:00,south\n',
+            'EMP999,2024-03-04T09:20:00,south\n',
+            'EMP001,yesterday,south\n',
+        ])
+        tuesday = self.write('2024-03-05.csv.gz', [
+            'EMP000,2024-03-05T08:45:00,north\n',
+            ',2024-03-05T08:46:00,north\n',
+        ])
+
+        output = self.ingest(monday, tuesday)
+        self.assertIn('Rejected 3 swipes: 2 unknown badge, 1 invalid time', output)
+        self.assertIn('Loaded 5 swipes into 4 attendance days: 2 inserted, 1 updated, 1 unchanged, 3 rejected', output)
+        records = AttendanceRecord.objects.order_by('date', 'employee__employee_id')
+        self.assertEqual(
+            [(r.employee.employee_id, r.date, r.status) for r in records],
+            [
+                ('EMP000', date(2024, 3, 4), 'present'),
+                ('EMP001', date(2024, 3, 4), 'present'),
+                ('EMP002', date(2024, 3, 4), 'present'),
+                ('EMP000', date(2024, 3, 5), 'present'),
+            ]
+        )
+        self.assertEqual(records.get(employee=self.employees[1]).marked_by, self.user)
+        self.assertIsNone(records.get(employee=self.employees[2]).marked_by)
+
+        self.assertIn('0 inserted, 0 updated, 4 unchanged', self.ingest(monday, tuesday))
+        self.assertEqual(AttendanceRecord.objects.count(), 4)
+        call_command('rebuild_attendance_rollups', verify=True, stdout=io.StringIO())
+
+    def test_missing_columns(self):
+        path = os.path.join(self.directory.name, 'swipes.csv')
+        with open(path, 'w') as swipe_file:
+            swipe_file.write('badge,time\nEMP000,2024-03-04T08:58:12\n')
+        with self.assertRaisesMessage(CommandError, 'missing column(s) badge_number, timestamp'):
+            self.ingest(path)
+
+    def test_rejects_undecodable_and_malformed_lines(self):
+        path = os.path.join(self.directory.name, 'swipes.csv')
+        with open(path, 'wb') as swipe_file:
+            swipe_file.write(
+                b'badge_number,timestamp,reader\n'
+                b'EMP000,2024-03-04T08:58:12,north\n'
+                b'EMP001,2024-03-04T09:02:00,caf\xe9\n'
+                b'EMP002,2024-03-04T09:15:00,' + b'x' * (csv.field_size_limit() + 1) + b'\n'
+                b'EMP002,2024-03-04T09:16:00,south\n'
+            )
+        output = self.ingest(path)
+        self.assertIn('Rejected 2 swipes: 1 not UTF-8, 1 malformed CSV', output)
+        self.assertEqual(
+            set(AttendanceRecord.objects.values_list('employee__employee_id', flat=True)),
+            {'EMP000', 'EMP002'}
+        )
+
+    def test_unreadable_file(self):
+        path = self.write('swipes.csv.gz', ['EMP000,2024-03-04T08:58:12,north\n'])
+        with open(path, 'r+b') as swipe_file:
+            swipe_file.truncate(20)
+        with self.assertRaisesMessage(CommandError, path):
+            self.ingest(path)
+
+
+@override_settings(ATTENDANCE_WRITE_BEHIND=True)
+class WriteBehindTest(TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.user = User.objects.create_user(
+            email='admin@test.com',
+            password='admin123',
+            name='Admin'
+        )
+        self.employees = [
+            Employee.objects.create(
+                employee_id=f'EMP00{i}',
+                full_name=f'Employee {i}',
+                email=f'emp{i}@example.com',
+                department='Engineering'
+            )
+            for i in range(2)
+        ]
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        # No flush thread: its own connection would not see the test transaction
+        self.buffer = write_behind._buffer = self.new_buffer()
+        self.addCleanup(setattr, write_behind, '_buffer', None)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def new_buffer(self):
+        return write_behind.MarkBuffer(journal_dir=self.directory.name, fsync=False, background=False)
+
+    def journals(self):
+        return sorted(os.listdir(self.directory.name))
+
+    def mark(self, employee, status):
+        return self.client.post('/api/attendance/mark/', {
+            'employee_id': str(employee.id), 'date': '2024-03-04', 'status': status,
+        }, format='json')
+
+    def test_marks_are_coalesced_and_written_in_one_upsert(self):
+        for employee, status in [(0, 'present'), (0, 'absent'), (1, 'present'), (0, 'present')]:
+            response = self.mark(self.employees[employee], status)
+            self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'present')
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertEqual(len(self.journals()), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(len([query for query in queries.captured_queries if 'INSERT' in query['sql']]), 1)
+        self.assertEqual(
+            {(record.employee_id, record.status, record.marked_by_id) for record in AttendanceRecord.objects.all()},
+            {(self.employees[0].id, 'present', self.user.id), (self.employees[1].id, 'present', self.user.id)}
+        )
+        self.assertEqual(self.journals(), [])
+        self.assertEqual(self.buffer.flush(), 0)
+
+        body = metrics.render_metrics()
+        self.assertIn('attendance_write_behind_coalesced_total 2', body)
+        self.assertIn('attendance_write_behind_flushed_total 2', body)
+        self.assertIn('attendance_write_behind_flush_lag_seconds_count 1', body)
+        self.assertIn('attendance_write_behind_pending 0', body)
+
+    def test_journals_of_dead_processes_are_recovered(self):
+        self.mark(self.employees[0], 'absent')
+        self.mark(self.employees[1], 'absent')
+        # A crash: the process disappears with its marks unwritten and its lock released
+        path, fd = self.buffer.journal
+        os.close(fd)
+        with open(path, 'a') as journal:
+            journal.write(f'{self.employees[0].id}\t2024-03-0')
+
+        # Marked again directly before the journal is replayed; the newer mark stays
+        upsert_attendance([(self.employees[1].id, date(2024, 3, 4), 'present')])
+
+        live = self.new_buffer()
+        live.add(self.employees[0].id, date(2024, 3, 5), 'present')
+        with self.assertLogs('api.write_behind', 'WARNING'):
+            self.assertEqual(write_behind.recover_journals(self.directory.name), 1)
+        self.assertEqual(
+            dict(AttendanceRecord.objects.filter(date=date(2024, 3, 4)).values_list('employee__employee_id', 'status')),
+            {'EMP000': 'absent', 'EMP001': 'present'}
+        )
+        # The running buffer's journal is locked and left alone
+        self.assertEqual(self.journals(), [os.path.basename(live.journal[0])])
+        self.assertEqual(live.flush(), 1)
+        self.assertEqual(self.journals(), [])
+
+    def test_marks_of_deleted_employees_are_dropped(self):
+        self.mark(self.employees[0], 'present')
+        self.mark(self.employees[1], 'present')
+        self.employees[1].delete()
+        with self.assertLogs('api.write_behind', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(AttendanceRecord.objects.values_list('employee_id', flat=True)), [self.employees[0].id])
+        self.assertIn('attendance_write_behind_flushed_total 1', metrics.render_metrics())
+
+    def test_marks_of_deleted_users_are_written_unattributed(self):
+        marker = User.objects.create_user(email='kiosk@test.com', password='kiosk123', name='Kiosk')
+        self.buffer.add(self.employees[0].id, date(2024, 3, 4), 'present', marker.id)
+        marker.delete()
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertIsNone(AttendanceRecord.objects.get().marked_by_id)
+
+    def test_unwritable_marks_are_set_aside(self):
+        self.buffer.add(self.employees[0].id, date(2024, 3, 4), 'present')
+        self.buffer.add(self.employees[1].id, date(2024, 3, 4), 'x' * 20)
+        with self.assertLogs('api.write_behind', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(AttendanceRecord.objects.get().employee_id, self.employees[0].id)
+        [rejected] = self.journals()
+        self.assertTrue(rejected.startswith('rejected-'))
+        with open(os.path.join(self.directory.name, rejected)) as rejected_file:
+            self.assertEqual(rejected_file.read().split('\t')[:3], [str(self.employees[1].id), '2024-03-04', 'x' * 20])
+
+    @override_settings(ATTENDANCE_WRITE_BEHIND_MAX_ATTEMPTS=2)
+    def test_failing_batches_are_set_aside_after_retries(self):
+        def unavailable(marks, journal_dir):
+            raise OperationalError('database unavailable')
+
+        buffer = self.new_buffer()
+        buffer.add(self.employees[0].id, date(2024, 3, 4), 'present')
+        original, write_behind.write_marks = write_behind.write_marks, unavailable
+        try:
+            with self.assertRaises(OperationalError):
+                buffer.flush()
+            self.assertEqual(len(buffer.pending), 1)
+            with self.assertLogs('api.write_behind', 'ERROR'):
+                self.assertEqual(buffer.flush(), 0)
+        finally:
+            write_behind.write_marks = original
+        self.assertEqual(buffer.pending, {})
+        self.assertEqual([name.split('-')[0] for name in self.journals()], ['rejected'])
+        with self.assertLogs('api.write_behind', 'WARNING'):
+            self.assertEqual(write_behind.recover_journals(self.directory.name, write_behind.REJECTED_PATTERN), 1)
+        self.assertEqual(self.journals(), [])
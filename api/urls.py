@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import async_auth, async_views, views
 
 router = DefaultRouter()
 router.register(r'employees', views.EmployeeViewSet, basename='employee')
@@ -9,15 +10,38 @@ router.register(r'attendance', views.AttendanceViewSet, basename='attendance')
 
 urlpatterns = [
     # Authentication endpoints
-    path('auth/signup/', views.signup, name='signup'),
-    path('auth/login/', views.login, name='login'),
+    path('auth/signup/', async_auth.signup if settings.ASYNC_AUTH else views.signup, name='signup'),
+    path('auth/login/', async_auth.login if settings.ASYNC_AUTH else views.login, name='login'),
     path('auth/logout/', views.logout, name='logout'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/profile/', views.profile, name='profile'),
     
     # Dashboard
-    path('dashboard/stats/', views.dashboard_stats, name='dashboard-stats'),
+    path(
+        'dashboard/stats/',
+        async_views.dashboard_stats if settings.ASYNC_VIEWS else views.dashboard_stats,
+        name='dashboard-stats'
+    ),
     
+    # Per-worker connection pool statistics (staff only)
+    path('system/db-pool/', views.db_pool_stats, name='db-pool-stats'),
+]
+
+if settings.ASYNC_VIEWS:
+    # Native async reads; writes on the same URLs still go to the viewsets
+    employee_list = views.EmployeeViewSet.as_view({'get': 'list', 'post': 'create'})
+    employee_detail = views.EmployeeViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+    })
+    urlpatterns += [
+        path('employees/', async_views.employee_list_view(employee_list), name='employee-list'),
+        path('employees/<uuid:pk>/', async_views.employee_detail_view(employee_detail), name='employee-detail'),
+        path('attendance/today_stats/', async_views.today_stats, name='attendance-today-stats'),
+        path('attendance/by_employee/', async_views.by_employee, name='attendance-by-employee'),
+        path('attendance/by_date/', async_views.by_date, name='attendance-by-date'),
+    ]
+
+urlpatterns += [
     # Router URLs
     path('', include(router.urls)),
 ]
@@ -1,18 +1,39 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import HttpResponse, HttpResponseNotFound, StreamingHttpResponse
 from django.contrib.auth import authenticate
-from django.db.models import Q
 from datetime import datetime, date
-from .models import User, Employee, AttendanceRecord
+from staff_hub_backend.postgres_pool.base import pool_stats
+import hmac
+import os
+from .authentication import get_full_user, issue_tokens
+from .bulk import upsert_attendance
+from .db_router import ReplicaReadMixin, replica_reads
+from .directory import get_directory
+from .encoders import FastListMixin
+from .exports import (
+    EXPORT_CONTENT_TYPES, EXPORT_FORMATS, export_attendance, export_etag, parse_range_start, read_spool, spool_export
+)
+from .importers import IMPORT_FORMATS, ImportFileError, detect_format, import_employees
+from .matrix import attendance_matrix
+from .metrics import render_metrics
+from .reports import count_working_days, department_report, employee_report, employee_row
+from .models import User, Employee, AttendanceRecord, DailyAttendanceSummary
+from .pagination import AttendancePagination, ReportPagination
+from .write_behind import get_mark_buffer
 from .serializers import (
     UserSerializer,
     SignupSerializer,
     LoginSerializer,
     EmployeeSerializer,
     AttendanceRecordSerializer,
+    AttendanceMarkItemSerializer,
     MarkAttendanceSerializer,
     AttendanceStatsSerializer
 )
@@ -26,7 +47,7 @@ def signup(request):
     serializer = SignupSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_tokens(user)
         user_serializer = UserSerializer(user)
         
         return Response({
@@ -45,7 +66,7 @@ def login(request):
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_tokens(user)
         user_serializer = UserSerializer(user)
         
         return Response({
@@ -76,44 +97,45 @@ def logout(request):
 def profile(request):
     """Get or update user profile"""
     if request.method == 'GET':
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(get_full_user(request.user))
         return Response(serializer.data)
     
     elif request.method in ['PUT', 'PATCH']:
-        serializer = UserSerializer(request.user, data=request.data, partial=True)
+        serializer = UserSerializer(get_full_user(request.user), data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def filter_employees(queryset, params):
+    """Apply the employee list query parameters"""
+    # Filter by department
+    department = params.get('department', None)
+    if department:
+        queryset = queryset.filter(department=department)
+    
+    # Search by name or employee_id or email, most relevant first
+    search = params.get('search', None)
+    if search:
+        queryset = queryset.search(search)
+    
+    return queryset
+
+
 # Employee ViewSet
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing employees
     """
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list', 'retrieve')
 
     def get_queryset(self):
-        queryset = Employee.objects.all()
-        
-        # Filter by department
-        department = self.request.query_params.get('department', None)
-        if department:
-            queryset = queryset.filter(department=department)
-        
-        # Search by name or employee_id or email
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(full_name__icontains=search) |
-                Q(employee_id__icontains=search) |
-                Q(email__icontains=search)
-            )
-        
-        return queryset
+        queryset = filter_employees(Employee.objects.all(), self.request.query_params)
+        return self.get_serializer_class().restrict_queryset(queryset, self.request)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -127,25 +149,47 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         result = {}
         
         if employee_id:
-            result['employee_id_unique'] = not Employee.objects.filter(employee_id=employee_id).exists()
+            result['employee_id_unique'] = get_directory().get_by_employee_id(employee_id) is None
         
         if email:
-            result['email_unique'] = not Employee.objects.filter(email=email).exists()
+            result['email_unique'] = get_directory().get_by_email(email) is None
         
         return Response(result)
 
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """Import employees from an uploaded CSV or NDJSON file"""
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            return Response(
+                {'error': f'file_format must be one of: {", ".join(IMPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            report = import_employees(upload.file, file_format, created_by=request.user)
+        except ImportFileError as e:
+            return Response({'error': str(e), 'line': e.line, **e.report}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
 
 # Attendance ViewSet
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(ReplicaReadMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing attendance records
     """
     queryset = AttendanceRecord.objects.all()
     serializer_class = AttendanceRecordSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AttendancePagination
+    replica_actions = ('list', 'retrieve', 'today_stats', 'by_employee', 'by_date', 'matrix', 'report')
 
     def get_queryset(self):
-        queryset = AttendanceRecord.objects.select_related('employee').all()
+        queryset = AttendanceRecord.objects.all()
         
         # Filter by employee
         employee_id = self.request.query_params.get('employee_id', None)
@@ -157,13 +201,23 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         if date_param:
             queryset = queryset.filter(date=date_param)
         
+        # Filter by status
+        status_param = self.request.query_params.get('status', None)
+        if status_param:
+            queryset = queryset.filter(status=status_param)
+        
         # Filter by date range
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
         if start_date and end_date:
             queryset = queryset.filter(date__range=[start_date, end_date])
         
-        return queryset
+        return self.get_serializer_class().restrict_queryset(queryset, self.request)
+
+    def paginated_records(self, queryset):
+        """Paginate and encode records like the main list"""
+        queryset = self.get_serializer_class().restrict_queryset(queryset, self.request)
+        return self.encoded_list_response(queryset)
 
     @action(detail=False, methods=['post'])
     def mark(self, request):
@@ -174,41 +228,243 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             date_value = serializer.validated_data['date']
             status_value = serializer.validated_data['status']
             
+            if settings.ATTENDANCE_WRITE_BEHIND:
+                # Queued and journaled; written with the next batch
+                get_mark_buffer().add(employee_id, date_value, status_value, request.user.pk)
+                return Response(
+                    {'employee_id': str(employee_id), 'date': date_value, 'status': status_value},
+                    status=status.HTTP_202_ACCEPTED
+                )
+            
+            # Update or create attendance record (the employee was resolved
+            # through the directory cache during validation)
             try:
-                employee = Employee.objects.get(id=employee_id)
-            except Employee.DoesNotExist:
+                attendance, created = AttendanceRecord.objects.update_or_create(
+                    employee_id=employee_id,
+                    date=date_value,
+                    defaults={
+                        'status': status_value,
+                        'marked_by': request.user
+                    }
+                )
+            except IntegrityError:
+                # The employee was deleted after validation
                 return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Update or create attendance record
-            attendance, created = AttendanceRecord.objects.update_or_create(
-                employee=employee,
-                date=date_value,
-                defaults={
-                    'status': status_value,
-                    'marked_by': request.user
-                }
-            )
-            
             result_serializer = AttendanceRecordSerializer(attendance)
             return Response(result_serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def mark_bulk(self, request):
+        """Mark attendance for many employees in one request"""
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'A non-empty list of items is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = settings.ATTENDANCE_BULK_MAX_ITEMS
+        if len(items) > max_items:
+            return Response(
+                {'error': f'At most {max_items} items can be marked per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = AttendanceMarkItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'result': 'error', 'errors': serializer.errors}
+
+        # Validate every referenced employee with a single set lookup
+        requested_ids = {data['employee_id'] for _, data in valid}
+        existing_ids = set(get_directory().get_many_by_id(requested_ids))
+
+        def existing_rows(items, existing_ids):
+            rows = []
+            for index, data in items:
+                if data['employee_id'] not in existing_ids:
+                    results[index] = {
+                        'index': index,
+                        'result': 'error',
+                        'errors': {'employee_id': ['Employee does not exist']},
+                    }
+                else:
+                    rows.append((index, data))
+            return rows
+
+        def write(rows):
+            return upsert_attendance(
+                ((data['employee_id'], data['date'], data['status']) for _, data in rows),
+                marked_by_id=request.user.pk
+            )
+
+        rows = existing_rows(valid, existing_ids)
+        try:
+            written = write(rows)
+        except IntegrityError:
+            # Another process deleted an employee this process still has
+            # cached; recheck against the database and write the rest
+            existing_ids = set(
+                Employee.objects.filter(id__in=requested_ids).values_list('id', flat=True)
+            )
+            for pk in requested_ids - existing_ids:
+                get_directory().evict(pk)
+            rows = existing_rows(rows, existing_ids)
+            written = write(rows)
+
+        # Items repeating an (employee, date) are coalesced into the last one,
+        # which alone counts as the record's create or update
+        last_index = {(data['employee_id'], data['date']): index for index, data in rows}
+        for index, data in rows:
+            key = (data['employee_id'], data['date'])
+            record_id, created = written[key]
+            results[index] = {
+                'index': index,
+                'result': 'created' if created else 'updated',
+                'id': str(record_id),
+                'employee_id': str(data['employee_id']),
+                'date': data['date'].isoformat(),
+                'status': data['status'],
+            }
+            if last_index[key] != index:
+                results[index]['result'] = 'coalesced'
+                results[index]['superseded_by'] = last_index[key]
+
+        summary = {'created': 0, 'updated': 0, 'coalesced': 0, 'error': 0}
+        for result in results:
+            summary[result['result']] += 1
+
+        return Response({
+            'created': summary['created'],
+            'updated': summary['updated'],
+            'coalesced': summary['coalesced'],
+            'errors': summary['error'],
+            'results': results,
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream filtered attendance records as CSV or NDJSON"""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f'file_format must be one of: {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        queryset = self.get_queryset()
+        etag = export_etag(queryset, file_format, compress)
+
+        # Resume an interrupted download from a byte offset. The export is
+        # generated in a stable order, so skipping regenerates the same bytes,
+        # as long as If-Range shows the client's bytes came from this export.
+        offset = parse_range_start(request.headers.get('Range'))
+        if offset is not None and request.headers.get('If-Range') != etag:
+            offset = None
+        if offset is not None:
+            # A valid Content-Range needs the total length up front, so
+            # resumed downloads are generated once into a spool and sent
+            # from there
+            spool, length = spool_export(queryset, file_format, compress)
+            if offset >= length:
+                spool.close()
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f'bytes */{length}'
+                response['ETag'] = etag
+                return response
+
+        filename = f'attendance.{file_format}'
+        content_type = EXPORT_CONTENT_TYPES[file_format]
+        if compress:
+            filename += '.gz'
+            content_type = 'application/gzip'
+
+        if offset is None:
+            content = export_attendance(queryset, file_format, compress=compress)
+        else:
+            content = read_spool(spool, offset)
+        response = StreamingHttpResponse(
+            content,
+            content_type=content_type,
+            status=status.HTTP_200_OK if offset is None else status.HTTP_206_PARTIAL_CONTENT
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        if offset is not None:
+            response['Content-Range'] = f'bytes {offset}-{length - 1}/{length}'
+            response['Content-Length'] = length - offset
+        return response
+
     @action(detail=False, methods=['get'])
     def today_stats(self, request):
         """Get today's attendance statistics"""
-        today = date.today()
-        today_records = AttendanceRecord.objects.filter(date=today)
-        
-        stats = {
-            'present': today_records.filter(status='present').count(),
-            'absent': today_records.filter(status='absent').count(),
-            'total': today_records.count(),
-        }
-        
+        stats = DailyAttendanceSummary.objects.totals(date.today())
         serializer = AttendanceStatsSerializer(stats)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def matrix(self, request):
+        """Get every employee's attendance for a month as status code strings"""
+        try:
+            month = datetime.strptime(request.query_params.get('month', ''), '%Y-%m').date()
+        except ValueError:
+            return Response(
+                {'error': 'month is required as YYYY-MM'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        department = request.query_params.get('department', None)
+        return Response(attendance_matrix(month, department))
+    
+    @action(detail=False, methods=['get'])
+    def report(self, request):
+        """Get per-employee and per-department attendance totals for a period"""
+        try:
+            start = date.fromisoformat(request.query_params.get('start_date', ''))
+            end = date.fromisoformat(request.query_params.get('end_date', ''))
+        except ValueError:
+            return Response(
+                {'error': 'start_date and end_date are required as YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end:
+            return Response(
+                {'error': 'start_date must not be after end_date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        department = request.query_params.get('department', None)
+        working_days = count_working_days(start, end)
+        departments, totals = department_report(start, end, department)
+        
+        rows = employee_report(start, end, department)
+        paginator = ReportPagination()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(rows, request, view=self)
+            employees = {
+                'count': paginator.page.paginator.count,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': [employee_row(row, working_days) for row in page],
+            }
+        else:
+            results = [employee_row(row, working_days) for row in rows]
+            employees = {'count': len(results), 'next': None, 'previous': None, 'results': results}
+        
+        return Response({
+            'start_date': start,
+            'end_date': end,
+            'working_days': working_days,
+            'totals': totals,
+            'departments': departments,
+            'employees': employees,
+        })
+    
     @action(detail=False, methods=['get'])
     def by_employee(self, request):
         """Get attendance records for a specific employee"""
@@ -216,14 +472,12 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         if not employee_id:
             return Response({'error': 'employee_id is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            employee = Employee.objects.get(id=employee_id)
-        except Employee.DoesNotExist:
+        employee = get_directory().get_by_id(employee_id)
+        if employee is None:
             return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        records = AttendanceRecord.objects.filter(employee=employee).order_by('-date')
-        serializer = self.get_serializer(records, many=True)
-        return Response(serializer.data)
+        records = AttendanceRecord.objects.filter(employee_id=employee.id).order_by('-date', '-employee_id', '-id')
+        return self.paginated_records(records)
 
     @action(detail=False, methods=['get'])
     def by_date(self, request):
@@ -232,26 +486,49 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         if not date_param:
             return Response({'error': 'date is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        records = AttendanceRecord.objects.filter(date=date_param).select_related('employee')
-        serializer = self.get_serializer(records, many=True)
-        return Response(serializer.data)
+        try:
+            date.fromisoformat(date_param)
+        except ValueError:
+            return Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        records = AttendanceRecord.objects.filter(date=date_param).order_by('-date', '-employee_id', '-id')
+        return self.paginated_records(records)
 
 
 # Dashboard Stats View
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def dashboard_stats(request):
     """Get dashboard statistics"""
-    total_employees = Employee.objects.count()
-    
-    today = date.today()
-    today_attendance = AttendanceRecord.objects.filter(date=today)
-    present_today = today_attendance.filter(status='present').count()
-    absent_today = today_attendance.filter(status='absent').count()
+    today_stats = DailyAttendanceSummary.objects.dashboard(date.today())
     
     return Response({
-        'total_employees': total_employees,
-        'present_today': present_today,
-        'absent_today': absent_today,
-        'attendance_marked': today_attendance.count(),
+        'total_employees': today_stats['employees'],
+        'present_today': today_stats['present'],
+        'absent_today': today_stats['absent'],
+        'attendance_marked': today_stats['total'],
     })
+
+
+# Connection Pool Stats View
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats(request):
+    """Connection pool statistics of the worker that served this request"""
+    return Response({
+        'pid': os.getpid(),
+        'pools': pool_stats(),
+    })
+
+
+# Prometheus Metrics View
+def metrics(request):
+    """Request, connection pool and directory metrics of this worker, for local scrapers"""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseNotFound()
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {settings.METRICS_TOKEN}'.encode()
+    ):
+        return HttpResponseNotFound()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,326 @@
+"""
+Write-behind buffer for attendance marks.
+
+With ATTENDANCE_WRITE_BEHIND on, `/api/attendance/mark/` hands each mark to
+the process-wide MarkBuffer instead of writing it. Marks are coalesced by
+(employee, date), the last one winning, and a background thread writes them
+with one multi-row upsert once ATTENDANCE_WRITE_BEHIND_BATCH_SIZE marks are
+pending or the oldest has waited ATTENDANCE_WRITE_BEHIND_INTERVAL seconds.
+
+Every mark is appended to a journal file in
+ATTENDANCE_WRITE_BEHIND_JOURNAL_DIR, with the time it was accepted, before
+it is accepted, and the file is deleted once its marks are written. A
+process holds an exclusive flock on each of its journal files, so a file
+nobody holds belongs to a process that died. Flush threads look for such
+files every ATTENDANCE_WRITE_BEHIND_RECOVERY_INTERVAL seconds, and the
+`replay_attendance_journal` command writes them on demand.
+
+Marks are written only over records last updated before the mark was
+accepted, so a late flush or replay never undoes a newer mark. Marks the
+database keeps rejecting are moved to rejected-*.log files in the journal
+directory, which `replay_attendance_journal --rejected` retries.
+"""
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections
+from django.utils import timezone
+
+from .bulk import upsert_attendance
+from .metrics import LATENCY_BUCKETS, registry
+from .models import Employee, User
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PATTERN = 'marks-*.log'
+REJECTED_PATTERN = 'rejected-*.log'
+
+
+def journal_line(employee_id, date_value, status_value, marked_by_id, marked_at):
+    return (
+        f'{employee_id}\t{date_value.isoformat()}\t{status_value}\t{marked_by_id or ""}\t{marked_at.isoformat()}\n'
+    ).encode()
+
+
+def parse_journal_line(line):
+    """((employee_id, date), (status, marked_by_id, marked_at)) or None for a torn line"""
+    try:
+        employee_id, date_value, status_value, marked_by_id, marked_at = line.rstrip('\n').split('\t')
+        key = (uuid.UUID(employee_id), date.fromisoformat(date_value))
+        marked_at = datetime.fromisoformat(marked_at)
+        if timezone.is_naive(marked_at):
+            return None
+        return key, (status_value, uuid.UUID(marked_by_id) if marked_by_id else None, marked_at)
+    except ValueError:
+        return None
+
+
+def existing_rows(rows):
+    """
+    The rows whose employee still exists, with marked_by cleared where the
+    user no longer does (as on_delete=SET_NULL would), warning about the rest
+    """
+    existing = set(Employee.objects.filter(id__in={row[0] for row in rows}).values_list('id', flat=True))
+    markers = set(User.objects.filter(id__in={row[3] for row in rows if row[3]}).values_list('id', flat=True))
+    dropped = sum(row[0] not in existing for row in rows)
+    if dropped:
+        logger.warning('Dropping %d buffered marks of deleted employees', dropped)
+    return [
+        (employee_id, date_value, status_value, marked_by_id if marked_by_id in markers else None, marked_at)
+        for employee_id, date_value, status_value, marked_by_id, marked_at in rows
+        if employee_id in existing
+    ]
+
+
+def set_aside(journal_dir, rows, reason):
+    """Move marks that cannot be written to a rejected-*.log file for inspection and replay"""
+    path = os.path.join(journal_dir, f'rejected-{time.time_ns():020d}-{os.getpid()}.log')
+    with open(path, 'ab') as rejected:
+        rejected.write(b''.join(journal_line(*row) for row in rows))
+        rejected.flush()
+        os.fsync(rejected.fileno())
+    registry.inc('attendance_write_behind_rejected_total', amount=len(rows))
+    logger.error('Set aside %d attendance marks in %s: %s', len(rows), path, reason)
+
+
+def write_marks(marks, journal_dir):
+    """
+    Upsert {(employee_id, date): (status, marked_by_id, marked_at)} where no
+    newer mark was written, skipping employees deleted since. Rows the
+    database rejects are set aside one by one so the rest are written.
+    Returns the number of records written.
+    """
+    rows = [(employee_id, date_value, *value) for (employee_id, date_value), value in marks.items()]
+    # Foreign keys are only checked at commit, so deleted rows are dealt with
+    # up front; the retries cover deletes racing this write
+    try:
+        return len(upsert_attendance(existing_rows(rows), only_newer=True))
+    except (IntegrityError, DataError):
+        pass
+
+    written = 0
+    for row in existing_rows(rows):
+        try:
+            written += len(upsert_attendance([row], only_newer=True))
+        except (IntegrityError, DataError) as e:
+            set_aside(journal_dir, [row], e)
+    return written
+
+
+def recover_journals(journal_dir, pattern=JOURNAL_PATTERN):
+    """Write the marks of journals no live process holds and delete them; returns the marks written"""
+    marks = {}
+    journals = []
+    try:
+        for path in sorted(glob.glob(os.path.join(journal_dir, pattern))):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Still owned by a running process
+                os.close(fd)
+                continue
+            if os.fstat(fd).st_nlink == 0:
+                # Replayed and deleted by another process meanwhile
+                os.close(fd)
+                continue
+            journals.append((path, fd))
+            # Files are named by creation time, so later marks win
+            with open(fd, closefd=False) as journal:
+                for line in journal:
+                    entry = parse_journal_line(line)
+                    if entry is not None:
+                        marks[entry[0]] = entry[1]
+
+        written = write_marks(marks, journal_dir) if marks else 0
+        for path, _ in journals:
+            os.unlink(path)
+    finally:
+        for _, fd in journals:
+            os.close(fd)
+    if marks:
+        logger.warning(
+            'Recovered %d attendance marks from %d journal files (%d written, the rest were superseded)',
+            len(marks), len(journals), written
+        )
+    return written
+
+
+class MarkBuffer:
+    """Coalesces attendance marks in memory, journaled, and writes them in batches"""
+
+    def __init__(self, journal_dir=None, batch_size=None, interval=None, fsync=None, background=True):
+        self.journal_dir = journal_dir or settings.ATTENDANCE_WRITE_BEHIND_JOURNAL_DIR
+        self.batch_size = batch_size or settings.ATTENDANCE_WRITE_BEHIND_BATCH_SIZE
+        self.interval = interval or settings.ATTENDANCE_WRITE_BEHIND_INTERVAL
+        self.fsync = settings.ATTENDANCE_WRITE_BEHIND_FSYNC if fsync is None else fsync
+        self.recovery_interval = settings.ATTENDANCE_WRITE_BEHIND_RECOVERY_INTERVAL
+        self.max_attempts = settings.ATTENDANCE_WRITE_BEHIND_MAX_ATTEMPTS
+        self.failures = 0
+        self.recovered_at = None
+        self.background = background
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pending = {}
+        self.oldest = None
+        # (path, fd) of the journal being appended to, and of earlier ones
+        # whose marks are not written yet
+        self.journal = None
+        self.sealed = []
+        self.thread = None
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+    def open_journal(self):
+        # Locked under a temporary name first, so recovery never sees it unlocked
+        name = f'marks-{time.time_ns():020d}-{os.getpid()}.log'
+        temporary = os.path.join(self.journal_dir, f'.{name}.tmp')
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        path = os.path.join(self.journal_dir, name)
+        os.rename(temporary, path)
+        return path, fd
+
+    def add(self, employee_id, date_value, status_value, marked_by_id=None):
+        """Journal a mark and queue it; it is durable once this returns"""
+        marked_at = timezone.now()
+        line = journal_line(employee_id, date_value, status_value, marked_by_id, marked_at)
+        with self.lock:
+            if self.journal is None:
+                self.journal = self.open_journal()
+            os.write(self.journal[1], line)
+            if self.fsync:
+                os.fsync(self.journal[1])
+
+            key = (employee_id, date_value)
+            if key in self.pending:
+                registry.inc('attendance_write_behind_coalesced_total')
+            self.pending[key] = (status_value, marked_by_id, marked_at)
+            first = self.oldest is None
+            if first:
+                self.oldest = time.monotonic()
+            full = len(self.pending) >= self.batch_size
+            registry.set('attendance_write_behind_pending', (), len(self.pending))
+
+        if self.background:
+            self.start()
+            if first or full:
+                self.wakeup.set()
+
+    def flush(self):
+        """
+        Write every pending mark with one upsert; returns the number written.
+
+        A batch that fails ATTENDANCE_WRITE_BEHIND_MAX_ATTEMPTS times in a
+        row is set aside, so it cannot hold up the marks behind it.
+        """
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return 0
+                marks, self.pending = self.pending, {}
+                oldest, self.oldest = self.oldest, None
+                if self.journal is not None:
+                    self.sealed.append(self.journal)
+                    self.journal = None
+                journals = list(self.sealed)
+
+            try:
+                written = write_marks(marks, self.journal_dir)
+            except Exception as e:
+                self.failures += 1
+                if self.failures < self.max_attempts:
+                    with self.lock:
+                        # Marks accepted meanwhile are newer and stay
+                        for key, value in marks.items():
+                            self.pending.setdefault(key, value)
+                        self.oldest = oldest if self.oldest is None else min(oldest, self.oldest)
+                    raise
+                set_aside(self.journal_dir, [(*key, *value) for key, value in marks.items()], e)
+                written = 0
+            self.failures = 0
+
+            with self.lock:
+                self.sealed = []
+                registry.set('attendance_write_behind_pending', (), len(self.pending))
+            for path, fd in journals:
+                os.unlink(path)
+                os.close(fd)
+            registry.inc('attendance_write_behind_flushed_total', amount=written)
+            registry.observe('attendance_write_behind_flush_lag_seconds', (), time.monotonic() - oldest, LATENCY_BUCKETS)
+            return written
+
+    def seconds_until_due(self):
+        with self.lock:
+            if self.oldest is None:
+                return self.interval
+            if len(self.pending) >= self.batch_size:
+                return 0
+            return max(self.oldest + self.interval - time.monotonic(), 0)
+
+    def start(self):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='attendance-write-behind', daemon=True)
+                    self.thread.start()
+                    atexit.register(self.close)
+
+    def recover(self):
+        """Write the journals of processes that died, logging failures"""
+        self.recovered_at = time.monotonic()
+        try:
+            recover_journals(self.journal_dir)
+        except Exception:
+            logger.exception('Could not recover attendance journals; they are kept for the next attempt')
+        finally:
+            close_old_connections()
+
+    def run(self):
+        while True:
+            # The loop wakes at least every `interval`, idle or not
+            if self.recovered_at is None or time.monotonic() - self.recovered_at >= self.recovery_interval:
+                self.recover()
+            self.wakeup.wait(self.seconds_until_due())
+            self.wakeup.clear()
+            if self.seconds_until_due() > 0:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Could not write buffered attendance marks; retrying')
+                time.sleep(self.interval)
+            finally:
+                close_old_connections()
+
+    def close(self):
+        """Write what is pending at shutdown; on failure the journal keeps it"""
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not write buffered attendance marks at shutdown; they stay journaled')
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_mark_buffer():
+    """Return the process-wide mark buffer"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = MarkBuffer()
+    return _buffer
@@ -7,5 +7,14 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'staff_hub_backend.settings')
+# Serve login/signup from the async views, hashing on a bounded thread pool
+os.environ.setdefault('ASYNC_AUTH', 'True')
+# Serve the read-heavy endpoints from the native async views
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
+
+# Fill the employee directory now rather than during the first request
+from api.directory import warm_directory  # noqa: E402
+
+warm_directory()
@@ -0,0 +1,6 @@
+"""
+PostgreSQL backend that keeps connections in a per-process pool.
+
+Use it as the ENGINE of a database and tune it with the POOL setting; see
+staff_hub_backend/settings.py.
+"""
@@ -0,0 +1,118 @@
+import threading
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from .pool import ConnectionPool, PoolTimeout
+
+
+POOL_DEFAULTS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10.0,
+    'CHECK_AFTER': 5.0,
+    'MAX_IDLE': 300.0,
+    'MAX_LIFETIME': 3600.0,
+}
+
+# One pool per database alias in this worker process
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def ping(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    if not connection.autocommit:
+        connection.rollback()
+
+
+def reset(connection):
+    """Leave the connection outside any transaction before it is reused"""
+    status = connection.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        raise base.Database.OperationalError('Connection is broken')
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+
+
+def get_pool(alias, conn_params, options, connect):
+    key = tuple(sorted((name, str(value)) for name, value in conn_params.items()))
+    with _pools_lock:
+        entry = _pools.get(alias)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        if entry is not None:
+            # The alias now points elsewhere (e.g. the test database)
+            entry[1].close()
+        pool = ConnectionPool(
+            connect,
+            ping,
+            reset,
+            min_size=options['MIN_SIZE'],
+            max_size=options['MAX_SIZE'],
+            timeout=options['TIMEOUT'],
+            check_after=options['CHECK_AFTER'],
+            max_idle=options['MAX_IDLE'],
+            max_lifetime=options['MAX_LIFETIME'],
+        )
+        _pools[alias] = (key, pool)
+        return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool in this process"""
+    with _pools_lock:
+        entries = list(_pools.values())
+        _pools.clear()
+    for _, pool in entries:
+        pool.close()
+
+
+def pool_stats():
+    """Statistics of this worker's pools, by database alias"""
+    with _pools_lock:
+        return {alias: pool.stats() for alias, (_, pool) in _pools.items()}
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections would keep the test database in use
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL wrapper whose connections come from, and go back to, a
+    per-process pool instead of being opened and closed per request.
+    """
+    creation_class = DatabaseCreation
+
+    def get_pool_options(self):
+        return {**POOL_DEFAULTS, **self.settings_dict.get('POOL', {})}
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(
+            self.alias,
+            conn_params,
+            self.get_pool_options(),
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+        )
+        try:
+            connection = pool.checkout()
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = (
+            base.IsolationLevel(isolation_level) if isolation_level is not None
+            else base.IsolationLevel.READ_COMMITTED
+        )
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.checkin(self.connection)
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout"""
+
+
+class PooledConnection:
+    __slots__ = ('connection', 'created_at', 'released_at')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.released_at = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections for one worker process.
+
+    At most `max_size` connections are open at once; callers wait up to
+    `timeout` seconds for one to be returned. Connections idle for longer
+    than `check_after` seconds are pinged before being handed out, and
+    connections older than `max_lifetime` or idle beyond `max_idle` (above
+    `min_size`) are closed instead of reused.
+    """
+
+    def __init__(self, connect, ping, reset, min_size=1, max_size=10, timeout=10.0,
+                 check_after=5.0, max_idle=300.0, max_lifetime=3600.0):
+        self.connect = connect
+        self.ping = ping
+        self.reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.checked_out = {}
+        self.size = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.checkout_time = 0.0
+        self.max_checkout_time = 0.0
+
+    def checkout(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f'No database connection available after {self.timeout}s '
+                            f'({self.max_size} in use)'
+                        )
+                    waited = True
+                    self.condition.wait(remaining)
+                pooled = self.idle.pop() if self.idle else None
+                self.size += pooled is None
+
+            if pooled is None:
+                try:
+                    pooled = PooledConnection(self.connect())
+                except BaseException:
+                    self.release_slot()
+                    raise
+            elif not self.usable(pooled):
+                self.discard(pooled)
+                continue
+            break
+
+        elapsed = time.monotonic() - started
+        with self.condition:
+            self.checked_out[id(pooled.connection)] = pooled
+            self.checkouts += 1
+            self.waits += waited
+            self.checkout_time += elapsed
+            self.max_checkout_time = max(self.max_checkout_time, elapsed)
+        return pooled.connection
+
+    def checkin(self, connection):
+        with self.condition:
+            pooled = self.checked_out.pop(id(connection), None)
+        if pooled is None:
+            # Not ours (e.g. the pool was closed meanwhile)
+            connection.close()
+            return
+
+        now = time.monotonic()
+        try:
+            healthy = not connection.closed and now - pooled.created_at < self.max_lifetime
+            if healthy:
+                self.reset(connection)
+        except Exception:
+            healthy = False
+        if not healthy:
+            self.discard(pooled)
+            return
+
+        pooled.released_at = now
+        with self.condition:
+            self.idle.append(pooled)
+            self.trim(now)
+            self.condition.notify()
+
+    def usable(self, pooled):
+        now = time.monotonic()
+        if pooled.connection.closed or now - pooled.created_at >= self.max_lifetime:
+            return False
+        if now - pooled.released_at < self.check_after:
+            return True
+        try:
+            self.ping(pooled.connection)
+        except Exception:
+            return False
+        return True
+
+    def trim(self, now):
+        # Oldest idle connections are at the left; keep min_size of them
+        while len(self.idle) > self.min_size and now - self.idle[0].released_at > self.max_idle:
+            stale = self.idle.popleft()
+            self.size -= 1
+            self.discarded += 1
+            self.close_quietly(stale.connection)
+
+    def discard(self, pooled):
+        self.close_quietly(pooled.connection)
+        with self.condition:
+            self.discarded += 1
+        self.release_slot()
+
+    def release_slot(self):
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    @staticmethod
+    def close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close every idle connection; checked-out ones are closed on checkin"""
+        with self.condition:
+            idle, self.idle = list(self.idle), deque()
+            self.checked_out.clear()
+            self.size = 0
+            self.condition.notify_all()
+        for pooled in idle:
+            self.close_quietly(pooled.connection)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'in_use': len(self.checked_out),
+                'idle': len(self.idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'discarded': self.discarded,
+                'avg_checkout_ms': round(self.checkout_time * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_checkout_ms': round(self.max_checkout_time * 1000, 3),
+            }
@@ -4,6 +4,7 @@ Django settings for staff_hub_backend project.
 
 from pathlib import Path
 from datetime import timedelta
+from importlib.util import find_spec
 from decouple import config
 import os
 from dotenv import load_dotenv
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -46,6 +48,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS should be before CommonMiddleware
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.PrimaryPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'staff_hub_backend.urls'
@@ -94,13 +99,75 @@ DATABASES = {
         'USER': tmpPostgres.username,
         'PASSWORD': tmpPostgres.password,
         'HOST': tmpPostgres.hostname,
-        'PORT': 5432,
+        'PORT': tmpPostgres.port or 5432,
         'OPTIONS': dict(parse_qsl(tmpPostgres.query)),
+        # Persistent connections when the pool is off (0 = close per request)
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': config('CONN_HEALTH_CHECKS', default=True, cast=bool),
+        # Required behind pgbouncer in transaction pooling mode, where a named
+        # cursor cannot outlive the transaction that declared it
+        'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
     }
 }
+
+# Per-worker connection pool (staff_hub_backend/postgres_pool). Connections
+# are returned to the pool at the end of each request instead of closed.
+if config('DB_POOL', default=False, cast=bool):
+    DATABASES['default'].update({
+        'ENGINE': 'staff_hub_backend.postgres_pool',
+        # The pool decides connection lifetime
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN_SIZE': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+            'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            # Seconds to wait for a free connection before failing the request
+            'TIMEOUT': config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+            # Ping connections that sat idle longer than this on checkout
+            'CHECK_AFTER': config('DB_POOL_CHECK_AFTER', default=5.0, cast=float),
+            'MAX_IDLE': config('DB_POOL_MAX_IDLE', default=300.0, cast=float),
+            'MAX_LIFETIME': config('DB_POOL_MAX_LIFETIME', default=3600.0, cast=float),
+        },
+    })
+
+# Read replicas, as a comma-separated list of database URLs. Safe reads of the
+# list/detail/stats endpoints go to one of them (api/db_router.py); writes and
+# authentication stay on `default`. In tests they mirror `default`.
+DATABASE_REPLICAS = []
+replica_urls = [url for url in config('DATABASE_REPLICA_URLS', default='').split(',') if url]
+for index, url in enumerate(replica_urls, start=1):
+    replica = urlparse(url)
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': replica.path.replace('/', ''),
+        'USER': replica.username,
+        'PASSWORD': replica.password,
+        'HOST': replica.hostname,
+        'PORT': replica.port or 5432,
+        'OPTIONS': dict(parse_qsl(replica.query)),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+# After a successful write, the client reads from the primary for this long
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+REPLICA_PIN_COOKIE = 'primary_pin'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
+PASSWORD_HASHERS = [
+    'api.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# PBKDF2 cost for new hashes; existing hashes are re-encoded on login
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=720000, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -179,7 +246,7 @@ CORS_PREFLIGHT_MAX_AGE = 86400  # Cache preflight requests for 24 hours
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -188,8 +255,32 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100,
     'DATETIME_FORMAT': '%Y-%m-%dT%H:%M:%SZ',
     'DATE_FORMAT': '%Y-%m-%d',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'api.renderers.ColumnarJSONRenderer',
+        *(['api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Responses of at least COMPRESSION_MIN_SIZE bytes are sent brotli (when the
+# brotli package is installed) or gzip compressed, as the client accepts.
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_GZIP_LEVEL = config('COMPRESSION_GZIP_LEVEL', default=6, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
+
+# Per-request route, latency, SQL count and SQL time, kept per worker process
+# and served in the Prometheus format at /metrics to METRICS_ALLOWED_IPS.
+REQUEST_METRICS = config('REQUEST_METRICS', default=True, cast=bool)
+SERVER_TIMING = config('SERVER_TIMING', default=True, cast=bool)
+# A statement run this many times in one request is logged as a likely N+1
+N_PLUS_ONE_THRESHOLD = config('N_PLUS_ONE_THRESHOLD', default=5, cast=int)
+# Checked against REMOTE_ADDR. Behind a reverse proxy on the same host every
+# client arrives from 127.0.0.1, so the IP check admits everyone: set
+# METRICS_TOKEN too, and scrapers then send "Authorization: Bearer <token>".
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='127.0.0.1,::1').split(',')
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 
 # JWT Settings
 SIMPLE_JWT = {
@@ -217,3 +308,60 @@ SIMPLE_JWT = {
 
 # Custom User Model
 AUTH_USER_MODEL = 'api.User'
+
+# Authenticated users are cached for a short time so requests skip the users
+# table lookup. Point AUTH_USER_CACHE_ALIAS at a shared cache to invalidate
+# across worker processes; with the default per-process cache other workers
+# may serve a changed user for up to AUTH_USER_CACHE_TIMEOUT seconds.
+AUTH_USER_CACHE_ALIAS = config('AUTH_USER_CACHE_ALIAS', default='default')
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+# Build the user for GET/HEAD/OPTIONS requests from the email/name/role claims
+# in the access token. Deactivation then only takes effect on token expiry.
+AUTH_TRUST_TOKEN_CLAIMS = config('AUTH_TRUST_TOKEN_CLAIMS', default=False, cast=bool)
+
+# Async login/signup (api/async_auth.py). asgi.py turns this on so ASGI
+# deployments verify passwords on a bounded thread pool instead of tying up
+# request workers.
+ASYNC_AUTH = config('ASYNC_AUTH', default=False, cast=bool)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=os.cpu_count() or 1, cast=int)
+# last_login writes from async logins are batched into one UPDATE
+LAST_LOGIN_BATCH_SIZE = config('LAST_LOGIN_BATCH_SIZE', default=100, cast=int)
+LAST_LOGIN_FLUSH_INTERVAL = config('LAST_LOGIN_FLUSH_INTERVAL', default=5.0, cast=float)
+
+# Native async read endpoints (api/async_views.py), also turned on by asgi.py
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+
+# Employee Directory Settings
+# In-process LRU used to resolve employees by UUID, employee_id or email.
+# Signals only evict entries in the process that changed the employee, so
+# other processes may serve a stale entry for up to
+# EMPLOYEE_DIRECTORY_LOCAL_TIMEOUT seconds.
+# Set EMPLOYEE_DIRECTORY_CACHE_ALIAS to a shared cache (e.g. Redis/Memcached
+# configured in CACHES) to share entries between worker processes.
+EMPLOYEE_DIRECTORY_MAX_SIZE = config('EMPLOYEE_DIRECTORY_MAX_SIZE', default=50000, cast=int)
+EMPLOYEE_DIRECTORY_CACHE_ALIAS = config('EMPLOYEE_DIRECTORY_CACHE_ALIAS', default='')
+EMPLOYEE_DIRECTORY_LOCAL_TIMEOUT = config('EMPLOYEE_DIRECTORY_LOCAL_TIMEOUT', default=60, cast=int)
+EMPLOYEE_DIRECTORY_TIMEOUT = config('EMPLOYEE_DIRECTORY_TIMEOUT', default=3600, cast=int)
+
+
+# Attendance Settings
+# Upper bound on items accepted by /api/attendance/mark_bulk/ in one request
+ATTENDANCE_BULK_MAX_ITEMS = config('ATTENDANCE_BULK_MAX_ITEMS', default=10000, cast=int)
+# Rows fetched per round trip from the server-side cursor behind /api/attendance/export/
+ATTENDANCE_EXPORT_CHUNK_SIZE = config('ATTENDANCE_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Accept /api/attendance/mark/ into a journaled in-memory buffer that is written
+# in batches (see api/write_behind.py). Marks show up in reads once flushed.
+ATTENDANCE_WRITE_BEHIND = config('ATTENDANCE_WRITE_BEHIND', default=False, cast=bool)
+ATTENDANCE_WRITE_BEHIND_BATCH_SIZE = config('ATTENDANCE_WRITE_BEHIND_BATCH_SIZE', default=1000, cast=int)
+ATTENDANCE_WRITE_BEHIND_INTERVAL = config('ATTENDANCE_WRITE_BEHIND_INTERVAL', default=1.0, cast=float)
+# Must be on local disk that survives restarts, shared by the workers of one host
+ATTENDANCE_WRITE_BEHIND_JOURNAL_DIR = config(
+    'ATTENDANCE_WRITE_BEHIND_JOURNAL_DIR', default=str(BASE_DIR / 'var' / 'attendance-journal')
+)
+# fsync every mark, so an OS crash loses nothing either (not just a process crash)
+ATTENDANCE_WRITE_BEHIND_FSYNC = config('ATTENDANCE_WRITE_BEHIND_FSYNC', default=True, cast=bool)
+# How often each flush thread writes journals left behind by crashed processes
+ATTENDANCE_WRITE_BEHIND_RECOVERY_INTERVAL = config('ATTENDANCE_WRITE_BEHIND_RECOVERY_INTERVAL', default=30, cast=float)
+# Failed flushes of one batch before it is set aside in a rejected-*.log journal
+ATTENDANCE_WRITE_BEHIND_MAX_ATTEMPTS = config('ATTENDANCE_WRITE_BEHIND_MAX_ATTEMPTS', default=5, cast=int)
@@ -3,8 +3,10 @@ URL configuration for staff_hub_backend project.
 """
 from django.contrib import admin
 from django.urls import path, include
+from api import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
+    path('metrics', views.metrics, name='metrics'),
 ]
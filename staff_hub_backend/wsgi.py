@@ -9,3 +9,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'staff_hub_backend.settings')
 
 application = get_wsgi_application()
+
+# Fill the employee directory now rather than during the first request
+from api.directory import warm_directory  # noqa: E402
+
+warm_directory()